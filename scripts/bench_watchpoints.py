@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: attribute assignment throughput on a watched class, for the
+two `whyx run --watch` mechanisms (per-attribute descriptor vs __setattr__
+wrapper).
+
+Usage:
+  python scripts/bench_watchpoints.py [--n 1000000]
+
+Each case times `n` assignments to an unwatched attribute, `n` to the watched
+one (recorded into a list), and `n` reads of the watched one, on a class with
+no watch, a descriptor watch, and a wrapped __setattr__.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from src.dynamic_tracing.watchpoints import Watchpoints  # noqa: E402
+
+
+def make_class():
+    class Point:
+        def __init__(self):
+            self.x = 0
+            self.y = 0
+
+    return Point
+
+
+def run_case(mechanism: str | None, n: int) -> dict:
+    cls = make_class()
+    recorded = []
+    watchpoints = None
+    if mechanism is not None:
+        watchpoints = Watchpoints(
+            [("bench", "Point", "x")],
+            script_path="",
+            stem_name="bench",
+            on_assign=lambda target, frame, value: recorded.append(value),
+            mechanism=mechanism,
+        )
+        watchpoints._attach(0, cls)
+    p = cls()
+    rng = range(n)
+    timings = {}
+    try:
+        start = time.perf_counter()
+        for i in rng:
+            p.y = i
+        timings["unwatched set"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in rng:
+            p.x = i
+        timings["watched set"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in rng:
+            _ = p.x
+        timings["watched get"] = time.perf_counter() - start
+    finally:
+        if watchpoints is not None:
+            watchpoints.uninstall()
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--n", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"Python {sys.version.split()[0]}, {args.n:,} operations per column")
+    header = f"{'mechanism':<12}"
+    rows = []
+    for label, mechanism in (
+        ("none", None),
+        ("descriptor", "descriptor"),
+        ("setattr", "setattr"),
+    ):
+        timings = run_case(mechanism, args.n)
+        if not rows:
+            header += "".join(f"{name:>16}" for name in timings)
+        rows.append(
+            f"{label:<12}"
+            + "".join(f"{args.n / t / 1e6:>12.2f} M/s" for t in timings.values())
+        )
+    print(header)
+    print("\n".join(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
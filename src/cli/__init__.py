@@ -5,6 +5,7 @@ Structure:
 - cli/_shared.py           : shared helpers (version display, index loading/building)
 - cli/dynamic_tracing/     : tracing CLI (run/diff/report + query history/search)
 - cli/static_index/        : static analysis CLI (index + query callers/callees/find-path)
+- cli/serve/               : long-running query server (`serve`) + client reused by `query`
 - cli/synonyms.py          : legacy top-level synonyms
 - cli/__main__.py          : the single CLI entrypoint (`python -m src.cli`)
 """
@@ -12,6 +12,8 @@ import argparse
 from ._shared import DISPLAY_VERSION
 from .dynamic_tracing import register_dynamic_tracing_commands
 from .help import CLI_DESCRIPTION, QUERY_HELP
+from .query.batch import register_batch_command
+from .serve import register_serve_commands
 from .static_index import register_static_index_commands
 from .synonyms import register_legacy_synonyms
 
@@ -34,6 +36,8 @@ def main():
 
     register_static_index_commands(subparsers, qsubs)
     register_dynamic_tracing_commands(subparsers, qsubs)
+    register_batch_command(qsubs)
+    register_serve_commands(subparsers)
 
     register_legacy_synonyms(subparsers)
 
@@ -6,6 +6,7 @@ from typing import Dict, List, Optional, Tuple
 
 from .. import __version__ as BASE_VERSION
 from .. import static_analysis
+from ..static_analysis.symbols import SymbolIndex
 
 try:
     from .. import _build_meta as _bm
@@ -25,21 +26,43 @@ def print_or_json(obj, as_json: bool):
             print(obj)
 
 
-def load_or_build_index(index_hint: Optional[str] = None, project: str = ".") -> Dict:
+DEFAULT_INDEX_FILES = (".whyx_index.json", ".whyx_index.bin")
+
+
+def find_index_file(index_hint: Optional[str] = None) -> Optional[str]:
     """
-    Try to load an existing index JSON (index_hint or ./.whyx_index.json).
-    If not found, build one from `project` (without saving to disk).
+    Return the index file a query should use: `index_hint` if it exists, else the
+    most recently written of ./.whyx_index.json and ./.whyx_index.bin, else None.
     """
     if index_hint and os.path.isfile(index_hint):
-        return static_analysis.load_index(index_hint)
-    default_index = os.path.join(os.getcwd(), ".whyx_index.json")
-    if os.path.isfile(default_index):
-        return static_analysis.load_index(default_index)
-    return static_analysis.build_index(project, output_file=None)
+        return index_hint
+    candidates = [
+        os.path.join(os.getcwd(), name)
+        for name in DEFAULT_INDEX_FILES
+        if os.path.isfile(os.path.join(os.getcwd(), name))
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=os.path.getmtime)
+
+
+def load_or_build_index(index_hint: Optional[str] = None, project: str = ".") -> Dict:
+    """
+    Try to load an existing index (index_hint or ./.whyx_index.json / ./.whyx_index.bin,
+    JSON or binary format). If not found, use the persistent index cache for `project`,
+    building (and caching) an index on a miss. Set WHYX_NO_CACHE=1 to always rebuild
+    in memory without touching the cache.
+    """
+    index_file = find_index_file(index_hint)
+    if index_file:
+        return static_analysis.load_index(index_file)
+    if os.environ.get("WHYX_NO_CACHE"):
+        return static_analysis.build_index(project, output_file=None)
+    return static_analysis.IndexCache().load_or_build(project)
 
 
 def resolve_symbol_suffix(
-    index_data: Dict, name: str
+    index_data: Dict, name: str, symbols: Optional[SymbolIndex] = None
 ) -> Tuple[str, Optional[List[str]]]:
     """
     Resolve a possibly-short/suffix function name to a canonical fully-qualified name
@@ -53,20 +76,10 @@ def resolve_symbol_suffix(
         Example: 'calculateTotal' -> 'billing.invoice.calculateTotal' if unique.
       - If multiple matches exist, return ("", candidates) to signal ambiguity.
       - If no match is found, return (name, None) (callers can proceed with the original).
-    """
-    funcs: List[str] = index_data.get("functions", [])
-    if name in funcs:
-        return name, None
-
-    candidates: List[str] = []
-    if "." in name:
-        suffix = "." + name
-        candidates = [f for f in funcs if f.endswith(suffix)]
-    else:
-        candidates = [f for f in funcs if f.split(".")[-1] == name]
 
-    if len(candidates) == 1:
-        return candidates[0], None
-    if len(candidates) > 1:
-        return "", sorted(candidates)
-    return name, None
+    Pass a prebuilt `symbols` index to resolve several names against the same index;
+    without one, the functions are scanned once.
+    """
+    if symbols is None:
+        return static_analysis.scan_symbols(index_data.get("functions", []), name)
+    return symbols.resolve(name)
@@ -1,10 +1,24 @@
 """Argparse wiring for dynamic tracing CLI (logic preserved)."""
 
+import argparse
 import os
+import signal
 
-from ..help import DIFF_HELP, Q_HISTORY_HELP, Q_SEARCH_HELP, REPORT_HELP, RUN_HELP
+from ... import dynamic_tracing as dt
+from ...dynamic_tracing import backends as dt_backends
+from ...dynamic_tracing import chunked_trace as dt_chunked
+from ...dynamic_tracing import values as dt_values
+from ..help import (
+    DIFF_HELP,
+    MERGE_HELP,
+    Q_HISTORY_HELP,
+    Q_SEARCH_HELP,
+    REPORT_HELP,
+    RUN_HELP,
+)
 from .handlers import (
     handle_diff,
+    handle_merge,
     handle_query_history,
     handle_query_trace_search,
     handle_report,
@@ -12,6 +26,15 @@ from .handlers import (
 )
 
 
+def _signal_name(value: str) -> str:
+    name = value.upper()
+    if not name.startswith("SIG"):
+        name = "SIG" + name
+    if not isinstance(getattr(signal, name, None), signal.Signals):
+        raise argparse.ArgumentTypeError(f"unknown signal: {value}")
+    return name
+
+
 def register_dynamic_tracing_commands(subparsers, query_subparsers):
     parser_run = subparsers.add_parser("run", help=RUN_HELP)
     parser_run.add_argument(
@@ -33,6 +56,96 @@ def register_dynamic_tracing_commands(subparsers, query_subparsers):
     parser_run.add_argument(
         "-o", "--output", help="File to save the execution trace (JSON)"
     )
+    parser_run.add_argument(
+        "--sample",
+        type=float,
+        metavar="HZ",
+        help="Sample call stacks HZ times per second (folded stacks with counts) instead of tracing every call",
+    )
+    parser_run.add_argument(
+        "--async",
+        dest="async_mode",
+        action="store_true",
+        help="asyncio-aware tracing: one call/return per coroutine or generator (suspends and resumes are dropped), events tagged with the current task",
+    )
+    parser_run.add_argument(
+        "--multiprocess",
+        action="store_true",
+        help="Also trace multiprocessing / ProcessPoolExecutor children (fork and spawn); -o is then a directory with one trace shard per process",
+    )
+    parser_run.add_argument(
+        "--timing",
+        action="store_true",
+        help="Stamp call/return events with perf_counter_ns time since the run started (implies --trace); see report --timing",
+    )
+    parser_run.add_argument(
+        "--timing-deltas",
+        action="store_true",
+        help="Like --timing, but store each stamp as nanoseconds since the thread's previous event, which keeps traces smaller",
+    )
+    parser_run.add_argument(
+        "--ring-buffer",
+        type=int,
+        metavar="N",
+        help="Flight recorder: keep only the last N events in a fixed-size ring and write them at exit, on an unhandled exception, or on --dump-signal",
+    )
+    parser_run.add_argument(
+        "--dump-signal",
+        type=_signal_name,
+        default="SIGUSR1" if hasattr(signal, "SIGUSR1") else None,
+        metavar="SIGNAL",
+        help="Signal that makes --ring-buffer write its events while the script keeps running (default: SIGUSR1)",
+    )
+    parser_run.add_argument(
+        "--capture-values",
+        choices=list(dt_values.CAPTURE_POLICIES),
+        default="full",
+        help="How return and assign values are recorded: full repr (default), truncated repr, type name, hash of the repr, or none",
+    )
+    parser_run.add_argument(
+        "--value-limit",
+        type=int,
+        default=dt_values.DEFAULT_VALUE_LIMIT,
+        metavar="N",
+        help=f"Maximum length of a value with --capture-values truncated (default: {dt_values.DEFAULT_VALUE_LIMIT})",
+    )
+    parser_run.add_argument(
+        "--include",
+        action="append",
+        metavar="GLOB",
+        help="Only trace modules matching GLOB (and their submodules); the script itself is always traced. Can be used multiple times.",
+    )
+    parser_run.add_argument(
+        "--exclude",
+        action="append",
+        metavar="GLOB",
+        help="Do not trace modules matching GLOB (and their submodules), e.g. 'json' or 'django.*'. Can be used multiple times.",
+    )
+    parser_run.add_argument(
+        "--backend",
+        choices=list(dt_backends.BACKENDS),
+        default="auto",
+        help="Event source: sys.monitoring (Python 3.12+), sys.settrace, or auto (default)",
+    )
+    parser_run.add_argument(
+        "--format",
+        choices=list(dt.TRACE_FORMATS),
+        default="json",
+        help="Trace file format: json array written on exit (default), ndjson streamed while running, compact binary, or compressed chunks",
+    )
+    parser_run.add_argument(
+        "--compress",
+        choices=list(dt_chunked.CODECS),
+        default="gzip",
+        help="Compression for --format chunked (default: gzip)",
+    )
+    parser_run.add_argument(
+        "--chunk-size",
+        type=int,
+        default=dt_chunked.DEFAULT_CHUNK_SIZE,
+        metavar="N",
+        help=f"Events per compressed chunk for --format chunked (default: {dt_chunked.DEFAULT_CHUNK_SIZE})",
+    )
     parser_run.add_argument("script", help="Path to the Python script to run")
     parser_run.set_defaults(func=handle_run)
 
@@ -41,6 +154,24 @@ def register_dynamic_tracing_commands(subparsers, query_subparsers):
     parser_diff.add_argument("trace2", help="Second trace file (JSON)")
     parser_diff.set_defaults(func=handle_diff)
 
+    parser_merge = subparsers.add_parser("merge", help=MERGE_HELP)
+    parser_merge.add_argument(
+        "shard_dir", help="Shard directory written by `whyx run --multiprocess`"
+    )
+    parser_merge.add_argument(
+        "-o",
+        "--output",
+        default=os.path.join(os.getcwd(), "whyx_trace.json"),
+        help="Merged trace file (default: ./whyx_trace.json)",
+    )
+    parser_merge.add_argument(
+        "--format",
+        choices=list(dt.TRACE_FORMATS),
+        default="json",
+        help="Format of the merged trace (default: json)",
+    )
+    parser_merge.set_defaults(func=handle_merge)
+
     parser_report = subparsers.add_parser("report", help=REPORT_HELP)
     parser_report.add_argument(
         "trace_file", help="Trace JSON file produced by `whyx run`"
@@ -49,7 +180,20 @@ def register_dynamic_tracing_commands(subparsers, query_subparsers):
         "--coverage", action="store_true", help="List modules touched"
     )
     parser_report.add_argument(
-        "--top", type=int, default=0, help="Show only top N modules (by call events)"
+        "--hot",
+        action="store_true",
+        help="Rank hot functions and stacks from `run --sample` samples",
+    )
+    parser_report.add_argument(
+        "--timing",
+        action="store_true",
+        help="Per-function calls, total/self time and p50/p95/p99 durations from `run --timing` stamps",
+    )
+    parser_report.add_argument(
+        "--top",
+        type=int,
+        default=0,
+        help="Show only top N modules (by call events), or top N hot/timed functions and stacks",
     )
     parser_report.set_defaults(func=handle_report)
 
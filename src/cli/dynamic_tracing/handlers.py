@@ -1,19 +1,44 @@
 """CLI handlers for dynamic tracing (logic preserved)."""
 
-import json
 import os
+from typing import Dict, Optional
 
 from ... import dynamic_tracing as dt
+from ...dynamic_tracing import timing as dt_timing
 from .._shared import print_or_json
 
 
 def handle_run(args):
+    timing = None
+    if args.timing_deltas:
+        timing = "delta"
+    elif args.timing:
+        timing = "absolute"
+    trace_options = {}
+    if args.format == "chunked":
+        trace_options = {"chunk_size": args.chunk_size, "codec": args.compress}
+    elif args.format == "binary" and timing == "absolute":
+        # Deltas repeat, so they intern well as extras; timestamps do not.
+        trace_options = {"time_key": dt_timing.TIME_KEYS[timing]}
     result = dt.run_script(
         args.script,
-        trace=args.trace,
+        trace=args.trace or timing is not None,
         watch_list=args.watch or [],
         coverage=args.coverage,
         output_file=args.output,
+        backend=args.backend,
+        trace_format=args.format,
+        trace_options=trace_options,
+        sample_hz=args.sample,
+        include=args.include,
+        exclude=args.exclude,
+        capture_values=args.capture_values,
+        value_limit=args.value_limit,
+        async_mode=args.async_mode,
+        multiprocess=args.multiprocess,
+        ring_buffer=args.ring_buffer,
+        dump_signal=args.dump_signal,
+        timing=timing,
     )
     print_or_json(result, args.json)
 
@@ -27,14 +52,32 @@ def handle_diff(args):
     print_or_json(diff_report, args.json)
 
 
+def handle_merge(args):
+    if not os.path.isdir(args.shard_dir):
+        print(f"Shard directory {args.shard_dir} not found.")
+        return
+    try:
+        summary = dt.merge_shards(args.shard_dir, args.output, args.format)
+    except Exception as e:
+        print(f"Error merging trace shards: {e}")
+        return
+    print_or_json(summary, args.json)
+
+
 def handle_report(args):
-    if not os.path.isfile(args.trace_file):
+    if not os.path.exists(args.trace_file):
         print(f"Trace file {args.trace_file} not found.")
         return
-    with open(args.trace_file, "r", encoding="utf-8") as f:
-        events = json.load(f)
+    if args.hot:
+        report = dt.hot_report(dt.iter_trace_events(args.trace_file), args.top)
+        print_hot_report(report, args.json)
+        return
+    if args.timing:
+        report = dt.timing_report(dt.iter_trace_events(args.trace_file), args.top)
+        print_timing_report(report, args.json)
+        return
     counts = {}
-    for ev in events:
+    for ev in dt.iter_trace_events(args.trace_file):
         if ev.get("type") != "call":
             continue
         func = ev.get("func") or ""
@@ -52,17 +95,69 @@ def handle_report(args):
         print_or_json({"info": "Use --coverage to list modules touched"}, args.json)
 
 
-def handle_query_history(args):
-    if not os.path.isfile(args.file):
-        print(f"Trace file {args.file} not found.")
+def print_hot_report(report: Dict, as_json: bool):
+    if as_json:
+        print_or_json(report, True)
         return
+    if not report["samples"]:
+        print("No samples in trace (record them with `whyx run --sample HZ`).")
+        return
+    total = report["samples"]
+    print(f"{total} samples")
+    print("Hot functions (self / total samples):")
+    for f in report["hot_functions"]:
+        print(f"  {f['self']:>7} {f['total']:>7}  {f['func']}")
+    print("Hot stacks:")
+    for s in report["hot_stacks"]:
+        print(f"  {s['count']:>7}  {s['stack']}")
+
+
+def _ms(ns: int) -> str:
+    return f"{ns / 1e6:.3f}"
+
+
+def print_timing_report(report: Dict, as_json: bool):
+    if as_json:
+        print_or_json(report, True)
+        return
+    if not report["timed_calls"]:
+        print("No call timing in trace (record it with `whyx run --timing`).")
+        return
+    print(f"{report['timed_calls']} timed calls (times in ms)")
+    print(
+        f"  {'calls':>7} {'total':>10} {'self':>10} {'p50':>9} {'p95':>9} {'p99':>9}  function"
+    )
+    for f in report["functions"]:
+        print(
+            f"  {f['calls']:>7} {_ms(f['total_ns']):>10} {_ms(f['self_ns']):>10}"
+            f" {_ms(f['p50_ns']):>9} {_ms(f['p95_ns']):>9} {_ms(f['p99_ns']):>9}"
+            f"  {f['func']}"
+        )
+
+
+DEFAULT_TRACE_FILE = "whyx_trace.json"
+
+
+def history_result(target: str, file: Optional[str] = None) -> Dict:
+    """Result of `query history` as printed with --json, or {'error': message}."""
+    file = file or os.path.join(os.getcwd(), DEFAULT_TRACE_FILE)
+    if not os.path.exists(file):
+        return {"error": f"Trace file {file} not found."}
     try:
-        history = dt.get_watch_history(args.file, args.target)
+        history = dt.get_watch_history(file, target)
     except Exception as e:
-        print(f"Error reading trace: {e}")
+        return {"error": f"Error reading trace: {e}"}
+    return {"target": target, "history": history}
+
+
+def handle_query_history(args):
+    result = history_result(args.target, args.file)
+    if "error" in result:
+        print(result["error"])
         return
+    history = result["history"]
     if args.json:
-        print_or_json({"target": args.target, "history": history}, True)
+        print_or_json(result, True)
     else:
         if not history:
             print(f"No assignments to {args.target} were recorded in the trace.")
@@ -76,32 +171,33 @@ def handle_query_history(args):
                 print(f"{file}:{line} - {args.target} set to {val} (by {func_name})")
 
 
+def trace_search_result(
+    trace_file: Optional[str] = None,
+    pattern: Optional[str] = None,
+    type: Optional[str] = None,
+) -> Dict:
+    """Result of `query trace-search` as printed with --json, or {'error': message}."""
+    trace_file = trace_file or os.path.join(os.getcwd(), DEFAULT_TRACE_FILE)
+    if not os.path.exists(trace_file):
+        return {"error": f"Trace file {trace_file} not found."}
+    if not pattern:
+        return {"error": "You must supply a search pattern via --contains or --event."}
+    matches = dt.search_trace(trace_file, pattern=pattern, event_type=type)
+    return {"file": trace_file, "pattern": pattern, "type": type, "matches": matches}
+
+
 def handle_query_trace_search(args):
-    trace_file = (
-        args.trace_file
-        or args.trace_file_flag
-        or os.path.join(os.getcwd(), "whyx_trace.json")
+    result = trace_search_result(
+        args.trace_file or args.trace_file_flag,
+        getattr(args, "pattern", None) or getattr(args, "pattern_alt", None),
+        args.type,
     )
-    if not os.path.isfile(trace_file):
-        print(f"Trace file {trace_file} not found.")
-        return
-
-    pattern = getattr(args, "pattern", None) or getattr(args, "pattern_alt", None)
-    if not pattern:
-        print("You must supply a search pattern via --contains or --event.")
+    if "error" in result:
+        print(result["error"])
         return
-
-    matches = dt.search_trace(trace_file, pattern=pattern, event_type=args.type)
+    matches = result["matches"]
     if args.json:
-        print_or_json(
-            {
-                "file": trace_file,
-                "pattern": pattern,
-                "type": args.type,
-                "matches": matches,
-            },
-            True,
-        )
+        print_or_json(result, True)
     else:
         if not matches:
             print("No matching events found.")
@@ -111,3 +207,9 @@ def handle_query_trace_search(args):
                 idx = m["index"]
                 ev = m["event"]
                 print(f"[{idx}] {ev}")
+
+
+QUERY_METHODS = {
+    "history": history_result,
+    "trace-search": trace_search_result,
+}
@@ -3,17 +3,21 @@
 CLI_DESCRIPTION = "whyx CLI - Intelligent Code Exploration & Tracing (Python MVP)"
 
 INDEX_HELP = "Build static index of the project"
+SERVE_HELP = "Keep the index loaded and answer queries over a socket or stdio"
 
 RUN_HELP = "Run a script with tracing and/or watchpoints"
 DIFF_HELP = "Compare two execution trace files to find behavioral differences"
 REPORT_HELP = "Report coverage/impact from a saved trace"
+MERGE_HELP = "Merge the per-process shards of `run --multiprocess` into one trace"
 
 QUERY_HELP = "Static/dynamic queries"
 Q_CALLERS_HELP = "Find all call chains leading to a function"
 Q_CALLEES_HELP = "List callees of a function"
 Q_FINDPATH_HELP = "Find call paths from A to B"
+Q_REACHABLE_HELP = "Check whether A can reach B through any call chain"
 Q_HISTORY_HELP = "Show history of a watched attribute from a trace file"
 Q_SEARCH_HELP = "Search events inside a trace file"
+Q_BATCH_HELP = "Answer newline-delimited JSON queries from stdin (one result line each)"
 
 LEG_CALLERS_HELP = "(Synonym) Find all call chains that lead to the given function"
 LEG_CALLEES_HELP = "(Synonym) List direct callees of a function"
@@ -2,6 +2,8 @@
 `whyx query` umbrella: hosts subcommands from each feature.
 This module wires only the query subcommands if you want to use it directly.
 (Current CLI entrypoint uses direct registration in cli/__main__.py.)
+
+- batch.py : `query batch` (NDJSON requests spanning every query kind)
 """
 
 from __future__ import annotations
@@ -10,6 +12,7 @@ import argparse
 
 from ..dynamic_tracing import register_dynamic_tracing_commands
 from ..static_index import register_static_index_commands
+from .batch import register_batch_command
 
 
 def register(subparsers: argparse._SubParsersAction) -> None:
@@ -18,3 +21,4 @@ def register(subparsers: argparse._SubParsersAction) -> None:
 
     register_static_index_commands(subparsers, qsubs)
     register_dynamic_tracing_commands(subparsers, qsubs)
+    register_batch_command(qsubs)
@@ -0,0 +1,94 @@
+"""`whyx query batch`: answer newline-delimited JSON queries from stdin."""
+
+import json
+import sys
+from typing import Dict, Optional, TextIO
+
+from ..dynamic_tracing.handlers import QUERY_METHODS as DYNAMIC_QUERY_METHODS
+from ..help import Q_BATCH_HELP
+from ..static_index.session import QUERY_METHODS as STATIC_QUERY_METHODS
+from ..static_index.session import IndexSession
+
+# CLI flag spellings accepted in request objects, mapped to parameter names.
+PARAM_ALIASES = {
+    "from": "source",
+    "to": "target",
+    "contains": "pattern",
+    "event": "pattern",
+}
+KIND_PARAM_ALIASES = {
+    "trace-search": {"file": "trace_file"},
+}
+
+
+def _params(kind: str, request: Dict) -> Dict:
+    aliases = dict(PARAM_ALIASES, **KIND_PARAM_ALIASES.get(kind, {}))
+    params = {}
+    for key, value in request.items():
+        if key == "query":
+            continue
+        key = key.replace("-", "_")
+        params[aliases.get(key, key)] = value
+    return params
+
+
+class BatchRunner:
+    """Loads the index (and call maps) on the first static query, then reuses it."""
+
+    def __init__(self, index_hint: Optional[str] = None, project: str = "."):
+        self.index_hint = index_hint
+        self.project = project
+        self._session: Optional[IndexSession] = None
+
+    @property
+    def session(self) -> IndexSession:
+        if self._session is None:
+            self._session = IndexSession.open(
+                self.index_hint, self.project, long_lived=True
+            )
+        return self._session
+
+    def run(self, request) -> Dict:
+        if not isinstance(request, dict) or not isinstance(request.get("query"), str):
+            return {"error": "Each request must be an object with a 'query' kind"}
+        kind = request["query"]
+        params = _params(kind, request)
+        try:
+            if kind in STATIC_QUERY_METHODS:
+                return STATIC_QUERY_METHODS[kind](self.session, **params)
+            if kind in DYNAMIC_QUERY_METHODS:
+                return DYNAMIC_QUERY_METHODS[kind](**params)
+        except TypeError as e:
+            return {"error": f"Invalid options for '{kind}': {e}"}
+        except Exception as e:
+            return {"error": str(e)}
+        return {"error": f"Unknown query kind: {kind}"}
+
+    def run_stream(self, stdin: TextIO, stdout: TextIO) -> None:
+        for line in stdin:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                result = {"error": f"Invalid JSON: {e}"}
+            else:
+                result = self.run(request)
+            stdout.write(json.dumps(result) + "\n")
+            stdout.flush()
+
+
+def handle_query_batch(args):
+    BatchRunner(args.index, args.project).run_stream(sys.stdin, sys.stdout)
+
+
+def register_batch_command(query_subparsers):
+    parser_q_batch = query_subparsers.add_parser("batch", help=Q_BATCH_HELP)
+    parser_q_batch.add_argument(
+        "--index",
+        help="Path to a saved index (JSON or binary); defaults to ./.whyx_index.json or builds in-memory",
+    )
+    parser_q_batch.add_argument(
+        "--project", default=".", help="Project root when building index if none exists"
+    )
+    parser_q_batch.set_defaults(func=handle_query_batch)
@@ -0,0 +1,15 @@
+"""Query server CLI wiring (`whyx serve`).
+
+- server.py    : QueryServer (JSON-RPC over a Unix socket or stdio)
+- client.py    : thin client `whyx query` uses to reuse a running server
+- handlers.py  : CLI handler for `serve`
+- commands.py  : argparse wiring
+"""
+
+from .commands import register_serve_commands
+from .handlers import handle_serve
+
+__all__ = [
+    "handle_serve",
+    "register_serve_commands",
+]
@@ -0,0 +1,59 @@
+"""Thin client used by `whyx query` to reuse a running `whyx serve`."""
+
+import json
+import os
+import socket
+from typing import Dict, Optional
+
+DEFAULT_SOCKET_NAME = ".whyx.sock"
+
+CONNECT_TIMEOUT = 0.5
+RESPONSE_TIMEOUT = 60.0
+
+
+def default_socket_path() -> str:
+    """$WHYX_SERVER if set, else ./.whyx.sock."""
+    return os.environ.get("WHYX_SERVER") or os.path.join(
+        os.getcwd(), DEFAULT_SOCKET_NAME
+    )
+
+
+def request(
+    method: str,
+    params: Dict,
+    index_file: Optional[str] = None,
+    project: Optional[str] = None,
+    socket_path: Optional[str] = None,
+) -> Optional[Dict]:
+    """
+    Send one JSON-RPC request to a running server and return its result.
+
+    Returns None whenever the query should be answered locally instead: no server
+    socket, connection failure, `WHYX_NO_SERVER` set, or the server reporting that it
+    serves a different index than `index_file`/`project` would select.
+    """
+    if os.environ.get("WHYX_NO_SERVER") or not hasattr(socket, "AF_UNIX"):
+        return None
+    path = socket_path or default_socket_path()
+    if not os.path.exists(path):
+        return None
+    payload = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": method,
+        "params": dict(params, index=index_file, project=project),
+    }
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(path)
+            sock.settimeout(RESPONSE_TIMEOUT)
+            sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+            with sock.makefile("r", encoding="utf-8") as f:
+                line = f.readline()
+        response = json.loads(line)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(response, dict) or "result" not in response:
+        return None
+    return response["result"]
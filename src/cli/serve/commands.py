@@ -0,0 +1,25 @@
+"""Argparse wiring for `whyx serve`."""
+
+from ..help import SERVE_HELP
+from .handlers import handle_serve
+
+
+def register_serve_commands(subparsers):
+    parser_serve = subparsers.add_parser("serve", help=SERVE_HELP)
+    parser_serve.add_argument(
+        "--index",
+        help="Path to a saved index (JSON or binary); defaults to ./.whyx_index.json or builds in-memory",
+    )
+    parser_serve.add_argument(
+        "--project", default=".", help="Project root when building index if none exists"
+    )
+    parser_serve.add_argument(
+        "--socket",
+        help="Unix socket path (default: $WHYX_SERVER or ./.whyx.sock)",
+    )
+    parser_serve.add_argument(
+        "--stdio",
+        action="store_true",
+        help="Answer JSON-RPC requests on stdin/stdout instead of a socket",
+    )
+    parser_serve.set_defaults(func=handle_serve)
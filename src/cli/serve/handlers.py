@@ -0,0 +1,51 @@
+"""CLI handler for `whyx serve`."""
+
+import os
+import signal
+import socket
+import sys
+
+from .._shared import print_or_json
+from .client import default_socket_path
+from .server import QueryServer, make_socket_server, serve_stdio
+
+
+def handle_serve(args):
+    server = QueryServer(args.index, args.project)
+    if args.stdio:
+        serve_stdio(server, sys.stdin, sys.stdout)
+        return
+
+    if not hasattr(socket, "AF_UNIX"):
+        print("Unix sockets are not available on this platform; use --stdio.")
+        return
+    path = os.path.abspath(args.socket or default_socket_path())
+    try:
+        sock_server = make_socket_server(server, path)
+    except RuntimeError as e:
+        print(str(e))
+        return
+
+    def _stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _stop)
+    print_or_json(
+        {
+            "socket": path,
+            "index_file": server.session.index_file,
+            "pid": os.getpid(),
+        },
+        args.json,
+    )
+    sys.stdout.flush()
+    try:
+        sock_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock_server.server_close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
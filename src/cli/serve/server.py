@@ -0,0 +1,208 @@
+"""
+Long-running query server for `whyx serve`.
+
+Keeps one `IndexSession` (index, call maps, symbol index) in memory and answers
+JSON-RPC 2.0 requests, one JSON object per line, over a Unix socket or stdio:
+
+  -> {"jsonrpc": "2.0", "id": 1, "method": "callers", "params": {"function": "c1"}}
+  <- {"jsonrpc": "2.0", "id": 1, "result": {"target": "c1", "resolved": ..., "chains": [...]}}
+
+Methods are the static query kinds (see `static_index.session.QUERY_METHODS`) plus
+`ping`. Results are the same dicts `whyx --json query ...` prints. The index file is
+re-stat'ed before every request and reloaded when it changes on disk; a server
+started without an index file re-fingerprints the project tree instead, at
+most once per TREE_CHECK_INTERVAL seconds, and rebuilds its in-memory index
+when a module changed.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Dict, Optional, TextIO
+
+from ...static_analysis.cache import tree_fingerprint
+from .._shared import find_index_file
+from ..static_index.session import QUERY_METHODS, IndexSession
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+INDEX_MISMATCH = -32001
+
+# Minimum seconds between two walks of the project tree for an in-memory index.
+TREE_CHECK_INTERVAL = 1.0
+
+
+class QueryServer:
+    def __init__(self, index_hint: Optional[str] = None, project: str = "."):
+        self.project = os.path.abspath(project)
+        self._lock = threading.Lock()
+        # Fingerprint of the project tree an in-memory session was built from
+        # (None when serving an index file), taken before the build so edits
+        # made during it are picked up by the next request.
+        self._tree: Optional[str] = None
+        # Held by the one request thread walking the tree; others don't wait.
+        self._tree_check = threading.Lock()
+        self._tree_checked_at = time.monotonic()
+        if find_index_file(index_hint) is None:
+            self._tree = tree_fingerprint(self.project)[0]
+        self.session = IndexSession.open(index_hint, project, long_lived=True)
+
+    def _refresh_tree(self) -> None:
+        """
+        Rebuild an in-memory session if the project's modules changed. The walk
+        and the rebuild run outside `_lock`, so other requests keep being
+        answered from the current session meanwhile.
+        """
+        now = time.monotonic()
+        if now - self._tree_checked_at < TREE_CHECK_INTERVAL:
+            return
+        if not self._tree_check.acquire(blocking=False):
+            return
+        try:
+            self._tree_checked_at = now
+            tree = tree_fingerprint(self.project)[0]
+            if tree == self._tree:
+                return
+            try:
+                session = IndexSession.open(None, self.project, long_lived=True)
+            except Exception:
+                # Keep serving the previous index; the next check retries.
+                return
+            with self._lock:
+                self.session = session
+                self._tree = tree
+        finally:
+            self._tree_check.release()
+
+    def current_session(self) -> IndexSession:
+        """
+        Return the live session, reloading it first if the index file changed
+        or, for an index built in memory, if the project's modules changed
+        (checked at most every TREE_CHECK_INTERVAL seconds).
+        """
+        if self.session.index_file is None:
+            self._refresh_tree()
+        with self._lock:
+            session = self.session
+            if (
+                session.index_file is not None
+                and session.is_stale()
+                and os.path.isfile(session.index_file)
+            ):
+                try:
+                    self.session = IndexSession.open(
+                        session.index_file, self.project, long_lived=True
+                    )
+                except Exception:
+                    # Mid-write or unreadable: keep serving the previous index.
+                    pass
+            return self.session
+
+    def _serves(self, session: IndexSession, params: Dict) -> bool:
+        """Whether this server answers for the index a client would have loaded."""
+        index_file = params.pop("index", None)
+        project = params.pop("project", None)
+        if index_file is not None:
+            return session.index_file == os.path.abspath(index_file)
+        if project is not None:
+            return session.index_file is None and self.project == project
+        return True
+
+    def handle(self, request) -> Dict:
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return _error(None, INVALID_REQUEST, "Invalid request")
+        req_id = request.get("id")
+        method = request["method"]
+        params = request.get("params") or {}
+        if not isinstance(params, dict):
+            return _error(req_id, INVALID_PARAMS, "params must be an object")
+
+        session = self.current_session()
+        if not self._serves(session, params):
+            return _error(req_id, INDEX_MISMATCH, "Server uses a different index")
+        if method == "ping":
+            return _result(
+                req_id,
+                {
+                    "pid": os.getpid(),
+                    "index_file": session.index_file,
+                    "project": self.project,
+                },
+            )
+        func = QUERY_METHODS.get(method)
+        if func is None:
+            return _error(req_id, METHOD_NOT_FOUND, f"Unknown method: {method}")
+        try:
+            return _result(req_id, func(session, **params))
+        except TypeError as e:
+            return _error(req_id, INVALID_PARAMS, str(e))
+        except Exception as e:
+            return _error(req_id, INTERNAL_ERROR, str(e))
+
+    def handle_line(self, line: str) -> str:
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            response = _error(None, PARSE_ERROR, str(e))
+        else:
+            response = self.handle(request)
+        return json.dumps(response)
+
+
+def _result(req_id, result) -> Dict:
+    return {"jsonrpc": "2.0", "id": req_id, "result": result}
+
+
+def _error(req_id, code: int, message: str) -> Dict:
+    return {
+        "jsonrpc": "2.0",
+        "id": req_id,
+        "error": {"code": code, "message": message},
+    }
+
+
+def serve_stdio(server: QueryServer, stdin: TextIO, stdout: TextIO) -> None:
+    for line in stdin:
+        if not line.strip():
+            continue
+        stdout.write(server.handle_line(line) + "\n")
+        stdout.flush()
+
+
+def socket_in_use(path: str) -> bool:
+    """True if something is accepting connections on the Unix socket at `path`."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(0.5)
+            sock.connect(path)
+        return True
+    except OSError:
+        return False
+
+
+def make_socket_server(server: QueryServer, path: str):
+    """Bind a threading Unix socket server at `path` (a stale socket file is replaced)."""
+    if os.path.exists(path):
+        if socket_in_use(path):
+            raise RuntimeError(f"A server is already listening on {path}")
+        os.unlink(path)
+
+    class _Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                line = raw.decode("utf-8", errors="replace")
+                if not line.strip():
+                    continue
+                self.wfile.write(server.handle_line(line).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+    class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    return _Server(path, _Handler)
@@ -2,6 +2,7 @@
 
 This package now splits the previous monolithic implementation into:
 - queries.py   : low-level static query helpers (_query_callers/_query_callees/_query_find_paths)
+- session.py   : IndexSession (loaded index + call maps) and query result builders
 - handlers.py  : CLI handlers for index and query subcommands
 - commands.py  : argparse wiring to register all static-index related commands
 
@@ -14,6 +15,7 @@ from .handlers import (
     handle_query_callees,
     handle_query_callers,
     handle_query_find_paths,
+    handle_query_reachable,
 )
 from .queries import _query_callees, _query_callers, _query_find_paths
 
@@ -25,5 +27,6 @@ __all__ = [
     "handle_query_callers",
     "handle_query_callees",
     "handle_query_find_paths",
+    "handle_query_reachable",
     "register_static_index_commands",
 ]
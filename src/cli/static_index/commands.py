@@ -1,11 +1,18 @@
 """Argparse wiring for static indexing & queries (logic preserved)."""
 
-from ..help import INDEX_HELP, Q_CALLEES_HELP, Q_CALLERS_HELP, Q_FINDPATH_HELP
+from ..help import (
+    INDEX_HELP,
+    Q_CALLEES_HELP,
+    Q_CALLERS_HELP,
+    Q_FINDPATH_HELP,
+    Q_REACHABLE_HELP,
+)
 from .handlers import (
     handle_index,
     handle_query_callees,
     handle_query_callers,
     handle_query_find_paths,
+    handle_query_reachable,
 )
 
 
@@ -18,7 +25,28 @@ def register_static_index_commands(subparsers, query_subparsers):
         help="Path to project (default: current directory)",
     )
     parser_index.add_argument(
-        "-o", "--output", help="File path to save the index (JSON)"
+        "-o",
+        "--output",
+        help="File path to save the index (default: .whyx_index.json, or .whyx_index.bin with --format binary)",
+    )
+    parser_index.add_argument(
+        "--format",
+        dest="index_format",
+        choices=["json", "binary"],
+        default="json",
+        help="On-disk index format; binary is compact and memory-mapped on load",
+    )
+    parser_index.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Parse files in N worker processes (0 = one per CPU; default: 1)",
+    )
+    parser_index.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-parse only files changed since the existing index file was written",
     )
     parser_index.set_defaults(func=handle_index)
 
@@ -28,7 +56,7 @@ def register_static_index_commands(subparsers, query_subparsers):
     )
     parser_q_callers.add_argument(
         "--index",
-        help="Path to a saved index JSON; defaults to ./.whyx_index.json or builds in-memory",
+        help="Path to a saved index (JSON or binary); defaults to ./.whyx_index.json or builds in-memory",
     )
     parser_q_callers.add_argument(
         "--project", default=".", help="Project root when building index if none exists"
@@ -43,7 +71,9 @@ def register_static_index_commands(subparsers, query_subparsers):
 
     parser_q_callees = query_subparsers.add_parser("callees", help=Q_CALLEES_HELP)
     parser_q_callees.add_argument("function", help="Target function (fully qualified)")
-    parser_q_callees.add_argument("--index", help="Path to a saved index JSON")
+    parser_q_callees.add_argument(
+        "--index", help="Path to a saved index (JSON or binary)"
+    )
     parser_q_callees.add_argument(
         "--project", default=".", help="Project root when building index if none exists"
     )
@@ -65,7 +95,7 @@ def register_static_index_commands(subparsers, query_subparsers):
         required=True,
         help="Target function (fully qualified or resolvable suffix)",
     )
-    parser_q_find.add_argument("--index", help="Path to a saved index JSON")
+    parser_q_find.add_argument("--index", help="Path to a saved index (JSON or binary)")
     parser_q_find.add_argument(
         "--project", default=".", help="Project root when building index if none exists"
     )
@@ -75,4 +105,30 @@ def register_static_index_commands(subparsers, query_subparsers):
     parser_q_find.add_argument(
         "--max-depth", type=int, default=32, help="Maximum depth of paths"
     )
+    parser_q_find.add_argument(
+        "--shortest",
+        action="store_true",
+        help="Return shortest paths first (bidirectional BFS), then longer ones",
+    )
     parser_q_find.set_defaults(func=handle_query_find_paths)
+
+    parser_q_reach = query_subparsers.add_parser("reachable", help=Q_REACHABLE_HELP)
+    parser_q_reach.add_argument(
+        "--from",
+        dest="source",
+        required=True,
+        help="Source function (fully qualified or resolvable suffix)",
+    )
+    parser_q_reach.add_argument(
+        "--to",
+        dest="target",
+        required=True,
+        help="Target function (fully qualified or resolvable suffix)",
+    )
+    parser_q_reach.add_argument(
+        "--index", help="Path to a saved index (JSON or binary)"
+    )
+    parser_q_reach.add_argument(
+        "--project", default=".", help="Project root when building index if none exists"
+    )
+    parser_q_reach.set_defaults(func=handle_query_reachable)
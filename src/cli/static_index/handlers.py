@@ -1,16 +1,33 @@
 """CLI handlers for static indexing and static queries (logic preserved)."""
 
 import os
+from typing import Dict
 
 from ... import static_analysis
-from .._shared import load_or_build_index, print_or_json, resolve_symbol_suffix
-from .queries import _query_callees, _query_callers, _query_find_paths
+from .._shared import find_index_file, print_or_json
+from ..serve import client
+from .session import QUERY_METHODS, IndexSession
 
 
 def handle_index(args):
     proj_path = args.path
-    output = args.output or os.path.join(proj_path, ".whyx_index.json")
-    index_data = static_analysis.build_index(proj_path, output_file=output)
+    default_name = (
+        ".whyx_index.bin" if args.index_format == "binary" else ".whyx_index.json"
+    )
+    output = args.output or os.path.join(proj_path, default_name)
+    previous = None
+    if args.incremental and os.path.isfile(output):
+        try:
+            previous = static_analysis.load_index(output)
+        except Exception:
+            previous = None
+    index_data = static_analysis.build_index(
+        proj_path,
+        output_file=output,
+        jobs=args.jobs,
+        previous=previous,
+        output_format=args.index_format,
+    )
     out = {
         "project": proj_path,
         "functions": len(index_data["functions"]),
@@ -20,27 +37,48 @@ def handle_index(args):
     print_or_json(out, args.json)
 
 
+def run_static_query(method: str, params: Dict, args) -> Dict:
+    """
+    Answer a static query through a running `whyx serve` for the same index when one
+    is reachable, else by loading the index in-process.
+    """
+    index_file = find_index_file(args.index)
+    result = client.request(
+        method,
+        params,
+        index_file=os.path.abspath(index_file) if index_file else None,
+        project=os.path.abspath(args.project),
+    )
+    if result is not None:
+        return result
+    session = IndexSession.open(args.index, args.project)
+    return QUERY_METHODS[method](session, **params)
+
+
 def handle_query_callers(args):
-    index_data = load_or_build_index(args.index, args.project)
-    target_in = args.function
-    target_res, amb = resolve_symbol_suffix(index_data, target_in)
-    if amb:
-        if args.json:
-            print_or_json(
-                {"error": "ambiguous", "input": target_in, "candidates": amb}, True
-            )
+    result = run_static_query(
+        "callers",
+        {"function": args.function, "max_depth": args.max_depth, "limit": args.limit},
+        args,
+    )
+    print_callers_result(result, args.json)
+
+
+def print_callers_result(result: Dict, as_json: bool):
+    if result.get("error") == "ambiguous":
+        if as_json:
+            print_or_json(result, True)
         else:
-            print(f"Ambiguous function '{target_in}'. Did you mean:")
-            for c in amb:
+            print(f"Ambiguous function '{result['input']}'. Did you mean:")
+            for c in result["candidates"]:
                 print(f" - {c}")
         return
 
-    target = target_res
-    chains = _query_callers(
-        index_data, target, max_depth=args.max_depth, limit=args.limit
-    )
-    if args.json:
-        print_or_json({"target": target_in, "resolved": target, "chains": chains}, True)
+    target_in = result["target"]
+    target = result["resolved"]
+    chains = result["chains"]
+    if as_json:
+        print_or_json(result, True)
     else:
         if target != target_in:
             print(f"(Resolved '{target_in}' -> '{target}')")
@@ -53,96 +91,85 @@ def handle_query_callers(args):
 
 
 def handle_query_callees(args):
-    index_data = load_or_build_index(args.index, args.project)
-    target_in = args.function
-    target_res, amb = resolve_symbol_suffix(index_data, target_in)
-    if amb:
-        if args.json:
-            print_or_json(
-                {"error": "ambiguous", "input": target_in, "candidates": amb}, True
-            )
+    result = run_static_query(
+        "callees", {"function": args.function, "transitive": args.transitive}, args
+    )
+    print_callees_result(result, args.json)
+
+
+def print_callees_result(result: Dict, as_json: bool):
+    if result.get("error") == "ambiguous":
+        if as_json:
+            print_or_json(result, True)
         else:
-            print(f"Ambiguous function '{target_in}'. Did you mean:")
-            for c in amb:
+            print(f"Ambiguous function '{result['input']}'. Did you mean:")
+            for c in result["candidates"]:
                 print(f" - {c}")
         return
 
-    target = target_res
-    result = _query_callees(index_data, target, transitive=args.transitive)
-    if args.json:
-        print_or_json(
-            {
-                "target": target_in,
-                "resolved": target,
-                "callees": result,
-                "transitive": args.transitive,
-            },
-            True,
-        )
+    target_in = result["target"]
+    target = result["resolved"]
+    transitive = result["transitive"]
+    callees = result["callees"]
+    if as_json:
+        print_or_json(result, True)
     else:
         if target != target_in:
             print(f"(Resolved '{target_in}' -> '{target}')")
-        if not result:
+        if not callees:
             print(
                 f"{target} does not call any other functions directly."
-                if not args.transitive
+                if not transitive
                 else f"No transitive callees found for {target}."
             )
         else:
-            header = "directly calls" if not args.transitive else "transitively calls"
+            header = "directly calls" if not transitive else "transitively calls"
             print(f"{target} {header}:")
-            for c in result:
+            for c in callees:
                 print(f" - {c}")
 
 
 def handle_query_find_paths(args):
-    index_data = load_or_build_index(args.index, args.project)
-
-    src_in = args.source
-    tgt_in = args.target
-    src_res, amb_s = resolve_symbol_suffix(index_data, src_in)
-    tgt_res, amb_t = resolve_symbol_suffix(index_data, tgt_in)
-
-    if amb_s or amb_t:
-        if args.json:
-            print_or_json(
-                {
-                    "error": "ambiguous",
-                    "from_input": src_in,
-                    "from_candidates": amb_s,
-                    "to_input": tgt_in,
-                    "to_candidates": amb_t,
-                },
-                True,
-            )
-        else:
-            if amb_s:
-                print(f"Ambiguous source '{src_in}'. Did you mean:")
-                for c in amb_s:
-                    print(f" - {c}")
-            if amb_t:
-                print(f"Ambiguous target '{tgt_in}'. Did you mean:")
-                for c in amb_t:
-                    print(f" - {c}")
-        return
+    result = run_static_query(
+        "find-path",
+        {
+            "source": args.source,
+            "target": args.target,
+            "limit": args.limit,
+            "max_depth": args.max_depth,
+            "shortest": getattr(args, "shortest", False),
+        },
+        args,
+    )
+    print_find_paths_result(result, args.json)
 
-    src = src_res
-    tgt = tgt_res
 
-    paths = _query_find_paths(
-        index_data, src, tgt, limit=args.limit, max_depth=args.max_depth
-    )
-    if args.json:
-        print_or_json(
-            {
-                "source": src_in,
-                "source_resolved": src,
-                "target": tgt_in,
-                "target_resolved": tgt,
-                "paths": paths,
-            },
-            True,
-        )
+def _print_ambiguous_endpoints(result: Dict, as_json: bool):
+    if as_json:
+        print_or_json(result, True)
+    else:
+        if result["from_candidates"]:
+            print(f"Ambiguous source '{result['from_input']}'. Did you mean:")
+            for c in result["from_candidates"]:
+                print(f" - {c}")
+        if result["to_candidates"]:
+            print(f"Ambiguous target '{result['to_input']}'. Did you mean:")
+            for c in result["to_candidates"]:
+                print(f" - {c}")
+
+
+def print_find_paths_result(result: Dict, as_json: bool):
+    if result.get("error") == "ambiguous":
+        _print_ambiguous_endpoints(result, as_json)
+        return
+
+    src_in = result["source"]
+    src = result["source_resolved"]
+    tgt_in = result["target"]
+    tgt = result["target_resolved"]
+    paths = result["paths"]
+    if as_json:
+        print_or_json(result, True)
     else:
         any_resolved = (src != src_in) or (tgt != tgt_in)
         if any_resolved:
@@ -155,3 +182,30 @@ def handle_query_find_paths(args):
             print(f"Found {len(paths)} path(s):")
             for p in paths:
                 print(" - " + " -> ".join(p))
+
+
+def handle_query_reachable(args):
+    result = run_static_query(
+        "reachable", {"source": args.source, "target": args.target}, args
+    )
+    print_reachable_result(result, args.json)
+
+
+def print_reachable_result(result: Dict, as_json: bool):
+    if result.get("error") == "ambiguous":
+        _print_ambiguous_endpoints(result, as_json)
+        return
+
+    src_in = result["source"]
+    src = result["source_resolved"]
+    tgt_in = result["target"]
+    tgt = result["target_resolved"]
+    if as_json:
+        print_or_json(result, True)
+    else:
+        if (src != src_in) or (tgt != tgt_in):
+            print(
+                f"(Resolved '--from {src_in}' -> '{src}', '--to {tgt_in}' -> '{tgt}')"
+            )
+        verb = "can reach" if result["reachable"] else "cannot reach"
+        print(f"{src} {verb} {tgt}.")
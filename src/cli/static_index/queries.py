@@ -1,15 +1,23 @@
 """Static index query helpers (logic preserved)."""
 
-from typing import Dict, List
+from typing import Dict, List, Mapping, Optional
 
 from ... import static_analysis
 
 
 def _query_callers(
-    index_data: Dict, target: str, max_depth: int = 64, limit: int = 200
+    index_data: Dict,
+    target: str,
+    max_depth: int = 64,
+    limit: int = 200,
+    callers_map: Optional[Mapping] = None,
 ) -> List[List[str]]:
-    callers_map, _ = static_analysis.build_call_maps(index_data)
+    if callers_map is None:
+        callers_map, _ = static_analysis.get_call_maps(index_data)
     results: List[List[str]] = []
+    # Only expand callers that can still reach a root within the remaining depth.
+    to_root = static_analysis.distances_to_roots(target, callers_map, max_depth)
+    unreachable = max_depth + 1
 
     def dfs(callee: str, path: List[str], depth: int):
         nonlocal results
@@ -22,18 +30,30 @@ def _query_callers(
         for caller in parents:
             if caller in path:
                 continue
+            if depth + 1 + to_root.get(caller, unreachable) > max_depth:
+                continue
             dfs(caller, [caller] + path, depth + 1)
 
-    dfs(target, [target], 0)
+    if to_root.get(target, unreachable) <= max_depth:
+        dfs(target, [target], 0)
     return results
 
 
 def _query_callees(
-    index_data: Dict, target: str, transitive: bool = False, max_depth: int = 64
+    index_data: Dict,
+    target: str,
+    transitive: bool = False,
+    max_depth: int = 64,
+    callees_map: Optional[Mapping] = None,
+    reachability: Optional[static_analysis.Reachability] = None,
 ) -> List[str]:
-    _, callees_map = static_analysis.build_call_maps(index_data)
+    if callees_map is None:
+        _, callees_map = static_analysis.get_call_maps(index_data)
     if not transitive:
         return sorted(set(callees_map.get(target, [])))
+    if reachability is not None:
+        # Read straight from the persisted labels instead of walking the graph.
+        return reachability.descendants(target)
     seen = set()
     stack = [(target, 0)]
     while stack:
@@ -48,9 +68,21 @@ def _query_callees(
 
 
 def _query_find_paths(
-    index_data: Dict, source: str, target: str, limit: int = 50, max_depth: int = 32
+    index_data: Dict,
+    source: str,
+    target: str,
+    limit: int = 50,
+    max_depth: int = 32,
+    forward: Optional[Mapping] = None,
+    reverse: Optional[Mapping] = None,
+    shortest: bool = False,
 ):
-    _, forward = static_analysis.build_call_maps(index_data)
+    if forward is None or reverse is None:
+        reverse, forward = static_analysis.get_call_maps(index_data)
+    if shortest:
+        return static_analysis.find_shortest_paths(
+            source, target, forward, reverse, limit=limit, max_depth=max_depth
+        )
     return static_analysis.find_all_paths(
-        source, target, forward, limit=limit, max_depth=max_depth
+        source, target, forward, limit=limit, max_depth=max_depth, reverse_adj=reverse
     )
@@ -0,0 +1,194 @@
+"""
+Loaded index + derived lookup structures, and the static query result builders.
+
+Handlers, `whyx serve` and anything else answering static queries go through
+`IndexSession` so the call maps are built once per loaded index. Long-lived
+sessions (`serve`, `query batch`) also build a SymbolIndex for name resolution;
+one-shot queries scan the function list instead, which is far cheaper than
+building the index for a single lookup.
+Each builder returns exactly the dict the CLI prints with `--json`.
+"""
+
+import os
+from typing import Dict, List, Optional, Tuple
+
+from ... import static_analysis
+from .._shared import find_index_file, load_or_build_index
+from .queries import _query_callees, _query_callers, _query_find_paths
+
+
+def file_signature(path: Optional[str]) -> Optional[Tuple[int, int, int]]:
+    """(inode, size, mtime_ns) of a file, used to notice when an index is rewritten."""
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class IndexSession:
+    """
+    An index plus its call maps and, for `long_lived` sessions, its SymbolIndex
+    (built lazily, then kept).
+    """
+
+    def __init__(
+        self,
+        index_data: Dict,
+        index_file: Optional[str] = None,
+        long_lived: bool = False,
+    ):
+        self.index_data = index_data
+        self.long_lived = long_lived
+        self.index_file = os.path.abspath(index_file) if index_file else None
+        self.signature = file_signature(self.index_file)
+        self.callers_map, self.callees_map = static_analysis.get_call_maps(index_data)
+        self._symbols: Optional[static_analysis.SymbolIndex] = None
+        self._reachability: Optional[static_analysis.Reachability] = None
+
+    @classmethod
+    def open(
+        cls,
+        index_hint: Optional[str] = None,
+        project: str = ".",
+        long_lived: bool = False,
+    ):
+        index_file = find_index_file(index_hint)
+        return cls(load_or_build_index(index_file, project), index_file, long_lived)
+
+    @property
+    def symbols(self) -> static_analysis.SymbolIndex:
+        if self._symbols is None:
+            self._symbols = static_analysis.SymbolIndex(
+                self.index_data.get("functions", [])
+            )
+        return self._symbols
+
+    def resolve(self, name: str) -> Tuple[str, Optional[List[str]]]:
+        """Resolve a short/suffix name (see cli._shared.resolve_symbol_suffix)."""
+        if self.long_lived:
+            return self.symbols.resolve(name)
+        return static_analysis.scan_symbols(self.index_data.get("functions", []), name)
+
+    @property
+    def reachability(self) -> Optional[static_analysis.Reachability]:
+        """Persisted reachability labels, or None for indexes written without them."""
+        if self._reachability is None:
+            self._reachability = static_analysis.get_reachability(self.index_data)
+        return self._reachability
+
+    def reachable(self, source: str, target: str) -> bool:
+        if self._reachability is None:
+            self._reachability = static_analysis.get_reachability(
+                self.index_data, compute=True
+            )
+        return self._reachability.reachable(source, target)
+
+    def is_stale(self) -> bool:
+        return self.index_file is not None and (
+            file_signature(self.index_file) != self.signature
+        )
+
+
+def callers_result(
+    session: IndexSession, function: str, max_depth: int = 64, limit: int = 200
+) -> Dict:
+    target_res, amb = session.resolve(function)
+    if amb:
+        return {"error": "ambiguous", "input": function, "candidates": amb}
+    chains = _query_callers(
+        session.index_data,
+        target_res,
+        max_depth=max_depth,
+        limit=limit,
+        callers_map=session.callers_map,
+    )
+    return {"target": function, "resolved": target_res, "chains": chains}
+
+
+def callees_result(
+    session: IndexSession, function: str, transitive: bool = False
+) -> Dict:
+    target_res, amb = session.resolve(function)
+    if amb:
+        return {"error": "ambiguous", "input": function, "candidates": amb}
+    result = _query_callees(
+        session.index_data,
+        target_res,
+        transitive=transitive,
+        callees_map=session.callees_map,
+        reachability=session.reachability if transitive else None,
+    )
+    return {
+        "target": function,
+        "resolved": target_res,
+        "callees": result,
+        "transitive": transitive,
+    }
+
+
+def find_paths_result(
+    session: IndexSession,
+    source: str,
+    target: str,
+    limit: int = 50,
+    max_depth: int = 32,
+    shortest: bool = False,
+) -> Dict:
+    src_res, amb_s = session.resolve(source)
+    tgt_res, amb_t = session.resolve(target)
+    if amb_s or amb_t:
+        return {
+            "error": "ambiguous",
+            "from_input": source,
+            "from_candidates": amb_s,
+            "to_input": target,
+            "to_candidates": amb_t,
+        }
+    paths = _query_find_paths(
+        session.index_data,
+        src_res,
+        tgt_res,
+        limit=limit,
+        max_depth=max_depth,
+        forward=session.callees_map,
+        reverse=session.callers_map,
+        shortest=shortest,
+    )
+    return {
+        "source": source,
+        "source_resolved": src_res,
+        "target": target,
+        "target_resolved": tgt_res,
+        "paths": paths,
+    }
+
+
+def reachable_result(session: IndexSession, source: str, target: str) -> Dict:
+    src_res, amb_s = session.resolve(source)
+    tgt_res, amb_t = session.resolve(target)
+    if amb_s or amb_t:
+        return {
+            "error": "ambiguous",
+            "from_input": source,
+            "from_candidates": amb_s,
+            "to_input": target,
+            "to_candidates": amb_t,
+        }
+    return {
+        "source": source,
+        "source_resolved": src_res,
+        "target": target,
+        "target_resolved": tgt_res,
+        "reachable": session.reachable(src_res, tgt_res),
+    }
+
+
+QUERY_METHODS = {
+    "callers": callers_result,
+    "callees": callees_result,
+    "find-path": find_paths_result,
+    "reachable": reachable_result,
+}
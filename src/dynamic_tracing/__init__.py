@@ -5,6 +5,15 @@ This package exposes the same public API as before, but its implementation
 is now split across smaller modules:
 
 - runner.py     : run_script (tracing, watchpoints, coverage)
+- watchpoints.py : --watch hooks (class creation / post-import) + setattr patching
+- backends.py   : event sources for run_script (sys.settrace / sys.monitoring)
+- sampler.py    : statistical stack sampler (run --sample) + hot_report
+- timing.py     : call timestamps (run --timing) + timing_report
+- trace_io.py   : trace writers, the format-detecting readers, process shards
+- binary_trace.py : compact binary trace format (string table + packed records)
+- chunked_trace.py : compressed trace chunks with a seek index
+- values.py     : value capture policies for return/assign events
+- multiprocess.py : run --multiprocess (tracing multiprocessing children)
 - diffing.py    : diff_traces (trace diff)
 - history.py    : get_watch_history (watched assignments)
 - search.py     : search_trace (trace event search)
@@ -16,11 +25,25 @@ Public API is preserved to avoid any CLI or import changes.
 from .diffing import diff_traces
 from .history import get_watch_history
 from .runner import run_script
+from .sampler import hot_report
 from .search import search_trace
+from .timing import timing_report
+from .trace_io import (
+    TRACE_FORMATS,
+    iter_trace_events,
+    load_trace_events,
+    merge_shards,
+)
 
 __all__ = [
     "run_script",
     "diff_traces",
     "get_watch_history",
     "search_trace",
+    "iter_trace_events",
+    "load_trace_events",
+    "TRACE_FORMATS",
+    "merge_shards",
+    "hot_report",
+    "timing_report",
 ]
@@ -0,0 +1,220 @@
+"""
+Tracing backends: how run_script receives call/return events.
+
+Both backends drive the same handler, `handle(frame, event, arg) -> bool`, with
+settrace-style 'call' / 'return' events; the handler returns False for frames
+it ignores.
+
+- SettraceBackend   : sys.settrace + threading.settrace (any Python version).
+  Line events are switched off per frame (f_trace_lines), and ignored frames
+  get no local trace function, so CPython stops sending their return events.
+- MonitoringBackend : sys.monitoring (PEP 669, Python 3.12+). Only function
+  start/resume/return/yield events are registered. Code objects the handler
+  ignores are switched off with DISABLE, so they cost nothing after their
+  first event.
+
+With `async_aware`, generator and coroutine frames report 'resume' instead of
+'call' when they continue after a yield/await, and 'yield' instead of
+'return' when they suspend. sys.monitoring tells these apart directly
+(PY_RESUME / PY_YIELD); under settrace they are read off the frame's current
+instruction.
+"""
+
+import dis
+import inspect
+import sys
+import threading
+from typing import Callable, Dict
+
+from .utils import evict_when_freed
+
+BACKENDS = ("auto", "settrace", "monitoring")
+
+Handler = Callable[[object, str, object], bool]
+
+# Function-level events, mapped onto settrace's 'call' / 'return'.
+_FUNCTION_EVENTS = (
+    "PY_START",
+    "PY_RESUME",
+    "PY_THROW",
+    "PY_RETURN",
+    "PY_YIELD",
+    "PY_UNWIND",
+)
+
+
+_SUSPENDABLE = (
+    inspect.CO_GENERATOR
+    | inspect.CO_COROUTINE
+    | inspect.CO_ASYNC_GENERATOR
+    | inspect.CO_ITERABLE_COROUTINE
+)
+_RESUME = dis.opmap.get("RESUME")  # 3.11+; its oparg is 0 only at function start
+_YIELDS = {
+    dis.opmap[name] for name in ("YIELD_VALUE", "YIELD_FROM") if name in dis.opmap
+}
+
+# id(code) -> (co_code, weak reference to the code); co_code builds a fresh
+# bytes object per access. Entries leave when their code object is freed.
+_co_code: Dict[int, tuple] = {}
+
+
+def _instruction(frame):
+    code = frame.f_code
+    entry = _co_code.get(id(code))
+    if entry is None:
+        entry = _co_code[id(code)] = (code.co_code, evict_when_freed(_co_code, code))
+    raw = entry[0]
+    i = frame.f_lasti
+    if i < 0:
+        return None, 0
+    return raw[i], raw[i + 1]
+
+
+def _suspendable_event(frame, event: str) -> str:
+    """Tell a generator/coroutine resume from its first call, and a suspend from its return."""
+    if event == "call":
+        if _RESUME is None:
+            return "resume" if frame.f_lasti >= 0 else "call"
+        op, arg = _instruction(frame)
+        return "resume" if op == _RESUME and arg else "call"
+    if event == "return":
+        op, arg = _instruction(frame)
+        if op in _YIELDS or (op == _RESUME and arg):
+            return "yield"
+    return event
+
+
+def monitoring_available() -> bool:
+    return hasattr(sys, "monitoring")
+
+
+class SettraceBackend:
+    name = "settrace"
+
+    def __init__(self, handle: Handler, async_aware: bool = False):
+        self.handle = handle
+        self.async_aware = async_aware
+
+    def _trace(self, frame, event, arg):
+        if self.async_aware and frame.f_code.co_flags & _SUSPENDABLE:
+            event = _suspendable_event(frame, event)
+        if not self.handle(frame, event, arg):
+            return None
+        frame.f_trace_lines = False
+        return self._trace
+
+    def start(self) -> None:
+        sys.settrace(self._trace)
+        threading.settrace(self._trace)
+
+    def stop(self) -> None:
+        sys.settrace(None)
+        threading.settrace(None)
+
+
+class MonitoringBackend:
+    name = "monitoring"
+
+    def __init__(self, handle: Handler, async_aware: bool = False):
+        self.handle = handle
+        self.async_aware = async_aware
+        self.tool_id = None
+
+    def _acquire_tool_id(self) -> int:
+        mon = sys.monitoring
+        # A tracer is a profiler; the debugger and coverage ids are left to pdb
+        # and coverage.py, which expect to find them free.
+        for tool_id in (mon.PROFILER_ID, 3, 4, mon.OPTIMIZER_ID):
+            try:
+                mon.use_tool_id(tool_id, "whyx")
+            except ValueError:
+                continue
+            return tool_id
+        raise RuntimeError("no free sys.monitoring tool id")
+
+    def start(self) -> None:
+        mon = sys.monitoring
+        ev = mon.events
+        disable = mon.DISABLE
+        handle = self.handle
+        getframe = sys._getframe
+        resume, suspend = (
+            ("resume", "yield") if self.async_aware else ("call", "return")
+        )
+
+        def on_start(code, offset):
+            if not handle(getframe(1), "call", None):
+                return disable
+
+        def on_resume(code, offset):
+            if not handle(getframe(1), resume, None):
+                return disable
+
+        def on_return(code, offset, retval):
+            if not handle(getframe(1), "return", retval):
+                return disable
+
+        def on_yield(code, offset, retval):
+            if not handle(getframe(1), suspend, retval):
+                return disable
+
+        # PY_THROW / PY_UNWIND cannot be disabled per code object.
+        def on_throw(code, offset, exc):
+            handle(getframe(1), resume, None)
+
+        def on_unwind(code, offset, exc):
+            handle(getframe(1), "return", None)
+
+        self.tool_id = tool_id = self._acquire_tool_id()
+        for event, callback in (
+            (ev.PY_START, on_start),
+            (ev.PY_RESUME, on_resume),
+            (ev.PY_THROW, on_throw),
+            (ev.PY_RETURN, on_return),
+            (ev.PY_YIELD, on_yield),
+            (ev.PY_UNWIND, on_unwind),
+        ):
+            mon.register_callback(tool_id, event, callback)
+        events = 0
+        for name in _FUNCTION_EVENTS:
+            events |= getattr(ev, name)
+        mon.set_events(tool_id, events)
+
+    def stop(self) -> None:
+        if self.tool_id is None:
+            return
+        mon = sys.monitoring
+        mon.set_events(self.tool_id, 0)
+        for name in _FUNCTION_EVENTS:
+            mon.register_callback(self.tool_id, getattr(mon.events, name), None)
+        mon.free_tool_id(self.tool_id)
+        # Re-arm code locations we DISABLEd, for later runs in this process.
+        mon.restart_events()
+        self.tool_id = None
+
+
+def start_backend(name: str, handle: Handler, async_aware: bool = False):
+    """
+    Start and return the backend called `name` ('auto' prefers sys.monitoring).
+    Falls back to settrace when sys.monitoring is missing or has no free tool id.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown tracing backend: {name}")
+    if name != "settrace":
+        if monitoring_available():
+            backend = MonitoringBackend(handle, async_aware)
+            try:
+                backend.start()
+                return backend
+            except RuntimeError as e:
+                if name == "monitoring":
+                    print(f"{e}; falling back to settrace", file=sys.stderr)
+        elif name == "monitoring":
+            print(
+                "sys.monitoring is not available; falling back to settrace",
+                file=sys.stderr,
+            )
+    backend = SettraceBackend(handle, async_aware)
+    backend.start()
+    return backend
@@ -0,0 +1,216 @@
+"""
+Compact binary trace format (`whyx run --format binary`).
+
+Layout (all integers little-endian):
+  header  : magic (8s) | version (u32) | record size (u32)
+  records : count x [type | target | func | file | line | value | extra] (u32 each)
+  strings : count (u32) | byte lengths (u32[count]) | utf-8 data
+  trailer : strings offset (u64) | event count (u64) | summary id (u32) | 0 (u32) | end magic (8s)
+
+Every string field (type, target, func, file, value) is an id into the string
+table, which holds each distinct function name, target, file and repr value once.
+`line` is stored inline. Fields an event does not have are NONE (0xFFFFFFFF), and
+any other keys (or fields holding non-string values) go to `extra` as the id of
+a JSON object, so events read back exactly as they were written.
+
+Traces written with a `time_key` (`run --timing`, see timing.py) are version 2:
+the header goes on with the time key (4s, e.g. "t") and each record with that
+field of the event (i64, -1 when it has none), so per-event timestamps are
+stored inline rather than as one distinct `extra` string each.
+
+Records are written as the script runs; the string table and trailer are
+written on close, so a binary trace from a killed process cannot be read
+(use ndjson for crash-tolerant traces).
+"""
+
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Iterator, List, Optional
+
+MAGIC = b"WHYXTRC\0"
+END_MAGIC = b"WHYXEND\0"
+VERSION = 1
+TIMED_VERSION = 2
+NONE = 0xFFFFFFFF
+
+FIELDS = ("type", "target", "func", "file", "line", "value")
+_SLOTS = {key: slot for slot, key in enumerate(FIELDS)}
+_LINE = _SLOTS["line"]
+_TIME = len(FIELDS) + 1
+# Slots holding integers, with their exclusive upper bound.
+_INLINE = {_LINE: NONE, _TIME: 1 << 63}
+
+_HEADER = struct.Struct("<8sII")
+_TIME_KEY = struct.Struct("<4s")
+_RECORD = struct.Struct("<" + "I" * (len(FIELDS) + 1))
+_TIMED_RECORD = struct.Struct(_RECORD.format + "q")
+_TRAILER = struct.Struct("<QQII8s")
+_FLUSH_BYTES = 1 << 16
+
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def is_binary_trace(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class BinaryTraceWriter:
+    """
+    Packs events into fixed-width records, interning strings as it goes.
+    `time_key` ("t" or "dt") stores that field of every event inline.
+    """
+
+    def __init__(self, path: str, time_key: Optional[str] = None):
+        self.path = path
+        self._strings: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._extra_ids: Dict[tuple, int] = {}
+        self._buffer = bytearray()
+        self._count = 0
+        self._file = open(path, "wb")
+        self._slots = _SLOTS
+        self._empty = [NONE] * (len(FIELDS) + 1)
+        self._record = _RECORD
+        if time_key is None:
+            self._file.write(_HEADER.pack(MAGIC, VERSION, _RECORD.size))
+        else:
+            self._slots = dict(_SLOTS, **{time_key: _TIME})
+            self._empty.append(-1)
+            self._record = _TIMED_RECORD
+            self._file.write(_HEADER.pack(MAGIC, TIMED_VERSION, _TIMED_RECORD.size))
+            self._file.write(_TIME_KEY.pack(time_key.encode("ascii")))
+
+    def _intern(self, s: str) -> int:
+        sid = self._ids.get(s)
+        if sid is None:
+            sid = self._ids[s] = len(self._strings)
+            self._strings.append(s)
+        return sid
+
+    def _extra_id(self, extra: Dict) -> int:
+        # Small extras such as {"thread": 3} repeat; skip re-encoding them.
+        try:
+            key = tuple(extra.items())
+            sid = self._extra_ids.get(key)
+        except TypeError:
+            return self._intern(_encode(extra))
+        if sid is None:
+            sid = self._extra_ids[key] = self._intern(_encode(extra))
+        return sid
+
+    def append(self, event: Dict) -> None:
+        fields = self._empty[:]
+        slots = self._slots
+        extra = None
+        for key, value in event.items():
+            slot = slots.get(key, -1)
+            if slot in _INLINE:
+                if type(value) is int and 0 <= value < _INLINE[slot]:
+                    fields[slot] = value
+                    continue
+            elif slot >= 0 and type(value) is str:
+                fields[slot] = self._intern(value)
+                continue
+            if extra is None:
+                extra = {}
+            extra[key] = value
+        if extra is not None:
+            fields[len(FIELDS)] = self._extra_id(extra)
+        self._buffer += self._record.pack(*fields)
+        self._count += 1
+        if len(self._buffer) >= _FLUSH_BYTES:
+            self.flush()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def flush(self) -> None:
+        self._file.write(self._buffer)
+        self._buffer = bytearray()
+
+    def close(self, summary: Optional[Dict] = None) -> None:
+        self.flush()
+        summary_id = self._intern(json.dumps(summary)) if summary else NONE
+        strings_offset = self._file.tell()
+        encoded = [s.encode("utf-8") for s in self._strings]
+        self._file.write(struct.pack("<I", len(encoded)))
+        self._file.write(struct.pack(f"<{len(encoded)}I", *map(len, encoded)))
+        self._file.write(b"".join(encoded))
+        self._file.write(
+            _TRAILER.pack(strings_offset, self._count, summary_id, 0, END_MAGIC)
+        )
+        self._file.close()
+
+
+class BinaryTrace:
+    """Reads a binary trace: `len()`, iteration as event dicts, and the summary."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < _HEADER.size + _TRAILER.size:
+                raise ValueError(f"{path}: incomplete binary trace (no string table)")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mm)
+        magic, version, record_size = _HEADER.unpack_from(buf, 0)
+        records_offset = _HEADER.size
+        self.time_key: Optional[str] = None
+        self._record = _RECORD
+        if magic == MAGIC and version == TIMED_VERSION:
+            (key,) = _TIME_KEY.unpack_from(buf, records_offset)
+            self.time_key = key.rstrip(b"\0").decode("ascii")
+            records_offset += _TIME_KEY.size
+            self._record = _TIMED_RECORD
+        elif version != VERSION:
+            raise ValueError(f"{path}: unsupported binary trace")
+        if magic != MAGIC or record_size != self._record.size:
+            raise ValueError(f"{path}: unsupported binary trace")
+        strings_offset, count, summary_id, _, end = _TRAILER.unpack_from(
+            buf, len(buf) - _TRAILER.size
+        )
+        if end != END_MAGIC:
+            raise ValueError(f"{path}: incomplete binary trace (no string table)")
+        self.count = count
+        self._records = buf[records_offset:strings_offset]
+
+        (n,) = struct.unpack_from("<I", buf, strings_offset)
+        lengths = struct.unpack_from(f"<{n}I", buf, strings_offset + 4)
+        pos = strings_offset + 4 + 4 * n
+        strings: List[str] = []
+        for length in lengths:
+            strings.append(str(buf[pos : pos + length], "utf-8"))
+            pos += length
+        self.strings = strings
+        self.summary = json.loads(strings[summary_id]) if summary_id != NONE else {}
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _decode(self, fields) -> Dict:
+        strings = self.strings
+        event: Dict = {}
+        for slot, key in enumerate(FIELDS):
+            value = fields[slot]
+            if value == NONE:
+                continue
+            event[key] = value if slot == _LINE else strings[value]
+        if fields[len(FIELDS)] != NONE:
+            event.update(json.loads(strings[fields[len(FIELDS)]]))
+        if self.time_key is not None and fields[_TIME] >= 0:
+            event[self.time_key] = fields[_TIME]
+        return event
+
+    def __iter__(self) -> Iterator[Dict]:
+        for fields in self._record.iter_unpack(self._records):
+            yield self._decode(fields)
+
+    def __getitem__(self, i: int) -> Dict:
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        record = self._record
+        return self._decode(record.unpack_from(self._records, i * record.size))
@@ -0,0 +1,212 @@
+"""
+Chunked, compressed trace format (`whyx run --format chunked`).
+
+Layout (all integers little-endian):
+  header  : magic (8s) | version (u32) | codec (4s: b"gzip" or b"lzma")
+  chunks  : count x [compressed length (u32) | event count (u32) | payload]
+  index   : utf-8 JSON (see below)
+  trailer : index offset (u64) | index length (u64) | end magic (8s)
+
+Each payload is `chunk_size` events as newline-delimited JSON, compressed on
+its own. The index holds one entry per chunk:
+
+  {"offset": byte offset of the frame, "length": compressed length,
+   "first": index of the chunk's first event, "last": index of its last event,
+   "types": event types present, "targets": assign targets present}
+
+plus "event_count", "chunk_size", "codec" and the run summary. Readers use the
+per-chunk stats to skip chunks that cannot match a query and decompress only
+the rest. A trace from a killed process has no index; its complete chunks are
+recovered by walking the frame headers.
+"""
+
+import gzip
+import json
+import lzma
+import os
+import struct
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b"WHYXCHK\0"
+END_MAGIC = b"WHYXEND\0"
+VERSION = 1
+CODECS = ("gzip", "lzma")
+DEFAULT_CHUNK_SIZE = 10000
+
+_HEADER = struct.Struct("<8sI4s")
+_FRAME = struct.Struct("<II")
+_TRAILER = struct.Struct("<QQ8s")
+
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    return lzma.compress(data)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "gzip":
+        return gzip.decompress(data)
+    return lzma.decompress(data)
+
+
+def is_chunked_trace(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class ChunkedTraceWriter:
+    """Buffers `chunk_size` events, then compresses and appends them as one chunk."""
+
+    def __init__(
+        self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, codec: str = "gzip"
+    ):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown trace compression: {codec}")
+        self.path = path
+        self.chunk_size = max(1, chunk_size)
+        self.codec = codec
+        self.chunks: List[Dict] = []
+        self._buffer: List[Dict] = []
+        self._count = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, codec.encode("ascii")))
+
+    def append(self, event: Dict) -> None:
+        with self._lock:
+            self._buffer.append(event)
+            full = len(self._buffer) >= self.chunk_size
+        if full:
+            self.flush()
+
+    def __len__(self) -> int:
+        return self._count + len(self._buffer)
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._buffer = self._buffer, []
+            if not pending:
+                return
+            types = set()
+            targets = set()
+            for ev in pending:
+                types.add(ev.get("type"))
+                if ev.get("type") == "assign":
+                    targets.add(ev.get("target"))
+            payload = _compress(
+                self.codec,
+                "".join(_encode(ev) + "\n" for ev in pending).encode("utf-8"),
+            )
+            offset = self._file.tell()
+            self._file.write(_FRAME.pack(len(payload), len(pending)))
+            self._file.write(payload)
+            self._file.flush()
+            self.chunks.append(
+                {
+                    "offset": offset,
+                    "length": len(payload),
+                    "first": self._count,
+                    "last": self._count + len(pending) - 1,
+                    "types": sorted(t for t in types if t is not None),
+                    "targets": sorted(t for t in targets if t is not None),
+                }
+            )
+            self._count += len(pending)
+
+    def close(self, summary: Optional[Dict] = None) -> None:
+        self.flush()
+        index = {
+            "codec": self.codec,
+            "chunk_size": self.chunk_size,
+            "event_count": self._count,
+            "chunks": self.chunks,
+            "summary": summary or {},
+        }
+        blob = json.dumps(index).encode("utf-8")
+        offset = self._file.tell()
+        self._file.write(blob)
+        self._file.write(_TRAILER.pack(offset, len(blob), END_MAGIC))
+        self._file.close()
+
+
+class ChunkedTrace:
+    """Reads a chunked trace, decompressing only the chunks a query needs."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise ValueError(f"{path}: truncated chunked trace")
+            magic, version, codec = _HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path}: unsupported chunked trace")
+            self.codec = codec.decode("ascii")
+            size = os.fstat(f.fileno()).st_size
+            self.index = self._read_index(f, size) or self._scan_frames(f, size)
+        self.chunks: List[Dict] = self.index["chunks"]
+        self.summary: Dict = self.index.get("summary", {})
+
+    @staticmethod
+    def _read_index(f, size: int) -> Optional[Dict]:
+        if size < _HEADER.size + _TRAILER.size:
+            return None
+        f.seek(size - _TRAILER.size)
+        offset, length, end = _TRAILER.unpack(f.read(_TRAILER.size))
+        if end != END_MAGIC:
+            return None
+        f.seek(offset)
+        return json.loads(f.read(length))
+
+    def _scan_frames(self, f, size: int) -> Dict:
+        """Rebuild a stat-less index from frame headers (no trailer was written)."""
+        chunks = []
+        count = 0
+        pos = _HEADER.size
+        while pos + _FRAME.size <= size:
+            f.seek(pos)
+            length, n = _FRAME.unpack(f.read(_FRAME.size))
+            if pos + _FRAME.size + length > size:
+                break
+            chunks.append(
+                {"offset": pos, "length": length, "first": count, "last": count + n - 1}
+            )
+            count += n
+            pos += _FRAME.size + length
+        return {"codec": self.codec, "event_count": count, "chunks": chunks}
+
+    def __len__(self) -> int:
+        return self.index["event_count"]
+
+    def read_chunk(self, chunk: Dict) -> List[Dict]:
+        with open(self.path, "rb") as f:
+            f.seek(chunk["offset"] + _FRAME.size)
+            data = _decompress(self.codec, f.read(chunk["length"]))
+        return [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+    def iter_indexed(
+        self, event_type: Optional[str] = None, target: Optional[str] = None
+    ) -> Iterator[Tuple[int, Dict]]:
+        """
+        Yield (event index, event) from every chunk whose stats allow a match for
+        `event_type` / assign `target`. Events inside a chunk are not filtered.
+        """
+        for chunk in self.chunks:
+            types = chunk.get("types")
+            if event_type and types is not None and event_type not in types:
+                continue
+            targets = chunk.get("targets")
+            if target and targets is not None and target not in targets:
+                continue
+            yield from enumerate(self.read_chunk(chunk), chunk["first"])
+
+    def __iter__(self) -> Iterator[Dict]:
+        for _, event in self.iter_indexed():
+            yield event
@@ -1,16 +1,16 @@
 """Trace differencing for whyx CLI (logic preserved)."""
 
-import json
 from typing import Dict, List
 
+from .trace_io import load_trace_events
+from .values import event_value_key
+
 
 def diff_traces(trace_file1: str, trace_file2: str) -> Dict:
     """Compare two execution trace logs and return a structured report of differences."""
     try:
-        with open(trace_file1, "r", encoding="utf-8") as f1:
-            old_events = json.load(f1)
-        with open(trace_file2, "r", encoding="utf-8") as f2:
-            new_events = json.load(f2)
+        old_events = load_trace_events(trace_file1)
+        new_events = load_trace_events(trace_file2)
     except Exception as e:
         raise FileNotFoundError(f"Could not load trace files: {e}")
 
@@ -21,10 +21,24 @@ def diff_traces(trace_file1: str, trace_file2: str) -> Dict:
     old_watches: Dict[str, List[str]] = {}
     new_watches: Dict[str, List[str]] = {}
 
+    # Traces recorded with `--capture-values hash` only carry digests; compare
+    # every value as a digest then, so hashed and full traces still diff.
+    hashed = any("value_hash" in ev for ev in old_events) or any(
+        "value_hash" in ev for ev in new_events
+    )
+
+    def value_of(ev):
+        return event_value_key(ev) if hashed else ev.get("value")
+
     def process_events(events, edges_set, returns_map, watch_map):
-        call_stack: List[str] = []
+        # One call stack per process (merged shards), thread and asyncio task
+        # (`run --async`); traces without those ids share one.
+        call_stacks: Dict[object, List[str]] = {}
         for ev in events:
             t = ev.get("type")
+            if t in ("call", "return"):
+                key = (ev.get("pid"), ev.get("thread"), ev.get("task"))
+                call_stack = call_stacks.setdefault(key, [])
             if t == "call":
                 f = ev.get("func")
                 if call_stack:
@@ -34,10 +48,10 @@ def diff_traces(trace_file1: str, trace_file2: str) -> Dict:
                 f = ev.get("func")
                 if call_stack and call_stack[-1] == f:
                     call_stack.pop()
-                returns_map.setdefault(f, []).append(ev.get("value"))
+                returns_map.setdefault(f, []).append(value_of(ev))
             elif t == "assign":
                 target = ev.get("target")
-                watch_map.setdefault(target, []).append(ev.get("value"))
+                watch_map.setdefault(target, []).append(value_of(ev))
 
     process_events(old_events, old_edges, old_returns, old_watches)
     process_events(new_events, new_edges, new_returns, new_watches)
@@ -0,0 +1,159 @@
+"""
+Tracing multiprocessing children for `whyx run --multiprocess`.
+
+The run writes a shard directory (see trace_io.list_shards): the script's own
+process and every child started through multiprocessing, including
+concurrent.futures.ProcessPoolExecutor workers, each write their own trace
+shard without any synchronization between processes.
+
+- fork: the child inherits the running TraceSession (backend, watchpoints).
+  os.register_at_fork hooks pause recording in the forking thread and move
+  the session onto a new shard in the child.
+- spawn / forkserver: the child is a fresh interpreter. `Process.start` gives
+  the process object a `_ChildHook`; unpickling it in the child (after
+  multiprocessing has restored the parent's sys.path, so whyx imports as it
+  did in the parent) starts a new TraceSession with the run's options.
+
+Either way the child's shard is written when its process function returns,
+from a wrapper around `BaseProcess._bootstrap` (multiprocessing ends children
+with os._exit, so nothing runs later), or when the child is terminated with
+SIGTERM (`Pool.terminate`, which `with Pool()` calls on exit).
+"""
+
+import os
+import signal
+from typing import Optional
+
+from .trace_io import shard_path
+
+# The ProcessTracing of this process, if the run traces child processes.
+_active: Optional["ProcessTracing"] = None
+_fork_hook_registered = False
+
+
+class _ChildHook:
+    """Pickled with a spawned Process; unpickling it traces the child."""
+
+    def __init__(self, shard_dir: str, script_path: str, options: dict):
+        self.state = (shard_dir, script_path, options)
+
+    def __getstate__(self):
+        return self.state
+
+    def __setstate__(self, state):
+        self.state = state
+        _trace_spawned_child(*state)
+
+
+def _trace_spawned_child(shard_dir: str, script_path: str, options: dict) -> None:
+    if _active is not None:
+        return
+    from .runner import TraceSession
+
+    output_file = shard_path(shard_dir, options.get("trace_format", "json"))
+    session = TraceSession(script_path, output_file, options)
+    ProcessTracing(shard_dir, session, start_session=True).install()
+
+
+def _before_fork() -> None:
+    if _active is not None:
+        _active.session.before_fork()
+
+
+def _after_fork_in_parent() -> None:
+    if _active is not None:
+        _active.session.after_fork_in_parent()
+
+
+def _after_fork_in_child() -> None:
+    tracing = _active
+    if tracing is not None:
+        trace_format = tracing.session.options.get("trace_format", "json")
+        tracing.session.reopen(shard_path(tracing.shard_dir, trace_format))
+
+
+class ProcessTracing:
+    """
+    Propagates a TraceSession into the multiprocessing children of this
+    process. `start_session` is set in spawned children, whose session starts
+    with the process function rather than with the interpreter.
+    """
+
+    def __init__(self, shard_dir: str, session, start_session: bool = False):
+        self.shard_dir = shard_dir
+        self.session = session
+        self.start_session = start_session
+        self._originals = None
+
+    def install(self) -> None:
+        global _active, _fork_hook_registered
+        _active = self
+        if not _fork_hook_registered and hasattr(os, "register_at_fork"):
+            os.register_at_fork(
+                before=_before_fork,
+                after_in_parent=_after_fork_in_parent,
+                after_in_child=_after_fork_in_child,
+            )
+            _fork_hook_registered = True
+
+        from multiprocessing.process import BaseProcess
+
+        original_start = BaseProcess.start
+        original_bootstrap = BaseProcess._bootstrap
+        self._originals = (original_start, original_bootstrap)
+        hook = _ChildHook(
+            self.shard_dir, self.session.script_path, self.session.options
+        )
+
+        def start(process):
+            process._whyx_child_hook = hook
+            return original_start(process)
+
+        def _bootstrap(process, *args, **kwargs):
+            tracing = _active
+            if tracing is None:
+                return original_bootstrap(process, *args, **kwargs)
+            return tracing.run_child(original_bootstrap, process, *args, **kwargs)
+
+        BaseProcess.start = start
+        BaseProcess._bootstrap = _bootstrap
+
+    def uninstall(self) -> None:
+        global _active
+        if _active is self:
+            _active = None
+        if self._originals is not None:
+            from multiprocessing.process import BaseProcess
+
+            BaseProcess.start, BaseProcess._bootstrap = self._originals
+            self._originals = None
+
+    def run_child(self, bootstrap, process, *args, **kwargs):
+        """Run a child process's `_bootstrap` and write the child's shard after it."""
+        session = self.session
+        finished = []
+
+        def finish() -> None:
+            if not finished:
+                finished.append(True)
+                session.stop()
+                self.uninstall()
+                session.finish()
+
+        def on_sigterm(signum, frame):
+            if finished:
+                # Already writing the shard on the way out (e.g. a Pool worker
+                # that got its stop sentinel just before being terminated).
+                return
+            finish()
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+
+        if signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+            signal.signal(signal.SIGTERM, on_sigterm)
+        if self.start_session:
+            session.start()
+        try:
+            return session.call(bootstrap, process, *args, **kwargs)
+        finally:
+            finish()
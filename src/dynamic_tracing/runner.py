@@ -2,18 +2,40 @@
 Execution runner & tracer for whyx CLI.
 
 Implements `run_script` exactly as before (logic preserved), now isolated here.
+The instrumentation it installs around the script lives in `TraceSession`, so
+child processes traced with --multiprocess (see multiprocess.py) can run their
+own.
 """
 
-import inspect
-import json
+import atexit
 import os
 import runpy
+import signal
 import sys
 import threading
-from collections import defaultdict
 from typing import Dict, List, Optional, Set, Tuple
 
-from .utils import IGNORED_MODULE_PREFIXES, module_name_for_path, parse_watch_list
+from .backends import start_backend
+from .multiprocess import ProcessTracing
+from .sampler import StackSampler
+from .timing import timestamper
+from .trace_io import (
+    EventRing,
+    ThreadEventBuffers,
+    list_shards,
+    open_trace_writer,
+    prepare_shard_dir,
+    shard_path,
+)
+from .utils import (
+    ModuleFilter,
+    current_task_name,
+    frame_name,
+    module_name_for_path,
+    parse_watch_list,
+)
+from .values import DEFAULT_VALUE_LIMIT, value_capture
+from .watchpoints import Watchpoints
 
 
 def run_script(
@@ -22,184 +44,459 @@ def run_script(
     watch_list: Optional[List[str]] = None,
     coverage: bool = False,
     output_file: Optional[str] = None,
+    backend: str = "auto",
+    trace_format: str = "json",
+    trace_options: Optional[Dict] = None,
+    sample_hz: Optional[float] = None,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+    capture_values: str = "full",
+    value_limit: int = DEFAULT_VALUE_LIMIT,
+    async_mode: bool = False,
+    multiprocess: bool = False,
+    ring_buffer: Optional[int] = None,
+    dump_signal: Optional[str] = None,
+    timing: Optional[str] = None,
 ) -> Dict:
     """
     Run the given Python script under tracing and/or watch instrumentation.
 
+    `backend` selects how events are received (see backends.py): 'auto' uses
+    sys.monitoring on Python 3.12+ and sys.settrace elsewhere.
+
+    `trace_format` is one of trace_io.TRACE_FORMATS; 'ndjson' streams events to
+    `output_file` while the script runs instead of holding them in memory.
+    `trace_options` are passed to the trace writer (e.g. chunk_size / codec for
+    'chunked').
+
+    `sample_hz` runs the statistical sampler (see sampler.py) and records folded
+    stacks with counts as 'sample' events.
+
+    `include` / `exclude` are module-name globs (see utils.ModuleFilter); frames
+    of modules that are not traced are detached from the backend after their
+    first event.
+
+    `capture_values` is one of values.CAPTURE_POLICIES and sets how return and
+    assign values are recorded; `value_limit` caps 'truncated' values.
+
+    `async_mode` records each generator/coroutine once: a 'call' on first entry
+    and a 'return' with its final value, with suspends and resumes in between
+    dropped. Events from inside an asyncio task carry its name as 'task'.
+
+    `multiprocess` also traces the script's multiprocessing children:
+    `output_file` is then a shard directory, with one trace file per process
+    (see multiprocess.py and trace_io.list_shards).
+
+    `ring_buffer` keeps only the last N events (trace_io.EventRing) and writes
+    them to `output_file` at exit, after an unhandled exception (in the script
+    or one of its threads), and whenever the process receives `dump_signal`
+    (a signal name such as 'SIGUSR1').
+
+    `timing` is one of timing.TIMING_MODES and stamps call/return events with
+    perf_counter_ns readings ('t', or per-thread deltas 'dt').
+
     WATCH TARGETS:
       Use the script's stem as the module name. For lab/demo.py, watch as:
         --watch demo.User.age
     """
     script_path = os.path.abspath(script_path)
-    stem_name = module_name_for_path(script_path)
-
-    watch_targets: List[Tuple[str, str, str]] = parse_watch_list(watch_list or [])
-    events: List[Dict] = []
-    modules_executed: Set[str] = set()
-
-    patched_classes: Set[type] = set()
-    original_setattr: Dict[type, object] = {}
-    class_watch_specs: Dict[type, List[Tuple[str, str]]] = defaultdict(list)
-    pending_indices: Set[int] = set(range(len(watch_targets)))
-    all_watches_attached = len(pending_indices) == 0
-
-    def get_frame_name(frame):
-        code = frame.f_code
-        func_name = code.co_name
-        mod = frame.f_globals.get("__name__", "")
-        if "self" in frame.f_locals:
-            cls_name = frame.f_locals["self"].__class__.__name__
-            if func_name != "<module>":
-                return f"{mod}.{cls_name}.{func_name}"
-        return f"{mod}.{func_name}"
-
-    def install_patch_for_class(cls: type):
-        if cls in patched_classes:
-            return
-        orig = getattr(cls, "__setattr__", None)
-        original_setattr[cls] = orig
-
-        def wrapped_setattr(self, name, value):
-            specs = class_watch_specs.get(cls, [])
-            if specs:
-                for watched_attr, canonical_target in specs:
-                    if name == watched_attr:
-                        caller_frame = inspect.currentframe().f_back
-                        if caller_frame:
-                            func_fq = get_frame_name(caller_frame)
-                            file = caller_frame.f_code.co_filename
-                            line_no = caller_frame.f_lineno
-                        else:
-                            func_fq = "<unknown>"
-                            file = "<unknown>"
-                            line_no = 0
-                        events.append(
-                            {
-                                "type": "assign",
-                                "target": canonical_target,
-                                "func": func_fq,
-                                "file": file,
-                                "line": line_no,
-                                "value": repr(value),
-                            }
-                        )
-            if orig:
-                try:
-                    orig(self, name, value)
-                except TypeError:
-                    object.__setattr__(self, name, value)
+    options = {
+        "trace": trace,
+        "watch_list": watch_list or [],
+        "coverage": coverage,
+        "backend": backend,
+        "trace_format": trace_format,
+        "trace_options": trace_options or {},
+        "sample_hz": sample_hz,
+        "include": include,
+        "exclude": exclude,
+        "capture_values": capture_values,
+        "value_limit": value_limit,
+        "async_mode": async_mode,
+        "ring_buffer": ring_buffer,
+        "dump_signal": dump_signal,
+        "timing": timing,
+    }
+
+    shard_dir = None
+    if multiprocess and (trace or watch_list or sample_hz):
+        shard_dir = output_file or os.path.join(os.getcwd(), "whyx_trace")
+        try:
+            prepare_shard_dir(shard_dir)
+        except OSError as e:
+            print(f"Error writing trace to {shard_dir}: {e}")
+        output_file = shard_path(shard_dir, trace_format)
+    session = TraceSession(script_path, output_file, options)
+    processes = None
+    if shard_dir is not None and session.recording:
+        processes = ProcessTracing(shard_dir, session)
+        processes.install()
+
+    error = None
+    session.start()
+    try:
+        session.call(runpy.run_path, script_path, run_name="__main__")
+    except Exception as e:
+        print(f"Error during execution: {e}")
+        error = e
+    finally:
+        session.stop()
+        if processes is not None:
+            processes.uninstall()
+
+    result_summary = session.finish(error)
+    unresolved = result_summary.get("unresolved_watches")
+    if unresolved:
+        print(f"Watch targets never attached: {', '.join(unresolved)}", file=sys.stderr)
+    if processes is not None and "trace_file" in result_summary:
+        result_summary["trace_file"] = shard_dir
+        result_summary["processes"] = len(list_shards(shard_dir))
+    return result_summary
+
+
+class TraceSession:
+    """
+    Everything `run_script` installs around the script in one process: the
+    trace writer behind per-thread event buffers (or the ring buffer),
+    watchpoints, the tracing backend and the sampler. `options` are
+    run_script's keyword arguments (other than `output_file`); child processes
+    get a copy to start their own session.
+    """
+
+    def __init__(self, script_path: str, output_file: Optional[str], options: Dict):
+        self.script_path = script_path
+        self.options = options
+        self.trace = trace = options.get("trace", False)
+        self.coverage = coverage = options.get("coverage", False)
+        self.sample_hz = options.get("sample_hz")
+        stem_name = module_name_for_path(script_path)
+
+        watch_targets: List[Tuple[str, str, str]] = parse_watch_list(
+            options.get("watch_list") or []
+        )
+        self.writer = None
+        self.ring: Optional[EventRing] = None
+        self.events = events = []
+        if trace or watch_targets or self.sample_hz:
+            if output_file is None:
+                output_file = os.path.join(os.getcwd(), "whyx_trace.json")
+            ring_size = options.get("ring_buffer")
+            try:
+                if ring_size:
+                    self.ring = self.events = events = EventRing(ring_size)
+                else:
+                    self.writer = self._open_writer(output_file)
+                    self.events = events = ThreadEventBuffers(self.writer)
+            except Exception as e:
+                print(f"Error writing trace to {output_file}: {e}")
+        self.output_file = output_file
+        self.modules_executed: Set[str] = set()
+        modules_executed = self.modules_executed
+        traced_module = ModuleFilter(options.get("include"), options.get("exclude"))
+        capture_value = value_capture(
+            options.get("capture_values", "full"),
+            options.get("value_limit", DEFAULT_VALUE_LIMIT),
+        )
+
+        if options.get("async_mode"):
+
+            def record(event: Dict) -> None:
+                task = current_task_name()
+                if task is not None:
+                    event["task"] = task
+                events.append(event)
+
+        else:
+            record = events.append
+
+        # Stamped after the call's bookkeeping and before the return value's
+        # repr, so neither counts towards the call's duration.
+        stamp = timestamper(options.get("timing"))
+
+        # Threads currently inside record_assign: the value repr and the trace
+        # writer run Python code that must not be traced (or re-enter the writer).
+        self.recording_threads: Set[int] = set()
+        recording_threads = self.recording_threads
+
+        def record_assign(canonical_target: str, caller_frame, value) -> None:
+            ident = threading.get_ident()
+            recording_threads.add(ident)
+            try:
+                _record_assign(canonical_target, caller_frame, value)
+            finally:
+                recording_threads.discard(ident)
+
+        def _record_assign(canonical_target: str, caller_frame, value) -> None:
+            if caller_frame:
+                func_fq = frame_name(caller_frame)
+                file = caller_frame.f_code.co_filename
+                line_no = caller_frame.f_lineno
             else:
-                object.__setattr__(self, name, value)
+                func_fq = "<unknown>"
+                file = "<unknown>"
+                line_no = 0
+            event = {
+                "type": "assign",
+                "target": canonical_target,
+                "func": func_fq,
+                "file": file,
+                "line": line_no,
+            }
+            capture_value(event, value)
+            record(event)
 
-        setattr(cls, "__setattr__", wrapped_setattr)
-        patched_classes.add(cls)
+        self.watchpoints = Watchpoints(
+            watch_targets, script_path, stem_name, record_assign
+        )
 
-    def _runtime_aliases_for_module(mod_name: str) -> Set[str]:
+        def handle_event(frame, event, arg) -> bool:
+            if recording_threads and threading.get_ident() in recording_threads:
+                return True
+            if not traced_module(frame.f_globals.get("__name__", "")):
+                return False
+
+            if event == "call":
+                if coverage or trace:
+                    func_fq = frame_name(frame)
+                    if coverage:
+                        top = func_fq.split(".")[0] if func_fq else ""
+                        if top:
+                            modules_executed.add(top)
+                    if trace:
+                        event = {"type": "call", "func": func_fq}
+                        if stamp is not None:
+                            stamp(event)
+                        record(event)
+            elif event == "return":
+                if trace:
+                    event = {"type": "return", "func": frame_name(frame)}
+                    if stamp is not None:
+                        stamp(event)
+                    capture_value(event, arg)
+                    record(event)
+            # 'resume' / 'yield' (async mode) continue a call already recorded.
+            return True
+
+        self.handle_event = handle_event
+        self.tracer = None
+        self.sampler: Optional[StackSampler] = None
+        # Held while a ring buffer dump is written (see _dump).
+        self._dump_lock = threading.Lock()
+        self._thread_error: Optional[str] = None
+        self._restore_dump_hooks: List = []
+
+    @property
+    def recording(self) -> bool:
+        """Whether the session produces a trace file."""
+        return self.writer is not None or self.ring is not None
+
+    def _open_writer(self, output_file: str):
+        return open_trace_writer(
+            output_file,
+            self.options.get("trace_format", "json"),
+            **(self.options.get("trace_options") or {}),
+        )
+
+    def start(self) -> None:
+        # Watches attach from import/class-creation hooks; only call/return
+        # recording needs a tracing backend.
+        self.watchpoints.install()
+        if self.trace or self.coverage:
+            self.tracer = start_backend(
+                self.options.get("backend", "auto"),
+                self.handle_event,
+                async_aware=self.options.get("async_mode", False),
+            )
+        if self.sample_hz:
+            self.sampler = StackSampler(self.sample_hz)
+            self.sampler.start()
+        if self.ring is not None:
+            self._install_dump_hooks()
+
+    def _install_dump_hooks(self) -> None:
+        """Dump the ring at exit, on thread crashes and on the dump signal."""
+        atexit.register(self._dump_at_exit)
+        self._restore_dump_hooks.append(lambda: atexit.unregister(self._dump_at_exit))
+
+        previous_excepthook = threading.excepthook
+
+        def excepthook(args) -> None:
+            if args.exc_type is not SystemExit:
+                error = _describe(args.exc_value)
+                if args.thread is not None:
+                    error += f" (in thread {args.thread.name})"
+                # Later dumps (at exit) still name the last crashed thread.
+                self._thread_error = error
+                self._dump({"dump_reason": "exception", "error": error})
+            previous_excepthook(args)
+
+        threading.excepthook = excepthook
+        self._restore_dump_hooks.append(
+            lambda: setattr(threading, "excepthook", previous_excepthook)
+        )
+
+        name = self.options.get("dump_signal")
+        if name and threading.current_thread() is threading.main_thread():
+            signum = signal.Signals[name]
+            previous_handler = signal.getsignal(signum)
+
+            def on_signal(signum, frame) -> None:
+                self._dump({"dump_reason": f"signal {name}"})
+                if callable(previous_handler):
+                    previous_handler(signum, frame)
+
+            signal.signal(signum, on_signal)
+            self._restore_dump_hooks.append(
+                lambda: signal.signal(signum, previous_handler)
+            )
+
+    def _dump_at_exit(self) -> None:
+        # The script ended the interpreter (sys.exit, KeyboardInterrupt) on its
+        # way past run_script's finish(); the session is already stopped.
+        self.finish()
+
+    def call(self, func, *args, **kwargs):
+        """Run `func` as the traced code (the sampler's stack boundary)."""
+        if self.sampler is not None:
+            return self.sampler.call(func, *args, **kwargs)
+        return func(*args, **kwargs)
+
+    def stop(self) -> None:
+        if self.sampler is not None:
+            self.sampler.stop()
+        if self.tracer is not None:
+            self.tracer.stop()
+        self.watchpoints.uninstall()
+
+    def before_fork(self) -> None:
+        """Stop recording the forking thread until reopen / after_fork_in_parent."""
+        self.recording_threads.add(threading.get_ident())
+
+    def after_fork_in_parent(self) -> None:
+        self.recording_threads.discard(threading.get_ident())
+
+    def reopen(self, output_file: str) -> None:
         """
-        If the runtime module is '__main__' and its __file__ equals script_path,
-        consider the stem (e.g., 'demo') an alias so '--watch demo.Class.attr' matches.
+        Continue in a forked child: drop what the parent had buffered and
+        collected, and write to `output_file` from now on. The backend and
+        watchpoints carry over; the sampler thread did not survive the fork, so
+        a new one is started with the same stack boundary.
         """
-        aliases = {mod_name}
-        mod = sys.modules.get(mod_name)
+        # The backend is still on: nothing run from here may be recorded (into
+        # the parent's buffers, or the new ones while they are set up). The
+        # forking thread has not recorded since before_fork.
+        self.recording_threads.clear()
+        self.recording_threads.add(threading.get_ident())
         try:
-            mod_file = os.path.abspath(getattr(mod, "__file__", "")) if mod else ""
-        except Exception:
-            mod_file = ""
-        if (
-            mod_name == "__main__"
-            and mod_file
-            and os.path.abspath(script_path) == mod_file
-        ):
-            aliases.add(stem_name)
-        return aliases
-
-    def try_patch_for_runtime_module(mod_name: str):
-        nonlocal all_watches_attached
-        if all_watches_attached or not pending_indices:
-            return
-        mod = sys.modules.get(mod_name)
-        if not mod:
-            return
+            self.output_file = output_file
+            self.modules_executed.clear()
+            if self.writer is not None:
+                self.writer = self._open_writer(output_file)
+                self.events.reset(self.writer)
+            elif self.ring is not None:
+                # Another parent thread may have been dumping at the fork; a
+                # dump signal meanwhile must not see the half-reset ring.
+                self._dump_lock = threading.Lock()
+                with self._dump_lock:
+                    self.ring.reset()
+            if self.sampler is not None:
+                boundary = self.sampler.boundary
+                self.sampler = StackSampler(self.sample_hz)
+                self.sampler.boundary = boundary
+                self.sampler.boundary_thread = threading.get_ident()
+                self.sampler.start()
+        finally:
+            self.recording_threads.clear()
 
-        aliases = _runtime_aliases_for_module(mod_name)
-        to_remove: List[int] = []
-        for idx in list(pending_indices):
-            req_mod, cls_name, attr = watch_targets[idx]
-            if req_mod not in aliases:
-                continue
-            cls_obj = getattr(mod, cls_name, None)
-            if cls_obj is None or not isinstance(cls_obj, type):
-                continue
-            canonical_target = f"{req_mod}.{cls_name}.{attr}"
-            specs = class_watch_specs.setdefault(cls_obj, [])
-            if (attr, canonical_target) not in specs:
-                specs.append((attr, canonical_target))
-            install_patch_for_class(cls_obj)
-            to_remove.append(idx)
-        for idx in to_remove:
-            pending_indices.discard(idx)
-        all_watches_attached = len(pending_indices) == 0
-
-    def trace_func(frame, event, arg):
-        mod = frame.f_globals.get("__name__", "")
-        for prefix in IGNORED_MODULE_PREFIXES:
-            if mod.startswith(prefix):
-                return trace_func
-
-        if watch_targets:
-            try_patch_for_runtime_module(mod)
-
-        if event == "call":
-            if coverage or trace:
-                func_fq = get_frame_name(frame)
-                if coverage:
-                    top = func_fq.split(".")[0] if func_fq else ""
-                    if top:
-                        modules_executed.add(top)
-                if trace:
-                    events.append({"type": "call", "func": func_fq})
-            return trace_func
-        elif event == "return":
-            if trace:
-                try:
-                    val = repr(arg)
-                except Exception:
-                    val = "<unreprizable>"
-                func_fq = get_frame_name(frame)
-                events.append({"type": "return", "func": func_fq, "value": val})
-            return trace_func
-        else:
-            return trace_func
+    def finish(self, error: Optional[BaseException] = None) -> Dict:
+        """
+        Write the trace and return the run summary. `error` is the exception
+        that ended the script, if any (recorded in ring buffer dumps).
+        """
+        while self._restore_dump_hooks:
+            self._restore_dump_hooks.pop()()
+        writer = self.writer
+        events = self.events
+        sampler = self.sampler
+        result_summary: Dict = {}
+        if self.coverage:
+            executed = sorted(
+                m for m in self.modules_executed if m and not m.startswith("whyx")
+            )
+            result_summary["modules"] = executed
+        unresolved = self.watchpoints.unresolved()
+        if unresolved:
+            result_summary["unresolved_watches"] = unresolved
+        if self.trace and self.options.get("timing"):
+            result_summary["timing"] = self.options["timing"]
+        if self.ring is not None:
+            result_summary["dump_reason"] = "exit"
+            if error is not None:
+                result_summary["dump_reason"] = "exception"
+                result_summary["error"] = _describe(error)
+            elif self._thread_error is not None:
+                result_summary["error"] = self._thread_error
+            self._dump(result_summary, wait=True)
+            return result_summary
+        if writer is not None:
+            events.flush()
+            if len(events.thread_names) > 1:
+                result_summary["threads"] = events.thread_names
+        if sampler is not None:
+            # Folded stacks cover every thread; they go to the writer untagged.
+            if writer is not None:
+                for ev in sampler.events():
+                    writer.append(ev)
+            result_summary["sample_hz"] = self.sample_hz
+            result_summary["samples"] = sampler.samples
+        if writer is not None:
+            try:
+                writer.close(result_summary)
+                result_summary["trace_file"] = self.output_file
+                result_summary["event_count"] = len(writer)
+            except Exception as e:
+                print(f"Error writing trace to {self.output_file}: {e}")
+        return result_summary
 
-    if trace or watch_targets or coverage:
-        sys.settrace(trace_func)
-        threading.settrace(trace_func)
+    def _dump(self, summary: Dict, wait: bool = False) -> None:
+        """
+        Write the ring buffer's events to the trace file, replacing any earlier
+        dump, with `summary` (completed here) as the trace's summary.
 
-    try:
-        runpy.run_path(script_path, run_name="__main__")
-    except Exception as e:
-        print(f"Error during execution: {e}")
-    finally:
-        sys.settrace(None)
-        threading.settrace(None)
-        for cls in patched_classes:
-            if original_setattr.get(cls):
-                setattr(cls, "__setattr__", original_setattr[cls])
-            else:
-                setattr(cls, "__setattr__", object.__setattr__)
-
-    result_summary: Dict = {}
-    if coverage:
-        executed = sorted(m for m in modules_executed if m and not m.startswith("whyx"))
-        result_summary["modules"] = executed
-    if trace or watch_targets:
-        if output_file is None:
-            output_file = os.path.join(os.getcwd(), "whyx_trace.json")
+        One dump runs at a time. Crash and signal dumps are skipped while
+        another is being written: the signal handler may have interrupted that
+        very dump in the main thread. The final dump (`wait`) waits for it.
+        """
+        if not self._dump_lock.acquire(blocking=wait):
+            return
+        ring = self.ring
+        ident = threading.get_ident()
+        # The thread may already be kept from recording (a fork in progress).
+        paused = ident in self.recording_threads
+        self.recording_threads.add(ident)
         try:
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(events, f, indent=2)
-            result_summary["trace_file"] = output_file
-            result_summary["event_count"] = len(events)
+            events, seen = ring.snapshot()
+            summary["ring_buffer"] = ring.size
+            summary["events_dropped"] = seen - len(events)
+            if len(ring.thread_names) > 1:
+                summary["threads"] = list(ring.thread_names)
+            if self.sampler is not None:
+                events.extend(self.sampler.events())
+                summary["sample_hz"] = self.sample_hz
+                summary["samples"] = self.sampler.samples
+            writer = self._open_writer(self.output_file)
+            for ev in events:
+                writer.append(ev)
+            writer.close(summary)
+            summary["trace_file"] = self.output_file
+            summary["event_count"] = len(writer)
         except Exception as e:
-            print(f"Error writing trace to {output_file}: {e}")
-    return result_summary
+            print(f"Error writing trace to {self.output_file}: {e}", file=sys.stderr)
+        finally:
+            if not paused:
+                self.recording_threads.discard(ident)
+            self._dump_lock.release()
+
+
+def _describe(error: BaseException) -> str:
+    return f"{type(error).__name__}: {error}"
@@ -0,0 +1,129 @@
+"""
+Statistical sampling profiler for `whyx run --sample HZ`.
+
+A daemon thread wakes up HZ times per second, reads `sys._current_frames()` and
+folds each thread's stack into a "root;...;leaf" string of frame names (see
+utils.frame_name), counting identical stacks. Frames from ignored modules are
+left out. The script runs inside `StackSampler.call`, whose frame cuts that
+thread's stacks so they start where the script's execution starts; samples of
+that thread taken outside the call (whyx's own setup and teardown) are
+dropped. The traced code runs with no hooks installed; the cost is one stack
+walk per thread per sample.
+
+Samples are written to the trace as one event per distinct stack:
+
+  {"type": "sample", "stack": "__main__.<module>;__main__.work", "count": 42}
+
+and `hot_report` ranks hot functions (self / total samples) and hot stacks.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from .utils import frame_name, is_ignored_module
+
+
+class StackSampler:
+    def __init__(self, hz: float):
+        if hz <= 0:
+            raise ValueError("Sampling rate must be positive")
+        self.interval = 1.0 / hz
+        self.boundary = None
+        self.boundary_thread: Optional[int] = None
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def call(self, func, *args, **kwargs):
+        """Run `func` with this frame as the stack boundary of the calling thread."""
+        self.boundary = sys._getframe()
+        self.boundary_thread = threading.get_ident()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.boundary = None
+
+    def _fold(self, frame, bounded: bool) -> str:
+        names: List[str] = []
+        boundary = self.boundary
+        while frame is not None and frame is not boundary:
+            if not is_ignored_module(frame.f_globals.get("__name__", "")):
+                names.append(frame_name(frame))
+            frame = frame.f_back
+        if bounded and frame is None:
+            return ""
+        names.reverse()
+        return ";".join(names)
+
+    def sample_once(self) -> None:
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = self._fold(frame, ident == self.boundary_thread)
+            if stack:
+                self.counts[stack] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        deadline = time.perf_counter()
+        while True:
+            deadline += self.interval
+            if self._stop.wait(max(0.0, deadline - time.perf_counter())):
+                return
+            self.sample_once()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="whyx-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def events(self) -> List[Dict]:
+        # Copied first: a ring buffer dump reads the counts while sampling.
+        return [
+            {"type": "sample", "stack": stack, "count": count}
+            for stack, count in self.counts.copy().most_common()
+        ]
+
+
+def hot_report(events: Iterable[Dict], top: int = 0) -> Dict:
+    """
+    Rank sampled functions and stacks. A function's `self` count is the samples
+    where it was the leaf; `total` counts samples where it was anywhere on the
+    stack (once per sample, however deep the recursion).
+    """
+    stacks: Counter = Counter()
+    self_counts: Counter = Counter()
+    total_counts: Counter = Counter()
+    samples = 0
+    for ev in events:
+        if ev.get("type") != "sample":
+            continue
+        stack = ev.get("stack") or ""
+        count = ev.get("count", 1)
+        names = stack.split(";")
+        stacks[stack] += count
+        self_counts[names[-1]] += count
+        for name in set(names):
+            total_counts[name] += count
+        samples += count
+    limit = top if top and top > 0 else None
+    funcs = sorted(total_counts, key=lambda f: (-self_counts[f], -total_counts[f], f))
+    return {
+        "samples": samples,
+        "hot_functions": [
+            {"func": f, "self": self_counts[f], "total": total_counts[f]}
+            for f in funcs[:limit]
+        ],
+        "hot_stacks": [{"stack": s, "count": n} for s, n in stacks.most_common(limit)],
+    }
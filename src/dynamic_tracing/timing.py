@@ -0,0 +1,170 @@
+"""
+Call timing: timestamps for `whyx run --timing` and `whyx report --timing`.
+
+Timed runs add a perf_counter_ns reading to every call and return event:
+
+- absolute (--timing)      : "t", nanoseconds since the run started.
+- delta (--timing-deltas)  : "dt", nanoseconds since the previous timed event
+                             of the same thread, which keeps values short.
+
+`timing_report` rebuilds each thread's clock from either form and pairs calls
+with returns on one call stack per process, thread and asyncio task, as
+diff_traces does.
+"""
+
+import math
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional
+
+TIMING_MODES = ("absolute", "delta")
+# The event field each mode writes.
+TIME_KEYS = {"absolute": "t", "delta": "dt"}
+PERCENTILES = (50, 95, 99)
+
+# Durations are counted in log-scale buckets, 32 per doubling (about 2% wide),
+# so percentiles need no per-call storage.
+_BUCKETS_PER_OCTAVE = 32
+
+
+def timestamper(mode: Optional[str]) -> Optional[Callable[[Dict], None]]:
+    """Return a function that stamps an event for `mode` (None: no timing)."""
+    if not mode:
+        return None
+    if mode not in TIMING_MODES:
+        raise ValueError(f"Unknown timing mode: {mode}")
+    clock = time.perf_counter_ns
+    start = clock()
+
+    if mode == "absolute":
+
+        def stamp(event: Dict) -> None:
+            event["t"] = clock() - start
+
+        return stamp
+
+    get_ident = threading.get_ident
+    last: Dict[int, int] = {}
+
+    def stamp_delta(event: Dict) -> None:
+        now = clock()
+        ident = get_ident()
+        event["dt"] = now - last.get(ident, start)
+        last[ident] = now
+
+    return stamp_delta
+
+
+class _FunctionTiming:
+    __slots__ = ("calls", "total", "self_time", "max", "min", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0
+        self.self_time = 0
+        self.max = 0
+        self.min: Optional[int] = None
+        self.buckets: Counter = Counter()
+
+    def add(self, duration: int, self_time: int, outermost: bool) -> None:
+        self.calls += 1
+        if outermost:
+            self.total += duration
+        self.self_time += self_time
+        if duration > self.max:
+            self.max = duration
+        if self.min is None or duration < self.min:
+            self.min = duration
+        bucket = int(math.log2(duration) * _BUCKETS_PER_OCTAVE) if duration > 0 else -1
+        self.buckets[bucket] += 1
+
+    def percentiles(self) -> Dict[str, int]:
+        ranks = {p: max(1, math.ceil(self.calls * p / 100)) for p in PERCENTILES}
+        result: Dict[str, int] = {}
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            for p, rank in ranks.items():
+                if p in result or seen < rank:
+                    continue
+                value = 0
+                if bucket >= 0:
+                    value = round(2 ** ((bucket + 0.5) / _BUCKETS_PER_OCTAVE))
+                result[p] = min(max(value, self.min or 0), self.max)
+        return {f"p{p}_ns": result[p] for p in PERCENTILES}
+
+
+def timing_report(events: Iterable[Dict], top: int = 0) -> Dict:
+    """
+    Per-function call count, total and self time and p50/p95/p99 call
+    durations (in ns), in one pass over `events`. A call lasts from its 'call'
+    event to the matching 'return'; self time leaves out time spent in traced
+    callees, and total time counts only the outermost call of a recursion.
+    Percentiles are read from log-scale histograms, so they are within about
+    2% of the exact values. Calls that never return are not counted.
+    """
+    clocks: Dict[tuple, int] = {}
+    # Per (pid, thread, task): frames of [func, start, time in callees], and
+    # how many of the frames belong to each function.
+    stacks: Dict[tuple, List[list]] = {}
+    active: Dict[tuple, Counter] = {}
+    stats: Dict[str, _FunctionTiming] = {}
+    for ev in events:
+        kind = ev.get("type")
+        if kind != "call" and kind != "return":
+            continue
+        if "t" in ev:
+            now = ev["t"]
+        elif "dt" in ev:
+            clock_key = (ev.get("pid"), ev.get("thread"))
+            now = clocks[clock_key] = clocks.get(clock_key, 0) + ev["dt"]
+        else:
+            continue
+        key = (ev.get("pid"), ev.get("thread"), ev.get("task"))
+        stack = stacks.get(key)
+        if stack is None:
+            stack = stacks[key] = []
+            active[key] = Counter()
+        running = active[key]
+        func = ev.get("func") or ""
+        if kind == "call":
+            stack.append([func, now, 0])
+            running[func] += 1
+            continue
+        if not running[func]:
+            # The call was not recorded (e.g. before a ring buffer's window).
+            continue
+        depth = len(stack) - 1
+        while stack[depth][0] != func:
+            depth -= 1
+        _, start, in_callees = stack[depth]
+        for frame in stack[depth:]:
+            running[frame[0]] -= 1
+        del stack[depth:]
+        duration = now - start
+        if stack:
+            stack[-1][2] += duration
+        timing = stats.get(func)
+        if timing is None:
+            timing = stats[func] = _FunctionTiming()
+        timing.add(duration, duration - in_callees, not running[func])
+
+    limit = top if top and top > 0 else None
+    funcs = sorted(stats, key=lambda f: (-stats[f].self_time, -stats[f].total, f))
+    functions = []
+    for f in funcs[:limit]:
+        timing = stats[f]
+        entry = {
+            "func": f,
+            "calls": timing.calls,
+            "total_ns": timing.total,
+            "self_ns": timing.self_time,
+        }
+        entry.update(timing.percentiles())
+        entry["max_ns"] = timing.max
+        functions.append(entry)
+    return {
+        "timed_calls": sum(timing.calls for timing in stats.values()),
+        "functions": functions,
+    }
@@ -0,0 +1,410 @@
+"""
+Trace file writers and readers.
+
+Formats written by `whyx run --format ...`:
+
+- json   : the legacy format, a single JSON array of events written on exit.
+- ndjson : one JSON event per line, buffered and flushed every `flush_every`
+           events while the script runs. The first line is a header and the last
+           a summary footer, both marked with a "whyx" key:
+
+             {"whyx": "trace", "version": 1}
+             {"type": "call", "func": "pkg.mod.fn"}
+             ...
+             {"whyx": "summary", "event_count": 2}
+
+           A trace cut short (process killed) has no footer and may end in a
+           partial line; readers return every complete event before it.
+- binary : interned strings + fixed-width records (see binary_trace.py).
+- chunked: independently compressed chunks + a seek index (see chunked_trace.py).
+
+While a script runs, events go through `ThreadEventBuffers`: each thread
+appends to its own buffer and tags its events with a small "thread" number.
+The thread that runs the script is thread 0 and its events carry no "thread"
+key, so single-threaded traces (and traces from older versions) read as
+thread 0. Buffers are merged into the writer in sequence order.
+
+`run --ring-buffer N` records into an `EventRing` instead, which keeps only
+the last N events and writes them (in the same schema) when the run dumps.
+
+Readers detect the format from the file contents, so every consumer of a trace
+goes through `iter_trace_events` / `load_trace_events` (or `iter_indexed_events`
+for filtered scans that can skip chunks).
+
+`run --multiprocess` writes a shard directory instead of one file: each process
+writes its own trace, named `<start time ns>-<pid>.<format>`. Readers given a
+directory read its shards one after another in process start order and tag
+every event with the "pid" of the process that recorded it; `merge_shards`
+writes that stream to a single trace.
+"""
+
+import heapq
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .binary_trace import BinaryTrace, BinaryTraceWriter, is_binary_trace
+from .chunked_trace import ChunkedTrace, ChunkedTraceWriter, is_chunked_trace
+
+TRACE_FORMATS = ("json", "ndjson", "binary", "chunked")
+NDJSON_VERSION = 1
+DEFAULT_FLUSH_EVERY = 1000
+DEFAULT_THREAD_BUFFER = 4096
+
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+class JsonTraceWriter:
+    """Collects events in memory and writes them as one JSON array on close."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.events: List[Dict] = []
+        self.append = self.events.append
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def close(self, summary: Optional[Dict] = None) -> None:
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.events, f, indent=2)
+
+
+class NdjsonTraceWriter:
+    """Streams events to `path` as newline-delimited JSON, flushed in chunks."""
+
+    def __init__(self, path: str, flush_every: int = DEFAULT_FLUSH_EVERY):
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self._buffer: List[Dict] = []
+        self._count = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "w", encoding="utf-8")
+        self._write_line({"whyx": "trace", "version": NDJSON_VERSION})
+        self._file.flush()
+
+    def _write_line(self, obj: Dict) -> None:
+        self._file.write(_encode(obj) + "\n")
+
+    def append(self, event: Dict) -> None:
+        with self._lock:
+            self._buffer.append(event)
+            full = len(self._buffer) >= self.flush_every
+        if full:
+            self.flush()
+
+    def __len__(self) -> int:
+        return self._count + len(self._buffer)
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._buffer = self._buffer, []
+            if not pending:
+                return
+            self._file.write("".join(_encode(ev) + "\n" for ev in pending))
+            self._file.flush()
+            self._count += len(pending)
+
+    def close(self, summary: Optional[Dict] = None) -> None:
+        self.flush()
+        footer = {"whyx": "summary", "event_count": self._count}
+        footer.update(summary or {})
+        self._write_line(footer)
+        self._file.close()
+
+
+def _thread_name() -> str:
+    # sys.monitoring reports a new thread's first frames while it is still in
+    # Thread._bootstrap, before the Thread has its ident; current_thread()
+    # would then register a "Dummy-N" thread in its place. A started thread
+    # without an ident yet is the one calling, if it is the only one.
+    ident = threading.get_ident()
+    starting = []
+    for thread in threading.enumerate():
+        if thread.ident == ident:
+            return thread.name
+        if thread.ident is None:
+            starting.append(thread)
+    if len(starting) == 1:
+        return starting[0].name
+    return f"Thread-{ident}"
+
+
+class ThreadEventBuffers:
+    """
+    Per-thread event buffers in front of a trace writer.
+
+    `append` only touches the calling thread's buffer (no lock); events from
+    threads other than the first are tagged with the thread's number, and each
+    is buffered with a global sequence number. When any buffer reaches
+    `buffer_size`, or on `flush`, every buffer is drained and the events are
+    merged into the writer by sequence number.
+    """
+
+    def __init__(self, writer, buffer_size: int = DEFAULT_THREAD_BUFFER):
+        self.writer = writer
+        self.buffer_size = max(1, buffer_size)
+        self.thread_names: List[str] = []
+        self._buffers: List[List[Tuple[int, Dict]]] = []
+        self._local = threading.local()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._register()
+
+    def _register(self) -> Tuple[int, List[Tuple[int, Dict]]]:
+        name = _thread_name()
+        with self._lock:
+            state = (len(self._buffers), [])
+            self._buffers.append(state[1])
+            self.thread_names.append(name)
+        self._local.state = state
+        return state
+
+    def append(self, event: Dict) -> None:
+        try:
+            number, buffer = self._local.state
+        except AttributeError:
+            number, buffer = self._register()
+        if number:
+            event["thread"] = number
+        buffer.append((next(self._seq), event))
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            drained = []
+            for buffer in self._buffers:
+                n = len(buffer)
+                if n:
+                    drained.append(buffer[:n])
+                    # Owner threads only ever append, so the first n are ours.
+                    del buffer[:n]
+            if len(drained) > 1:
+                # Sequence numbers are unique, so tuples never compare events.
+                merged = heapq.merge(*drained)
+            else:
+                merged = drained[0] if drained else []
+            append = self.writer.append
+            for _, event in merged:
+                append(event)
+
+    def __len__(self) -> int:
+        return len(self.writer) + sum(len(b) for b in self._buffers)
+
+    def reset(self, writer) -> None:
+        """
+        Drop every buffer and thread and continue on `writer` (in a forked
+        child: the parent's events are not ours to write, and its locks may be
+        held by threads that no longer exist).
+        """
+        _silence_inherited_writer(self.writer)
+        self.writer = writer
+        self.thread_names = []
+        self._buffers = []
+        self._local = threading.local()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._register()
+
+
+class EventRing:
+    """
+    Flight recorder for `run --ring-buffer N`: the last `size` events, kept in
+    a list of `size` slots allocated up front. Each event overwrites the
+    oldest slot, so memory does not grow with the length of the run. Threads
+    are numbered as in ThreadEventBuffers. Nothing is written until the
+    events are taken with `snapshot`.
+    """
+
+    def __init__(self, size: int):
+        if size <= 0:
+            raise ValueError("Ring buffer size must be positive")
+        self.size = size
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget every event and thread (e.g. in a forked child)."""
+        self._slots: List[Optional[Tuple[int, Dict]]] = [None] * self.size
+        self._seq = itertools.count()
+        self.thread_names: List[str] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._register()
+
+    def _register(self) -> int:
+        name = _thread_name()
+        with self._lock:
+            number = len(self.thread_names)
+            self.thread_names.append(name)
+        self._local.number = number
+        return number
+
+    def append(self, event: Dict) -> None:
+        try:
+            number = self._local.number
+        except AttributeError:
+            number = self._register()
+        if number:
+            event["thread"] = number
+        i = next(self._seq)
+        self._slots[i % self.size] = (i, event)
+
+    def snapshot(self) -> Tuple[List[Dict], int]:
+        """(kept events, oldest first; number of events appended so far)."""
+        kept = sorted(slot for slot in list(self._slots) if slot is not None)
+        seen = kept[-1][0] + 1 if kept else 0
+        return [event for _, event in kept], seen
+
+
+def _silence_inherited_writer(writer) -> None:
+    # Point the child's copy of the parent's file descriptor at os.devnull, so
+    # bytes the parent had buffered are not written a second time when the
+    # child's copy of the file object is flushed or collected.
+    file = getattr(writer, "_file", None)
+    if file is None or file.closed:
+        return
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    try:
+        os.dup2(devnull, file.fileno())
+    finally:
+        os.close(devnull)
+
+
+def open_trace_writer(path: str, trace_format: str = "json", **options):
+    """Create the writer for `trace_format` (see TRACE_FORMATS)."""
+    if trace_format == "json":
+        return JsonTraceWriter(path)
+    if trace_format == "ndjson":
+        return NdjsonTraceWriter(path, **options)
+    if trace_format == "binary":
+        return BinaryTraceWriter(path, **options)
+    if trace_format == "chunked":
+        return ChunkedTraceWriter(path, **options)
+    raise ValueError(f"Unknown trace format: {trace_format}")
+
+
+_SHARD_NAME = re.compile(r"^(\d+)-(\d+)\.[a-z]+$")
+
+
+def shard_path(shard_dir: str, trace_format: str) -> str:
+    """Path of this process's shard in `shard_dir`."""
+    return os.path.join(shard_dir, f"{time.time_ns()}-{os.getpid()}.{trace_format}")
+
+
+def prepare_shard_dir(shard_dir: str) -> None:
+    """Create `shard_dir`, removing shards left there by an earlier run."""
+    os.makedirs(shard_dir, exist_ok=True)
+    for name in os.listdir(shard_dir):
+        if _SHARD_NAME.match(name):
+            os.remove(os.path.join(shard_dir, name))
+
+
+def list_shards(shard_dir: str) -> List[Tuple[int, str]]:
+    """(pid, path) of each shard in `shard_dir`, in process start order."""
+    shards = []
+    for name in os.listdir(shard_dir):
+        m = _SHARD_NAME.match(name)
+        if m:
+            shards.append(
+                (int(m.group(1)), int(m.group(2)), os.path.join(shard_dir, name))
+            )
+    shards.sort()
+    return [(pid, path) for _, pid, path in shards]
+
+
+def _iter_shards(shard_dir: str) -> Iterator[Dict]:
+    for pid, path in list_shards(shard_dir):
+        events = iter_trace_events(path)
+        try:
+            first = next(events, None)
+        except (OSError, ValueError) as e:
+            # e.g. a binary shard of a killed process has no string table.
+            print(f"Skipping unreadable trace shard {path}: {e}", file=sys.stderr)
+            continue
+        if first is None:
+            continue
+        for ev in itertools.chain((first,), events):
+            ev["pid"] = pid
+            yield ev
+
+
+def merge_shards(
+    shard_dir: str, output_file: str, trace_format: str = "json", **options
+) -> Dict:
+    """Write the events of every shard in `shard_dir` to one trace."""
+    processes = [pid for pid, _ in list_shards(shard_dir)]
+    writer = open_trace_writer(output_file, trace_format, **options)
+    for ev in _iter_shards(shard_dir):
+        writer.append(ev)
+    summary = {"processes": processes}
+    writer.close(summary)
+    summary.update({"trace_file": output_file, "event_count": len(writer)})
+    return summary
+
+
+def _first_char(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            ch = f.read(1)
+            if not ch or not ch.isspace():
+                return ch
+
+
+def _iter_ndjson(path: str) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for raw in f:
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                if not raw.endswith("\n"):
+                    # Partial last line of an interrupted trace.
+                    return
+                raise
+            if "whyx" in obj:
+                continue
+            yield obj
+
+
+def iter_trace_events(path: str) -> Iterator[Dict]:
+    """Yield the events of a trace file in any supported format, or of a shard directory."""
+    if os.path.isdir(path):
+        yield from _iter_shards(path)
+        return
+    if is_binary_trace(path):
+        yield from BinaryTrace(path)
+        return
+    if is_chunked_trace(path):
+        yield from ChunkedTrace(path)
+        return
+    if _first_char(path) == "[":
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+    yield from _iter_ndjson(path)
+
+
+def load_trace_events(path: str) -> List[Dict]:
+    return list(iter_trace_events(path))
+
+
+def iter_indexed_events(
+    path: str, event_type: Optional[str] = None, target: Optional[str] = None
+) -> Iterator[Tuple[int, Dict]]:
+    """
+    Yield (event index, event) pairs. `event_type` / `target` are hints: chunked
+    traces skip chunks that cannot contain a matching event, but callers must
+    still filter what is yielded.
+    """
+    if is_chunked_trace(path):
+        yield from ChunkedTrace(path).iter_indexed(event_type, target)
+        return
+    yield from enumerate(iter_trace_events(path))
@@ -1,12 +1,153 @@
 """Shared helpers and constants for whyx dynamic tracing."""
 
+import fnmatch
+import inspect
+import re
+import sys
+import weakref
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 _PARENT_PKG_PREFIX = __name__.rsplit(".", 1)[0]
 
 IGNORED_MODULE_PREFIXES = ["whyx.", _PARENT_PKG_PREFIX]
 
+# The script's module: multiprocessing's spawn start method re-imports it in
+# child processes as '__mp_main__', which frame names report as '__main__'.
+MAIN_MODULES = ("__main__", "__mp_main__")
+
+
+def is_ignored_module(mod: str) -> bool:
+    """True for modules whose frames are never recorded (whyx itself)."""
+    for prefix in IGNORED_MODULE_PREFIXES:
+        if mod.startswith(prefix):
+            return True
+    return False
+
+
+def _compile_globs(globs: List[str]) -> Optional["re.Pattern[str]"]:
+    # A glob also matches the submodules of what it names ("json" -> "json.*").
+    alternatives = [fnmatch.translate(g) for p in globs for g in (p, p + ".*")]
+    return re.compile("|".join(alternatives)) if alternatives else None
+
+
+class ModuleFilter:
+    """
+    Decides which modules are traced, from `--include` / `--exclude` globs.
+
+    Ignored modules (whyx itself) are never traced. With include globs, only
+    matching modules and the script itself (`__main__`) are traced; exclude
+    globs win over includes. Decisions are cached per module name.
+    """
+
+    def __init__(
+        self, include: Optional[List[str]] = None, exclude: Optional[List[str]] = None
+    ):
+        self.include = _compile_globs(include or [])
+        self.exclude = _compile_globs(exclude or [])
+        self._decisions: Dict[str, bool] = {}
+
+    def _decide(self, mod: str) -> bool:
+        if is_ignored_module(mod):
+            return False
+        if self.exclude is not None and self.exclude.match(mod):
+            return False
+        if self.include is not None and mod not in MAIN_MODULES:
+            return self.include.match(mod) is not None
+        return True
+
+    def __call__(self, mod: str) -> bool:
+        decision = self._decisions.get(mod)
+        if decision is None:
+            decision = self._decisions[mod] = self._decide(mod)
+        return decision
+
+
+_CO_OPTIMIZED = inspect.CO_OPTIMIZED
+
+_NameEntry = Tuple[str, str, Optional[Dict[int, tuple]], "weakref.ref"]
+
+# id(code) -> (name or module, function name, per-class names or None, weak
+# reference to the code). Keyed by id because hashing a code object hashes its
+# bytecode; the entry leaves when the code is freed, before its id can be reused.
+_frame_names: Dict[int, _NameEntry] = {}
+
+
+def evict_when_freed(cache: Dict[int, tuple], obj) -> "weakref.ref":
+    """
+    Weak reference to `obj` that removes `cache[id(obj)]` once `obj` is freed.
+    id()-keyed caches keep it in their entries instead of `obj`, so they
+    neither keep `obj` alive nor hold a stale entry for a reused id.
+    """
+    key = id(obj)
+    return weakref.ref(obj, lambda _ref: cache.pop(key, None))
+
+
+def _frame_name_entry(frame) -> _NameEntry:
+    code = frame.f_code
+    mod = frame.f_globals.get("__name__", "")
+    if mod in MAIN_MODULES:
+        mod = "__main__"
+    func_name = code.co_name
+    code_ref = evict_when_freed(_frame_names, code)
+    if func_name == "<module>":
+        return f"{mod}.{func_name}", "", None, code_ref
+    # Only frames that can hold a local named 'self' need the runtime class;
+    # unoptimized frames (class bodies, exec) read locals from a plain dict.
+    binds_self = (
+        not code.co_flags & _CO_OPTIMIZED
+        or "self" in code.co_varnames
+        or "self" in code.co_cellvars
+        or "self" in code.co_freevars
+    )
+    if not binds_self:
+        return f"{mod}.{func_name}", "", None, code_ref
+    return mod, func_name, {}, code_ref
+
+
+def frame_name(frame) -> str:
+    """
+    Fully qualified name of a frame: module[.RuntimeClass].function.
+
+    Names are cached per code object, and per runtime class for frames with a
+    'self' local, so only those frames look at their locals.
+    """
+    code = frame.f_code
+    entry = _frame_names.get(id(code))
+    if entry is None:
+        entry = _frame_names[id(code)] = _frame_name_entry(frame)
+    mod, func_name, by_class, _ = entry
+    if by_class is None:
+        return mod
+    f_locals = frame.f_locals
+    if "self" not in f_locals:
+        return f"{mod}.{func_name}"
+    cls = f_locals["self"].__class__
+    # id(class) -> (name, weak reference to the class), like _frame_names.
+    hit = by_class.get(id(cls))
+    if hit is None:
+        hit = by_class[id(cls)] = (
+            f"{mod}.{cls.__name__}.{func_name}",
+            evict_when_freed(by_class, cls),
+        )
+    return hit[0]
+
+
+def current_task_name() -> Optional[str]:
+    """Name of the asyncio task running in this thread, if any."""
+    # Looked up on the submodules: `asyncio` itself may be half-imported.
+    get_running_loop = getattr(
+        sys.modules.get("asyncio.events"), "_get_running_loop", None
+    )
+    current_task = getattr(sys.modules.get("asyncio.tasks"), "current_task", None)
+    if get_running_loop is None or current_task is None:
+        return None
+    loop = get_running_loop()
+    if loop is None:
+        return None
+    task = current_task(loop)
+    return task.get_name() if task is not None else None
+
 
 def module_name_for_path(script_path: str) -> str:
     """Use the file stem as the module name (lab/demo.py -> 'demo')."""
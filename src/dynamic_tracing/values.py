@@ -0,0 +1,103 @@
+"""
+Value capture for return and assign events (`whyx run --capture-values`).
+
+Policies, from most to least detail:
+
+- full      : "value": repr(value) (the default)
+- truncated : "value": a reprlib repr of at most `limit` characters; big
+              containers are never repr'd in full
+- type      : "value": "<module.Type>"
+- hash      : "value_hash": blake2b digest of repr(value); the repr is still
+              computed but not stored, and diff_traces compares digests
+- none      : no value field at all
+"""
+
+import hashlib
+import reprlib
+from typing import Callable, Dict, Optional
+
+CAPTURE_POLICIES = ("full", "truncated", "type", "hash", "none")
+DEFAULT_VALUE_LIMIT = 200
+
+UNREPRIZABLE = "<unreprizable>"
+
+Capture = Callable[[Dict, object], None]
+
+
+def _safe_repr(value) -> str:
+    try:
+        return repr(value)
+    except Exception:
+        return UNREPRIZABLE
+
+
+def value_digest(text: str) -> str:
+    """Digest stored as "value_hash" for a repr string."""
+    data = text.encode("utf-8", "backslashreplace")
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def event_value_key(event: Dict) -> Optional[str]:
+    """An event's value as a digest, whether it was stored in full or hashed."""
+    if "value_hash" in event:
+        return event["value_hash"]
+    if "value" in event and event["value"] is not None:
+        return value_digest(event["value"])
+    return None
+
+
+def _truncating_repr(limit: int) -> Callable[[object], str]:
+    short = reprlib.Repr()
+    short.maxstring = short.maxother = short.maxlong = max(limit, 4)
+    short.maxlevel = 3
+
+    def truncated(value) -> str:
+        try:
+            text = short.repr(value)
+        except Exception:
+            return UNREPRIZABLE
+        if len(text) > limit:
+            text = text[: max(limit - 3, 0)] + "..."
+        return text
+
+    return truncated
+
+
+def _type_name(value) -> str:
+    cls = type(value)
+    if cls.__module__ == "builtins":
+        return f"<{cls.__qualname__}>"
+    return f"<{cls.__module__}.{cls.__qualname__}>"
+
+
+def value_capture(policy: str = "full", limit: int = DEFAULT_VALUE_LIMIT) -> Capture:
+    """Return `capture(event, value)`, which stores `value` on `event` per `policy`."""
+    if policy == "full":
+
+        def capture(event: Dict, value) -> None:
+            event["value"] = _safe_repr(value)
+
+    elif policy == "truncated":
+        truncated = _truncating_repr(limit)
+
+        def capture(event: Dict, value) -> None:
+            event["value"] = truncated(value)
+
+    elif policy == "type":
+
+        def capture(event: Dict, value) -> None:
+            event["value"] = _type_name(value)
+
+    elif policy == "hash":
+
+        def capture(event: Dict, value) -> None:
+            event["value_hash"] = value_digest(_safe_repr(value))
+
+    elif policy == "none":
+
+        def capture(event: Dict, value) -> None:
+            pass
+
+    else:
+        raise ValueError(f"Unknown value capture policy: {policy}")
+    return capture
@@ -0,0 +1,409 @@
+"""
+Watchpoints for `whyx run --watch module.Class.attr`.
+
+Watches attach to classes as they appear, without tracing:
+
+- `builtins.__build_class__` is wrapped for the run, so a watched class is
+  patched the moment its `class` statement finishes, even when the module
+  (e.g. the script itself) uses the class before it finishes executing.
+- a `sys.meta_path` entry wraps the loader of each watched module and looks
+  the class up once the module has executed (classes made without a `class`
+  statement, or re-exported from another module).
+- watched modules that are already imported are checked on install.
+
+Targets that never attach are reported by `unresolved()`.
+
+Attaching puts a data descriptor (`_WatchedAttribute`) on the class for the
+watched attribute only, so assignments to other attributes run at full speed.
+Reads of the watched attribute go through the descriptor's __get__ (so a
+missing value still raises AttributeError), which makes them several times
+slower than plain instance reads. Classes where a descriptor cannot see every
+assignment fall back to wrapping the class `__setattr__`: instances without a
+`__dict__` (`__slots__`), a custom `__setattr__`, or an attribute that is
+already a descriptor (property, slot, method) somewhere in the MRO. So do
+classes whose `__dict__` attribute is not their own instance-dict descriptor
+(shadowed, or copied from another class), which the descriptor relies on. A
+class decorator can make such a copy after the watch attached, as in
+`type(cls.__name__, cls.__bases__, dict(cls.__dict__))`; the copied descriptor
+then moves that class to the wrapper on first use.
+"""
+
+import builtins
+import dataclasses
+import inspect
+import os
+import sys
+import types
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .utils import MAIN_MODULES
+
+# on_assign(canonical target, assigning frame or None, value)
+AssignCallback = Callable[[str, object, object], None]
+
+MECHANISMS = ("descriptor", "setattr")
+
+_MISSING = object()
+
+
+class _WatchedAttribute:
+    """
+    Data descriptor for one watched attribute of a class that had no value for
+    it. Reads return the instance __dict__ entry and raise AttributeError when
+    there is none, as they would without the watch.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        on_assign: AssignCallback,
+        fall_back: Callable[[type, "_WatchedAttribute"], None],
+    ):
+        self.name = name
+        self.on_assign = on_assign
+        self.fall_back = fall_back
+        self.targets: List[str] = []
+
+    def _detach(self, obj) -> None:
+        """
+        Hand the watch over to the __setattr__ wrapper for the class of `obj`
+        that holds this descriptor. Called when `obj.__dict__` raised TypeError:
+        the class carries a copy of another class's __dict__ descriptor.
+        """
+        for klass in type(obj).__mro__:
+            if vars(klass).get(self.name) is self:
+                self.fall_back(klass, self)
+                return
+        raise TypeError(f"cannot reach the __dict__ of {type(obj).__name__!r}")
+
+    def __set__(self, obj, value) -> None:
+        frame = sys._getframe(1)
+        for target in self.targets:
+            self.on_assign(target, frame, value)
+        try:
+            obj.__dict__[self.name] = value
+        except TypeError:
+            self._detach(obj)
+            object.__setattr__(obj, self.name, value)
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        try:
+            return obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+        except TypeError:
+            self._detach(obj)
+            return getattr(obj, self.name)
+
+    def __delete__(self, obj) -> None:
+        try:
+            del obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+        except TypeError:
+            self._detach(obj)
+            delattr(obj, self.name)
+
+
+class _WatchedAttributeWithDefault(_WatchedAttribute):
+    """A watched attribute that shadows a class-level default value."""
+
+    def __init__(
+        self,
+        name: str,
+        on_assign: AssignCallback,
+        fall_back: Callable[[type, _WatchedAttribute], None],
+        default,
+    ):
+        super().__init__(name, on_assign, fall_back)
+        self.default = default
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self.default
+        try:
+            return obj.__dict__.get(self.name, self.default)
+        except TypeError:
+            self._detach(obj)
+            return getattr(obj, self.name)
+
+
+def _has_own_instance_dict(cls: type) -> bool:
+    """Whether `obj.__dict__` reaches the instance dict for instances of `cls`."""
+    if not cls.__dictoffset__:
+        return False
+    for klass in cls.__mro__:
+        if "__dict__" in vars(klass):
+            descriptor = vars(klass)["__dict__"]
+            return isinstance(descriptor, types.GetSetDescriptorType) and issubclass(
+                cls, descriptor.__objclass__
+            )
+    return False
+
+
+def _class_default(cls: type, attr: str):
+    """
+    The class-level value `attr` would fall back to, _MISSING if there is none,
+    or None when a descriptor already handles `attr`. A dataclasses.Field is
+    treated like a descriptor: @dataclass replaces it after the class is built.
+    """
+    for klass in cls.__mro__:
+        if attr in vars(klass):
+            value = vars(klass)[attr]
+            kind = type(value)
+            if isinstance(value, dataclasses.Field) or any(
+                hasattr(kind, m) for m in ("__get__", "__set__", "__delete__")
+            ):
+                return None
+            return value
+    return _MISSING
+
+
+class _NotifyingLoader:
+    """Delegates to `loader` and calls `callback(module name)` after exec_module."""
+
+    def __init__(self, loader, callback: Callable[[str], None]):
+        self._loader = loader
+        self._callback = callback
+
+    def create_module(self, spec):
+        create = getattr(self._loader, "create_module", None)
+        return create(spec) if create else None
+
+    def exec_module(self, module) -> None:
+        self._loader.exec_module(module)
+        self._callback(module.__name__)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _PostImportHook:
+    """sys.meta_path entry that notifies after the modules in `names()` execute."""
+
+    def __init__(self, names: Callable[[], Set[str]], callback: Callable[[str], None]):
+        self.names = names
+        self.callback = callback
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname not in self.names():
+            return None
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, "find_spec", None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _NotifyingLoader(spec.loader, self.callback)
+        return spec
+
+
+class Watchpoints:
+    def __init__(
+        self,
+        watch_targets: List[Tuple[str, str, str]],
+        script_path: str,
+        stem_name: str,
+        on_assign: AssignCallback,
+        mechanism: str = "descriptor",
+    ):
+        if mechanism not in MECHANISMS:
+            raise ValueError(f"Unknown watch mechanism: {mechanism}")
+        self.mechanism = mechanism
+        self.watch_targets = watch_targets
+        self.script_path = script_path
+        self.stem_name = stem_name
+        self.on_assign = on_assign
+        self.pending: Set[int] = set(range(len(watch_targets)))
+        self.patched_classes: Set[type] = set()
+        self.original_setattr: Dict[type, object] = {}
+        self.class_watch_specs: Dict[type, List[Tuple[str, str]]] = {}
+        # (class, attr) -> (descriptor, value it replaced in the class __dict__)
+        self.descriptors: Dict[Tuple[type, str], Tuple[_WatchedAttribute, object]] = {}
+        self._hook: Optional[_PostImportHook] = None
+        self._build_class = None
+
+    def _pending_modules(self) -> Set[str]:
+        return {self.watch_targets[idx][0] for idx in self.pending}
+
+    def _runtime_aliases_for_module(self, mod_name: str) -> Set[str]:
+        """
+        If the runtime module is '__main__' (or '__mp_main__' in a spawned
+        multiprocessing child) and its __file__ equals script_path,
+        consider the stem (e.g., 'demo') an alias so '--watch demo.Class.attr' matches.
+        """
+        aliases = {mod_name}
+        mod = sys.modules.get(mod_name)
+        try:
+            mod_file = os.path.abspath(getattr(mod, "__file__", "")) if mod else ""
+        except Exception:
+            mod_file = ""
+        if mod_name in MAIN_MODULES and mod_file and self.script_path == mod_file:
+            aliases.add(self.stem_name)
+        return aliases
+
+    def _attach(self, idx: int, cls_obj: type) -> None:
+        req_mod, cls_name, attr = self.watch_targets[idx]
+        canonical_target = f"{req_mod}.{cls_name}.{attr}"
+        self.pending.discard(idx)
+        if self.mechanism == "descriptor" and self._install_descriptor(
+            cls_obj, attr, canonical_target
+        ):
+            return
+        specs = self.class_watch_specs.setdefault(cls_obj, [])
+        if (attr, canonical_target) not in specs:
+            specs.append((attr, canonical_target))
+        self.install_patch_for_class(cls_obj)
+
+    def _install_descriptor(self, cls: type, attr: str, target: str) -> bool:
+        """Watch `attr` with a descriptor on `cls`; False if `cls` needs the wrapper."""
+        installed = self.descriptors.get((cls, attr))
+        if installed is None:
+            if cls.__setattr__ is not object.__setattr__ or not _has_own_instance_dict(
+                cls
+            ):
+                return False
+            default = _class_default(cls, attr)
+            if default is None:
+                return False
+            if default is _MISSING:
+                descriptor = _WatchedAttribute(attr, self.on_assign, self._fall_back)
+            else:
+                descriptor = _WatchedAttributeWithDefault(
+                    attr, self.on_assign, self._fall_back, default
+                )
+            original = vars(cls).get(attr, _MISSING)
+            try:
+                setattr(cls, attr, descriptor)
+            except (AttributeError, TypeError):
+                return False
+            installed = self.descriptors[(cls, attr)] = (descriptor, original)
+        descriptor = installed[0]
+        if target not in descriptor.targets:
+            descriptor.targets.append(target)
+        return True
+
+    def _fall_back(self, cls: type, descriptor: _WatchedAttribute) -> None:
+        """
+        Replace `descriptor`, found on `cls` without being installed there (see
+        _WatchedAttribute._detach), with the __setattr__ wrapper for its targets.
+        """
+        if vars(cls).get(descriptor.name) is descriptor:
+            default = getattr(descriptor, "default", _MISSING)
+            if default is _MISSING:
+                delattr(cls, descriptor.name)
+            else:
+                setattr(cls, descriptor.name, default)
+        specs = self.class_watch_specs.setdefault(cls, [])
+        for target in descriptor.targets:
+            if (descriptor.name, target) not in specs:
+                specs.append((descriptor.name, target))
+        self.install_patch_for_class(cls)
+
+    def attach_module(self, mod_name: str) -> None:
+        """Attach pending watches whose class is an attribute of `mod_name`."""
+        if not self.pending:
+            return
+        mod = sys.modules.get(mod_name)
+        if not mod:
+            return
+        aliases = self._runtime_aliases_for_module(mod_name)
+        for idx in sorted(self.pending):
+            req_mod, cls_name, _ = self.watch_targets[idx]
+            if req_mod not in aliases:
+                continue
+            cls_obj = getattr(mod, cls_name, None)
+            if cls_obj is None or not isinstance(cls_obj, type):
+                continue
+            self._attach(idx, cls_obj)
+
+    def attach_class(self, cls: type) -> None:
+        """Attach pending watches naming `cls`, right after it is created."""
+        if not self.pending:
+            return
+        aliases = self._runtime_aliases_for_module(getattr(cls, "__module__", ""))
+        for idx in sorted(self.pending):
+            req_mod, cls_name, _ = self.watch_targets[idx]
+            if req_mod in aliases and cls.__qualname__ == cls_name:
+                self._attach(idx, cls)
+
+    def install_patch_for_class(self, cls: type) -> None:
+        if cls in self.patched_classes:
+            return
+        orig = getattr(cls, "__setattr__", None)
+        self.original_setattr[cls] = orig
+        class_watch_specs = self.class_watch_specs
+        on_assign = self.on_assign
+
+        def wrapped_setattr(self, name, value):
+            specs = class_watch_specs.get(cls, [])
+            if specs:
+                for watched_attr, canonical_target in specs:
+                    if name == watched_attr:
+                        on_assign(
+                            canonical_target, inspect.currentframe().f_back, value
+                        )
+            if orig:
+                try:
+                    orig(self, name, value)
+                except TypeError:
+                    object.__setattr__(self, name, value)
+            else:
+                object.__setattr__(self, name, value)
+
+        setattr(cls, "__setattr__", wrapped_setattr)
+        self.patched_classes.add(cls)
+
+    def install(self) -> None:
+        """Attach what is already importable and hook class creation and imports."""
+        if not self.pending:
+            return
+        for mod_name in self._pending_modules() | {"__main__"}:
+            self.attach_module(mod_name)
+
+        self._hook = _PostImportHook(self._pending_modules, self.attach_module)
+        sys.meta_path.insert(0, self._hook)
+
+        original_build_class = self._build_class = builtins.__build_class__
+        attach_class = self.attach_class
+        pending = self.pending
+
+        def build_class(func, name, *bases, **kwds):
+            cls = original_build_class(func, name, *bases, **kwds)
+            if pending and isinstance(cls, type):
+                attach_class(cls)
+            return cls
+
+        builtins.__build_class__ = build_class
+
+    def uninstall(self) -> None:
+        """Remove the hooks, watched-attribute descriptors and patched __setattr__s."""
+        if self._build_class is not None:
+            builtins.__build_class__ = self._build_class
+            self._build_class = None
+        if self._hook is not None:
+            try:
+                sys.meta_path.remove(self._hook)
+            except ValueError:
+                pass
+            self._hook = None
+        for (cls, attr), (_, original) in self.descriptors.items():
+            if original is _MISSING:
+                delattr(cls, attr)
+            else:
+                setattr(cls, attr, original)
+        for cls in self.patched_classes:
+            if self.original_setattr.get(cls):
+                setattr(cls, "__setattr__", self.original_setattr[cls])
+            else:
+                setattr(cls, "__setattr__", object.__setattr__)
+
+    def unresolved(self) -> List[str]:
+        """Targets whose class never appeared."""
+        return [".".join(self.watch_targets[idx]) for idx in sorted(self.pending)]
@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 """Entrypoint for both PyInstaller and direct module use."""
 
+import multiprocessing
+
 from src.cli.__main__ import main
 
 if __name__ == "__main__":
+    # The frozen binary starts `index --jobs` workers by re-running itself
+    # (spawn on macOS); this turns those runs into workers instead of CLI calls.
+    multiprocessing.freeze_support()
     main()
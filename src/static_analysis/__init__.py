@@ -3,20 +3,47 @@ Static Analysis module for whyx CLI.
 
 This package now splits the previous monolithic implementation into:
 - analyzer.py : AST visitor and call resolution (StaticAnalyzer)
-- indexer.py  : build_index / load_index
-- queries.py  : build_call_maps / find_all_paths
+- indexer.py  : build_index / load_index / save_index
+- binary_index.py : compact mmap-backed on-disk index format
+- cache.py    : IndexCache, persistent LRU cache of indexes built on the fly
+- queries.py  : build_call_maps / find_all_paths / find_shortest_paths (+ BFS helpers)
+- adjacency.py : CSR adjacency persisted in the index / get_call_maps
+- reachability.py : SCCs (iterative Tarjan) + interval reachability labels
+- symbols.py  : SymbolIndex (exact / terminal / dotted-suffix name resolution)
 
 Public API is preserved by re-exporting the original symbols.
 """
 
+from .adjacency import get_call_maps
 from .analyzer import StaticAnalyzer
-from .indexer import build_index, load_index
-from .queries import build_call_maps, find_all_paths
+from .cache import IndexCache
+from .indexer import build_index, load_index, save_index
+from .queries import (
+    bfs_distances,
+    build_call_maps,
+    distances_to_roots,
+    find_all_paths,
+    find_shortest_paths,
+    shortest_path_length,
+)
+from .reachability import Reachability, get_reachability
+from .symbols import SymbolIndex, scan_symbols
 
 __all__ = [
     "StaticAnalyzer",
     "build_index",
     "load_index",
+    "save_index",
     "build_call_maps",
+    "get_call_maps",
     "find_all_paths",
+    "find_shortest_paths",
+    "shortest_path_length",
+    "bfs_distances",
+    "distances_to_roots",
+    "SymbolIndex",
+    "scan_symbols",
+    "Reachability",
+    "get_reachability",
+    "IndexCache",
 ]
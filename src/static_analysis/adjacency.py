@@ -0,0 +1,101 @@
+"""
+Precomputed call-graph adjacency in compressed-sparse-row (CSR) form.
+
+`build_index` stores, next to 'functions'/'edges':
+
+  'adjacency': {
+      'nodes':   sorted, de-duplicated names (functions + edge endpoints),
+      'forward': {'offsets': [...], 'targets': [...]},   caller id -> callee ids
+      'reverse': {'offsets': [...], 'targets': [...]},   callee id -> caller ids
+  }
+
+Neighbours of node i are targets[offsets[i]:offsets[i + 1]], de-duplicated and
+sorted by id. Since ids follow name order, that is also the order `build_call_maps`
+produces, so queries can read answers straight out of the index.
+"""
+
+import bisect
+from collections.abc import Mapping
+from typing import Dict, List, Sequence, Tuple
+
+from .queries import build_call_maps
+
+
+def _csr(pairs: List[Tuple[int, int]], n: int) -> Dict[str, List[int]]:
+    offsets = [0] * (n + 1)
+    for src, _ in pairs:
+        offsets[src + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+    return {"offsets": offsets, "targets": [dst for _, dst in pairs]}
+
+
+def build_adjacency(functions: Sequence[str], edges) -> Dict:
+    """Build the 'adjacency' section for the given functions and edges."""
+    unique_edges = set(tuple(e) for e in edges)
+    nodes = sorted(set(functions).union(n for e in unique_edges for n in e))
+    ids = {name: i for i, name in enumerate(nodes)}
+    pairs = sorted((ids[a], ids[b]) for a, b in unique_edges)
+    return {
+        "nodes": nodes,
+        "forward": _csr(pairs, len(nodes)),
+        "reverse": _csr(sorted((b, a) for a, b in pairs), len(nodes)),
+    }
+
+
+def node_id(nodes: Sequence[str], name: str) -> int:
+    """Binary-search `name` in the sorted node table; -1 if absent."""
+    i = bisect.bisect_left(nodes, name)
+    if i < len(nodes) and nodes[i] == name:
+        return i
+    return -1
+
+
+class CSRMap(Mapping):
+    """
+    Read-only `name -> [neighbour names]` mapping over one CSR direction.
+    Like the dicts from `build_call_maps`, only nodes with neighbours are keys.
+    """
+
+    def __init__(self, nodes: Sequence[str], offsets, targets):
+        self.nodes = nodes
+        self.offsets = offsets
+        self.targets = targets
+
+    def neighbour_ids(self, i: int):
+        return self.targets[self.offsets[i] : self.offsets[i + 1]]
+
+    def __getitem__(self, name: str) -> List[str]:
+        i = node_id(self.nodes, name) if isinstance(name, str) else -1
+        if i < 0 or self.offsets[i] == self.offsets[i + 1]:
+            raise KeyError(name)
+        nodes = self.nodes
+        return [nodes[j] for j in self.neighbour_ids(i)]
+
+    def __iter__(self):
+        offsets = self.offsets
+        for i in range(len(self.nodes)):
+            if offsets[i] != offsets[i + 1]:
+                yield self.nodes[i]
+
+    def __len__(self) -> int:
+        offsets = self.offsets
+        return sum(1 for i in range(len(self.nodes)) if offsets[i] != offsets[i + 1])
+
+
+def get_call_maps(index_data: Dict) -> Tuple[Mapping, Mapping]:
+    """
+    Return (callers_map, callees_map) for an index. Uses the persisted CSR adjacency
+    when present (O(answer size) per lookup) and falls back to `build_call_maps` for
+    indexes written before it existed.
+    """
+    adjacency = index_data.get("adjacency")
+    if not adjacency:
+        return build_call_maps(index_data)
+    nodes = adjacency["nodes"]
+    fwd = adjacency["forward"]
+    rev = adjacency["reverse"]
+    return (
+        CSRMap(nodes, rev["offsets"], rev["targets"]),
+        CSRMap(nodes, fwd["offsets"], fwd["targets"]),
+    )
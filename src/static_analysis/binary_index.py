@@ -0,0 +1,292 @@
+"""
+Compact binary on-disk format for the whyx static index.
+
+Layout (all integers little-endian):
+  header   : magic (8s) | version (u32) | section count (u32)
+  sections : count x [name (8s) | offset (u64) | length (u64)]
+  payload  : 8-byte aligned sections
+
+Sections:
+  STROFFS  : u64[n + 1]   offsets of each name inside STRDATA
+  STRDATA  : utf-8 bytes  sorted, de-duplicated function names (the string table)
+  FUNCS    : u32[]        string ids of index['functions'], in index order
+  EDGES    : u32[2 * E]   (caller id, callee id) pairs, in index order
+  FWDOFF   : u32[n + 1]   CSR offsets, caller id -> callees (see adjacency.py)
+  FWDTGT   : u32[]        CSR targets (callee ids)
+  REVOFF   : u32[n + 1]   CSR offsets, callee id -> callers
+  REVTGT   : u32[]        CSR targets (caller ids)
+  SCCCOMP  : u32[n]       component of each node (see reachability.py)
+  SCCCYCL  : u8[c]        1 if the component contains a cycle
+  SCCMOFF  : u32[c + 1]   component -> member offsets
+  SCCMEMB  : u32[]        member node ids
+  LBLOFFS  : u32[c + 1]   component -> label interval offsets
+  LBLIVAL  : u32[2 * k]   (lo, hi) component-id intervals
+  META     : utf-8 JSON   every other top-level key (root, generated_at, files, ...)
+
+The string table doubles as the adjacency node table, so node ids are string ids.
+
+Loading maps the file with `mmap` and exposes read-only views over the packed
+arrays, so nothing is decoded until a query touches it.
+"""
+
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .adjacency import build_adjacency
+from .reachability import build_reachability
+
+MAGIC = b"WHYXIDX\0"
+VERSION = 1
+
+_HEADER = struct.Struct("<8sII")
+_SECTION = struct.Struct("<8sQQ")
+_ARRAY_KEYS = ("functions", "edges", "adjacency", "reachability")
+
+
+def is_binary_index(path: str) -> bool:
+    """Return True if `path` starts with the binary index magic."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _packed(typecode: str, values) -> bytes:
+    arr = array(typecode, values)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def write_binary_index(index_data: Dict, output_file: str) -> None:
+    """
+    Serialize `index_data` to `output_file` in the binary format.
+    The file is written to a temporary sibling and renamed into place, so readers
+    that still have the previous version mapped are never handed a truncated file.
+    """
+    functions = list(index_data.get("functions", []))
+    edges = [tuple(e) for e in index_data.get("edges", [])]
+
+    adjacency = index_data.get("adjacency") or build_adjacency(functions, edges)
+    reachability = index_data.get("reachability") or build_reachability(adjacency)
+    names = adjacency["nodes"]
+    ids = {name: i for i, name in enumerate(names)}
+    encoded = [n.encode("utf-8") for n in names]
+    offsets = [0]
+    for blob in encoded:
+        offsets.append(offsets[-1] + len(blob))
+
+    meta = {k: v for k, v in index_data.items() if k not in _ARRAY_KEYS}
+    sections: List[Tuple[bytes, bytes]] = [
+        (b"STROFFS", _packed("Q", offsets)),
+        (b"STRDATA", b"".join(encoded)),
+        (b"FUNCS", _packed("I", (ids[f] for f in functions))),
+        (b"EDGES", _packed("I", (ids[n] for e in edges for n in e))),
+        (b"FWDOFF", _packed("I", adjacency["forward"]["offsets"])),
+        (b"FWDTGT", _packed("I", adjacency["forward"]["targets"])),
+        (b"REVOFF", _packed("I", adjacency["reverse"]["offsets"])),
+        (b"REVTGT", _packed("I", adjacency["reverse"]["targets"])),
+        (b"SCCCOMP", _packed("I", reachability["component"])),
+        (b"SCCCYCL", _packed("B", reachability["cyclic"])),
+        (b"SCCMOFF", _packed("I", reachability["members"]["offsets"])),
+        (b"SCCMEMB", _packed("I", reachability["members"]["nodes"])),
+        (b"LBLOFFS", _packed("I", reachability["labels"]["offsets"])),
+        (b"LBLIVAL", _packed("I", reachability["labels"]["intervals"])),
+        (b"META", json.dumps(meta).encode("utf-8")),
+    ]
+
+    pos = _HEADER.size + _SECTION.size * len(sections)
+    table = []
+    for name, payload in sections:
+        pos += -pos % 8
+        table.append((name, pos, len(payload)))
+        pos += len(payload)
+
+    out_dir = os.path.dirname(os.path.abspath(output_file))
+    fd, tmp_path = tempfile.mkstemp(prefix=".whyx_index.", dir=out_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(sections)))
+            for entry in table:
+                f.write(_SECTION.pack(*entry))
+            for (_, payload), (_, offset, _) in zip(sections, table):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(payload)
+        os.replace(tmp_path, output_file)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _array_view(buf: memoryview, typecode: str):
+    """Zero-copy view of a packed little-endian array (copied only on big-endian hosts)."""
+    if sys.byteorder == "little":
+        return buf.cast(typecode)
+    arr = array(typecode)
+    arr.frombytes(buf)
+    arr.byteswap()
+    return arr
+
+
+class StringTable(Sequence):
+    """Sorted string table; ids are positions, lookups are binary searches."""
+
+    def __init__(self, offsets, data: memoryview):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return str(self._data[self._offsets[i] : self._offsets[i + 1]], "utf-8")
+
+    def id_of(self, name: str) -> Optional[int]:
+        i = bisect.bisect_left(self, name)
+        if i < len(self) and self[i] == name:
+            return i
+        return None
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and self.id_of(name) is not None
+
+
+class _FunctionsView(Sequence):
+    def __init__(self, ids, strings: StringTable):
+        self._ids = ids
+        self._strings = strings
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._strings[j] for j in self._ids[i]]
+        return self._strings[self._ids[i]]
+
+    def __iter__(self) -> Iterator[str]:
+        strings = self._strings
+        for j in self._ids:
+            yield strings[j]
+
+    def __contains__(self, name) -> bool:
+        if not isinstance(name, str):
+            return False
+        sid = self._strings.id_of(name)
+        return sid is not None and sid in self._ids
+
+
+class _EdgesView(Sequence):
+    def __init__(self, pairs, strings: StringTable):
+        self._pairs = pairs
+        self._strings = strings
+
+    def __len__(self) -> int:
+        return len(self._pairs) // 2
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return (
+            self._strings[self._pairs[2 * i]],
+            self._strings[self._pairs[2 * i + 1]],
+        )
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        strings = self._strings
+        pairs = self._pairs
+        for i in range(0, len(pairs), 2):
+            yield strings[pairs[i]], strings[pairs[i + 1]]
+
+
+class BinaryIndex(Mapping):
+    """
+    Read-only, mmap-backed index. Behaves like the dict returned by `build_index`:
+    'functions' and 'edges' are lazy sequences over the packed arrays and the
+    remaining keys come from the META section.
+    """
+
+    def __init__(self, index_path: str):
+        with open(index_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mm)
+        magic, version, count = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{index_path} is not a whyx binary index")
+        if version != VERSION:
+            raise ValueError(f"Unsupported binary index version {version}")
+        self.sections: Dict[str, memoryview] = {}
+        for i in range(count):
+            name, offset, length = _SECTION.unpack_from(
+                buf, _HEADER.size + i * _SECTION.size
+            )
+            key = name.rstrip(b"\0").decode("ascii")
+            self.sections[key] = buf[offset : offset + length]
+
+        self.strings = StringTable(
+            _array_view(self.sections["STROFFS"], "Q"), self.sections["STRDATA"]
+        )
+        self._data = json.loads(str(self.sections["META"], "utf-8"))
+        self._data["functions"] = _FunctionsView(
+            _array_view(self.sections["FUNCS"], "I"), self.strings
+        )
+        self._data["edges"] = _EdgesView(
+            _array_view(self.sections["EDGES"], "I"), self.strings
+        )
+        if "FWDOFF" in self.sections:
+            self._data["adjacency"] = {
+                "nodes": self.strings,
+                "forward": {
+                    "offsets": self.array("FWDOFF"),
+                    "targets": self.array("FWDTGT"),
+                },
+                "reverse": {
+                    "offsets": self.array("REVOFF"),
+                    "targets": self.array("REVTGT"),
+                },
+            }
+        if "SCCCOMP" in self.sections:
+            self._data["reachability"] = {
+                "component": self.array("SCCCOMP"),
+                "cyclic": self.array("SCCCYCL", "B"),
+                "members": {
+                    "offsets": self.array("SCCMOFF"),
+                    "nodes": self.array("SCCMEMB"),
+                },
+                "labels": {
+                    "offsets": self.array("LBLOFFS"),
+                    "intervals": self.array("LBLIVAL"),
+                },
+            }
+
+    def array(self, section: str, typecode: str = "I"):
+        """Return a packed section as an integer view, or None if it is absent."""
+        buf = self.sections.get(section)
+        return None if buf is None else _array_view(buf, typecode)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,161 @@
+"""
+Persistent cache for indexes built on the fly (no saved index file present).
+
+Entries are binary indexes (see binary_index.py) stored under
+`$WHYX_CACHE_DIR`, else `$XDG_CACHE_HOME/whyx`, else `~/.cache/whyx`, named
+
+  <root key>-<tree fingerprint>.bin
+
+where the root key hashes the absolute project path and the tree fingerprint
+hashes (path, mtime_ns, size) of every module the indexer would read, so a hit
+costs one directory walk plus a stat per file. An entry whose fingerprint no
+longer matches is still used as the `previous` index of the rebuild, so only
+changed files are re-parsed. The directory is kept under `max_bytes` by evicting
+the least recently used entries (a hit refreshes the entry's mtime).
+"""
+
+import hashlib
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .binary_index import VERSION as BINARY_VERSION
+from .indexer import build_index, iter_module_files, load_index, save_index
+
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+ENTRY_SUFFIX = ".bin"
+
+# Files modified this recently may still change within the filesystem's mtime
+# granularity without their (mtime, size) changing, so such trees are not stored.
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def default_cache_dir() -> str:
+    explicit = os.environ.get("WHYX_CACHE_DIR")
+    if explicit:
+        return explicit
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "whyx")
+
+
+def _max_bytes_from_env() -> int:
+    try:
+        return int(os.environ["WHYX_CACHE_MAX_BYTES"])
+    except (KeyError, ValueError):
+        return DEFAULT_MAX_BYTES
+
+
+def root_key(project_path: str) -> str:
+    return hashlib.blake2b(
+        os.path.abspath(project_path).encode("utf-8"), digest_size=8
+    ).hexdigest()
+
+
+def tree_fingerprint(project_path: str) -> Tuple[str, int]:
+    """
+    Hash of (relative path, mtime_ns, size) over the modules of `project_path`.
+    Returns (fingerprint, newest mtime_ns seen).
+    """
+    project_path = os.path.abspath(project_path)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"whyx-cache:{CACHE_VERSION}:{BINARY_VERSION}\0".encode("utf-8"))
+    newest = 0
+    for file_path, _mod_name in iter_module_files(project_path):
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            continue
+        rel_path = os.path.relpath(file_path, project_path)
+        h.update(f"{rel_path}\0{st.st_mtime_ns}\0{st.st_size}\n".encode("utf-8"))
+        newest = max(newest, st.st_mtime_ns)
+    return h.hexdigest(), newest
+
+
+class IndexCache:
+    """Size-bounded, LRU-evicted directory of cached indexes."""
+
+    def __init__(
+        self, directory: Optional[str] = None, max_bytes: Optional[int] = None
+    ):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = _max_bytes_from_env() if max_bytes is None else max_bytes
+
+    def entry_path(self, project_path: str, fingerprint: str) -> str:
+        return os.path.join(
+            self.directory, f"{root_key(project_path)}-{fingerprint}{ENTRY_SUFFIX}"
+        )
+
+    def _entries(self, prefix: str = "") -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of cache entries, least recently used first."""
+        out = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return out
+        for name in names:
+            if not (name.startswith(prefix) and name.endswith(ENTRY_SUFFIX)):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            out.append((st.st_mtime, st.st_size, path))
+        out.sort()
+        return out
+
+    def lookup(self, project_path: str, fingerprint: str) -> Optional[Dict]:
+        path = self.entry_path(project_path, fingerprint)
+        if not os.path.isfile(path):
+            return None
+        try:
+            index_data = load_index(path)
+            os.utime(path)
+        except Exception:
+            return None
+        return index_data
+
+    def latest(self, project_path: str) -> Optional[Dict]:
+        """Most recently used entry for `project_path`, whatever its fingerprint."""
+        for _mtime, _size, path in reversed(self._entries(root_key(project_path))):
+            try:
+                return load_index(path)
+            except Exception:
+                continue
+        return None
+
+    def store(self, project_path: str, fingerprint: str, index_data: Dict) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            save_index(index_data, self.entry_path(project_path, fingerprint), "binary")
+        except OSError:
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _mtime, size, _path in entries)
+        for _mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def load_or_build(self, project_path: str) -> Dict:
+        """Return the cached index for the current tree, building and caching it on a miss."""
+        fingerprint, newest_ns = tree_fingerprint(project_path)
+        index_data = self.lookup(project_path, fingerprint)
+        if index_data is not None:
+            return index_data
+        index_data = build_index(
+            project_path, output_file=None, previous=self.latest(project_path)
+        )
+        if newest_ns < time.time_ns() - RACY_WINDOW_NS:
+            self.store(project_path, fingerprint, index_data)
+        return index_data
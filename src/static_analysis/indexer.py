@@ -1,23 +1,157 @@
 """Index building and loading for whyx static analysis (logic preserved)."""
 
 import ast
+import calendar
+import hashlib
 import json
 import os
 import time
-from typing import Dict, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 
+from .adjacency import build_adjacency
 from .analyzer import StaticAnalyzer
+from .binary_index import BinaryIndex, is_binary_index, write_binary_index
+from .reachability import build_reachability
 
+INDEX_FORMATS = ("json", "binary")
 
-def build_index(project_path: str, output_file: Optional[str] = None) -> Dict:
+# Sections of long integer arrays (see adjacency.py / reachability.py). The JSON
+# format writes them on one line each; indented, they take one line per number.
+COMPACT_JSON_SECTIONS = ("adjacency", "reachability")
+
+SKIP_DIRS = {
+    ".git",
+    "__pycache__",
+    ".venv",
+    "venv",
+    ".mypy_cache",
+    ".pytest_cache",
+    "build",
+    "dist",
+    ".eggs",
+    ".tox",
+    "node_modules",
+}
+
+
+def iter_module_files(project_path: str) -> Iterator[Tuple[str, str]]:
+    """Yield (file_path, module_name) for every .py file under project_path, in walk order."""
+    for root, dirs, files in os.walk(project_path, topdown=True):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for fname in files:
+            if not fname.endswith(".py"):
+                continue
+            file_path = os.path.join(root, fname)
+            rel_path = os.path.relpath(file_path, project_path)
+            mod_name = rel_path.replace(os.sep, ".")[:-3]
+            if mod_name.endswith(".__init__"):
+                mod_name = mod_name[: -len(".__init__")]
+            yield file_path, mod_name
+
+
+def content_hash(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def analyze_file(
+    job: Tuple[str, str],
+) -> Tuple[Optional[Dict], List[str], List[Tuple[str, str]]]:
+    """
+    Read, fingerprint, parse and visit a single module.
+    Returns (fingerprint, functions, edges); the fingerprint is None when the file
+    cannot be read and the lists are empty when it cannot be parsed.
+    Top-level so it can run in a worker process.
+    """
+    file_path, mod_name = job
+    try:
+        with open(file_path, "rb") as f:
+            st = os.fstat(f.fileno())
+            raw = f.read()
+    except Exception:
+        return None, [], []
+    fingerprint = {
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "hash": content_hash(raw),
+    }
+    try:
+        source = raw.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+        tree = ast.parse(source, filename=file_path)
+    except Exception:
+        return fingerprint, [], []
+    analyzer = StaticAnalyzer(mod_name)
+    analyzer.visit(tree)
+    return fingerprint, analyzer.functions, analyzer.edges
+
+
+def _generated_at_ns(index_data: Dict) -> int:
+    try:
+        stamp = time.strptime(index_data["generated_at"], "%Y-%m-%dT%H:%M:%SZ")
+    except Exception:
+        return 0
+    return calendar.timegm(stamp) * 1_000_000_000
+
+
+def _reusable_entry(
+    file_path: str, entry: Optional[Dict], trusted_before_ns: int
+) -> Optional[Dict]:
+    """
+    Return an up-to-date fingerprint for `file_path` if its previous analysis can be
+    reused, else None. mtime/size are trusted only for files last modified before the
+    previous scan started; anything else is confirmed by content hash.
+    """
+    if not entry:
+        return None
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    if st.st_size != entry.get("size"):
+        return None
+    if st.st_mtime_ns == entry.get("mtime_ns") and st.st_mtime_ns < trusted_before_ns:
+        return entry
+    try:
+        with open(file_path, "rb") as f:
+            raw = f.read()
+    except Exception:
+        return None
+    if content_hash(raw) != entry.get("hash"):
+        return None
+    return dict(entry, mtime_ns=st.st_mtime_ns)
+
+
+def _resolve_jobs(jobs: int) -> int:
+    if jobs is None or jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def build_index(
+    project_path: str,
+    output_file: Optional[str] = None,
+    jobs: int = 1,
+    previous: Optional[Dict] = None,
+    output_format: str = "json",
+) -> Dict:
     """
     Analyze all Python files in the given project path to build a static call graph index.
     Returns a dict containing:
       - 'functions': List[str]
       - 'edges': List[Tuple[str, str]]
+      - 'files': {rel_path: {mtime_ns, size, hash, functions: [lo, hi], edges: [lo, hi]}}
+      - 'adjacency': forward/reverse call maps in CSR form (see adjacency.py)
+      - 'reachability': SCCs + interval reachability labels (see reachability.py)
       - 'root': str (project path)
       - 'generated_at': ISO timestamp
-    Optionally writes the index to a JSON file.
+    Optionally writes the index to `output_file` as JSON or, with
+    output_format='binary', in the compact mmap-able format (see binary_index.py).
+
+    `jobs` > 1 spreads parsing over a process pool (`jobs` <= 0 uses every CPU).
+    Results are merged in walk order, so the output matches a serial build.
+
+    When `previous` (an index of the same root) is given, files whose fingerprint is
+    unchanged are not re-parsed; their slices of 'functions'/'edges' are reused.
     """
     project_path = os.path.abspath(project_path)
     index_data = {
@@ -25,53 +159,89 @@ def build_index(project_path: str, output_file: Optional[str] = None) -> Dict:
         "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
         "functions": [],
         "edges": [],
+        "files": {},
     }
 
-    skip_dirs = {
-        ".git",
-        "__pycache__",
-        ".venv",
-        "venv",
-        ".mypy_cache",
-        ".pytest_cache",
-        "build",
-        "dist",
-        ".eggs",
-        ".tox",
-        "node_modules",
-    }
+    prev_files: Dict = {}
+    trusted_before_ns = 0
+    if previous and previous.get("root") == project_path:
+        prev_files = previous.get("files") or {}
+        trusted_before_ns = _generated_at_ns(previous)
 
-    for root, dirs, files in os.walk(project_path, topdown=True):
-        dirs[:] = [d for d in dirs if d not in skip_dirs]
-        for fname in files:
-            if not fname.endswith(".py"):
-                continue
-            file_path = os.path.join(root, fname)
-            rel_path = os.path.relpath(file_path, project_path)
-            mod_name = rel_path.replace(os.sep, ".")[:-3]
-            if mod_name.endswith(".__init__"):
-                mod_name = mod_name[: -len(".__init__")]
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    source = f.read()
-                tree = ast.parse(source, filename=file_path)
-            except Exception:
+    work = list(iter_module_files(project_path))
+    reused: Dict[int, Dict] = {}
+    to_parse: List[Tuple[str, str]] = []
+    for i, (file_path, mod_name) in enumerate(work):
+        rel_path = os.path.relpath(file_path, project_path)
+        entry = _reusable_entry(file_path, prev_files.get(rel_path), trusted_before_ns)
+        if entry is not None:
+            reused[i] = entry
+        else:
+            to_parse.append((file_path, mod_name))
+
+    jobs = _resolve_jobs(jobs)
+    if jobs > 1 and len(to_parse) > 1:
+        chunksize = max(1, len(to_parse) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            parsed = iter(list(pool.map(analyze_file, to_parse, chunksize=chunksize)))
+    else:
+        parsed = (analyze_file(job) for job in to_parse)
+
+    functions = index_data["functions"]
+    edges = index_data["edges"]
+    for i, (file_path, _mod_name) in enumerate(work):
+        rel_path = os.path.relpath(file_path, project_path)
+        entry = reused.get(i)
+        if entry is not None:
+            flo, fhi = entry["functions"]
+            elo, ehi = entry["edges"]
+            file_functions = previous["functions"][flo:fhi]
+            file_edges = [tuple(e) for e in previous["edges"][elo:ehi]]
+            fingerprint = {k: entry[k] for k in ("mtime_ns", "size", "hash")}
+        else:
+            fingerprint, file_functions, file_edges = next(parsed)
+            if fingerprint is None:
                 continue
-            analyzer = StaticAnalyzer(mod_name)
-            analyzer.visit(tree)
-            index_data["functions"].extend(analyzer.functions)
-            index_data["edges"].extend(analyzer.edges)
+        index_data["files"][rel_path] = dict(
+            fingerprint,
+            functions=[len(functions), len(functions) + len(file_functions)],
+            edges=[len(edges), len(edges) + len(file_edges)],
+        )
+        functions.extend(file_functions)
+        edges.extend(file_edges)
+
+    index_data["adjacency"] = build_adjacency(functions, edges)
+    index_data["reachability"] = build_reachability(index_data["adjacency"])
 
     if output_file:
         try:
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(index_data, f, indent=2)
+            save_index(index_data, output_file, output_format)
         except Exception as e:
             print(f"Error writing index to {output_file}: {e}")
     return index_data
 
 
+def save_index(index_data: Dict, output_file: str, output_format: str = "json") -> None:
+    """Write an index to disk as JSON (default) or in the binary format."""
+    if output_format == "binary":
+        write_binary_index(index_data, output_file)
+        return
+    if output_format != "json":
+        raise ValueError(f"Unknown index format: {output_format}")
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write("{")
+        for i, (key, value) in enumerate(index_data.items()):
+            if key in COMPACT_JSON_SECTIONS:
+                text = json.dumps(value, separators=(",", ":"))
+            else:
+                text = json.dumps(value, indent=2).replace("\n", "\n  ")
+            f.write(f"{',' if i else ''}\n  {json.dumps(key)}: {text}")
+        f.write("\n}" if index_data else "}")
+
+
 def load_index(index_path: str) -> Dict:
-    """Load a previously saved static index JSON file."""
+    """Load a previously saved static index; the on-disk format is detected automatically."""
+    if is_binary_index(index_path):
+        return BinaryIndex(index_path)
     with open(index_path, "r", encoding="utf-8") as f:
         return json.load(f)
@@ -1,6 +1,6 @@
 """Query helpers for whyx static analysis (logic preserved)."""
 
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Mapping, Optional, Set, Tuple
 
 
 def build_call_maps(
@@ -23,18 +23,126 @@ def build_call_maps(
     return callers_map, callees_map
 
 
+def bfs_distances(
+    start: str, adj: Mapping[str, List[str]], max_depth: int
+) -> Dict[str, int]:
+    """Hop distance from `start` to every node reachable through `adj` within `max_depth`."""
+    dist = {start: 0}
+    frontier = [start]
+    for depth in range(1, max_depth + 1):
+        nxt = []
+        for node in frontier:
+            for nb in adj.get(node, []):
+                if nb not in dist:
+                    dist[nb] = depth
+                    nxt.append(nb)
+        if not nxt:
+            break
+        frontier = nxt
+    return dist
+
+
+def distances_to_roots(
+    target: str, callers_adj: Mapping[str, List[str]], max_depth: int
+) -> Dict[str, int]:
+    """
+    For every node within `max_depth` callers of `target`, the fewest caller hops
+    to a root (a node nobody calls). Nodes whose every caller chain cycles or leaves
+    the `max_depth` cone are absent.
+    """
+    cone = bfs_distances(target, callers_adj, max_depth)
+    down: Dict[str, List[str]] = {}
+    frontier: List[str] = []
+    to_root: Dict[str, int] = {}
+    for node in cone:
+        callers = callers_adj.get(node, [])
+        if not callers:
+            to_root[node] = 0
+            frontier.append(node)
+        for caller in callers:
+            if caller in cone:
+                down.setdefault(caller, []).append(node)
+    while frontier:
+        nxt = []
+        for node in frontier:
+            for callee in down.get(node, []):
+                if callee not in to_root:
+                    to_root[callee] = to_root[node] + 1
+                    nxt.append(callee)
+        frontier = nxt
+    return to_root
+
+
+def shortest_path_length(
+    source: str,
+    target: str,
+    forward_adj: Mapping[str, List[str]],
+    reverse_adj: Mapping[str, List[str]],
+    max_depth: int = 32,
+) -> Optional[int]:
+    """
+    Bidirectional BFS: length of the shortest call path source -> target, or None if
+    there is none within `max_depth`. Always expands the smaller frontier.
+    """
+    if source == target:
+        return 0
+    seen_f = {source: 0}
+    seen_b = {target: 0}
+    front_f = [source]
+    front_b = [target]
+    depth_f = depth_b = 0
+    while front_f and front_b and depth_f + depth_b < max_depth:
+        forward = len(front_f) <= len(front_b)
+        frontier, seen, other, adj = (
+            (front_f, seen_f, seen_b, forward_adj)
+            if forward
+            else (front_b, seen_b, seen_f, reverse_adj)
+        )
+        depth = (depth_f if forward else depth_b) + 1
+        best = None
+        nxt = []
+        for node in frontier:
+            for nb in adj.get(node, []):
+                if nb in other:
+                    total = depth + other[nb]
+                    best = total if best is None else min(best, total)
+                if nb not in seen:
+                    seen[nb] = depth
+                    nxt.append(nb)
+        if best is not None:
+            return best if best <= max_depth else None
+        if forward:
+            front_f, depth_f = nxt, depth
+        else:
+            front_b, depth_b = nxt, depth
+    return None
+
+
 def find_all_paths(
     source: str,
     target: str,
     forward_adj: Dict[str, List[str]],
     limit: int = 50,
     max_depth: int = 32,
+    reverse_adj: Optional[Mapping[str, List[str]]] = None,
 ) -> List[List[str]]:
     """
     Enumerate up to `limit` simple call paths from `source` to `target` using DFS (bounded by `max_depth`).
+
+    With `reverse_adj`, the distance of every node to `target` is precomputed by a
+    backward BFS, and the DFS only expands nodes that can still reach the target
+    within the remaining depth. Paths and their order are unchanged; branches that
+    could never reach the target are simply not explored.
     """
     results: List[List[str]] = []
     path: List[str] = []
+    to_target = (
+        bfs_distances(target, reverse_adj, max_depth)
+        if reverse_adj is not None
+        else None
+    )
+    if to_target is not None and to_target.get(source, max_depth + 1) > max_depth:
+        return results
 
     def dfs(node: str, depth: int, visited: Set[str]):
         if len(results) >= limit or depth > max_depth:
@@ -45,10 +153,59 @@ def find_all_paths(
             results.append(list(path))
         else:
             for nb in forward_adj.get(node, []):
-                if nb not in visited:
-                    dfs(nb, depth + 1, visited)
+                if nb in visited:
+                    continue
+                if to_target is not None and (
+                    depth + 1 + to_target.get(nb, max_depth + 1) > max_depth
+                ):
+                    continue
+                dfs(nb, depth + 1, visited)
         path.pop()
         visited.remove(node)
 
     dfs(source, 0, set())
     return results
+
+
+def find_shortest_paths(
+    source: str,
+    target: str,
+    forward_adj: Mapping[str, List[str]],
+    reverse_adj: Mapping[str, List[str]],
+    limit: int = 50,
+    max_depth: int = 32,
+) -> List[List[str]]:
+    """
+    Like `find_all_paths`, but returns paths in order of increasing length: all
+    shortest paths first (found by bidirectional BFS), then longer ones up to
+    `max_depth`, until `limit` paths are collected.
+    """
+    shortest = shortest_path_length(source, target, forward_adj, reverse_adj, max_depth)
+    if shortest is None:
+        return []
+    to_target = bfs_distances(target, reverse_adj, max_depth)
+    results: List[List[str]] = []
+    path: List[str] = [source]
+    visited: Set[str] = {source}
+
+    def dfs(node: str, depth: int, length: int):
+        if node == target:
+            if depth == length:
+                results.append(list(path))
+            return
+        for nb in forward_adj.get(node, []):
+            if len(results) >= limit:
+                return
+            if nb in visited or depth + 1 + to_target.get(nb, length + 1) > length:
+                continue
+            visited.add(nb)
+            path.append(nb)
+            dfs(nb, depth + 1, length)
+            path.pop()
+            visited.remove(nb)
+
+    for length in range(shortest, max_depth + 1):
+        if len(results) >= limit:
+            break
+        dfs(source, 0, length)
+    return results
@@ -0,0 +1,318 @@
+"""
+Strongly connected components, condensation DAG and reachability labels.
+
+Built from the CSR adjacency (see adjacency.py) and stored in the index as:
+
+  'reachability': {
+      'component':       component id of every adjacency node,
+      'cyclic':          1 if a component contains a cycle (size > 1 or self call),
+      'members':         {'offsets': [...], 'nodes': [...]}   component -> node ids,
+      'labels':          {'offsets': [...], 'intervals': [lo, hi, ...]},
+  }
+
+Components are numbered in the order an iterative Tarjan emits them, which is a
+post-order of the condensation DAG: every cross-component edge goes from a higher
+id to a lower one, and the components discovered below a component c in the DFS
+form the contiguous id range [low(c), c]. Each component's label is the merged,
+sorted list of id intervals it can reach (its own range plus its successors'
+labels, after Agrawal et al.), so "can A reach B" is a binary search.
+
+Labels are not bounded by the graph's size in general: a component reaching
+every other one of n components that lie between unreached ones needs n/2
+intervals, and on some DAGs the labels add up to O(n^2). A label longer than
+MAX_LABEL_INTERVALS is therefore not stored; the component's label is left
+empty (a stored label always holds the component's own range), and so are the
+labels of every component reaching it. Queries from an unlabeled component
+search the condensation DAG through the CSR adjacency instead, stopping at
+labeled components.
+"""
+
+import bisect
+from collections.abc import Sequence
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .adjacency import build_adjacency, node_id
+
+MAX_LABEL_INTERVALS = 64
+
+
+def strongly_connected_components(
+    n: int, offsets: Sequence[int], targets: Sequence[int]
+) -> Tuple[List[int], List[int]]:
+    """
+    Iterative Tarjan over a CSR graph with nodes 0..n-1 (no recursion limit).
+    Returns (component of each node, low(c) for each component).
+    """
+    index = [-1] * n
+    lowlink = [0] * n
+    on_stack = [False] * n
+    entered_at = [0] * n
+    component = [-1] * n
+    low: List[int] = []
+    stack: List[int] = []
+    counter = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        entered_at[root] = len(low)
+        stack.append(root)
+        on_stack[root] = True
+        work = [[root, offsets[root]]]
+        while work:
+            frame = work[-1]
+            v, pos = frame
+            if pos < offsets[v + 1]:
+                frame[1] = pos + 1
+                w = targets[pos]
+                if index[w] == -1:
+                    index[w] = lowlink[w] = counter
+                    counter += 1
+                    entered_at[w] = len(low)
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append([w, offsets[w]])
+                elif on_stack[w] and index[w] < lowlink[v]:
+                    lowlink[v] = index[w]
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if lowlink[v] < lowlink[parent]:
+                    lowlink[parent] = lowlink[v]
+            if lowlink[v] == index[v]:
+                comp = len(low)
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component[w] = comp
+                    if w == v:
+                        break
+                low.append(entered_at[v])
+    return component, low
+
+
+def _merge(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    intervals.sort()
+    merged = [intervals[0]]
+    for lo, hi in intervals[1:]:
+        last_lo, last_hi = merged[-1]
+        if lo <= last_hi + 1:
+            if hi > last_hi:
+                merged[-1] = (last_lo, hi)
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def build_reachability(adjacency: Dict) -> Dict:
+    """
+    Compute the 'reachability' section from an 'adjacency' section. Stored
+    labels hold at most MAX_LABEL_INTERVALS intervals each (see above), so the
+    section stays O(n) even where full labels would be O(n^2).
+    """
+    n = len(adjacency["nodes"])
+    offsets = adjacency["forward"]["offsets"]
+    targets = adjacency["forward"]["targets"]
+    component, low = strongly_connected_components(n, offsets, targets)
+    ncomp = len(low)
+
+    members: List[List[int]] = [[] for _ in range(ncomp)]
+    for v in range(n):
+        members[component[v]].append(v)
+
+    cyclic = [0] * ncomp
+    successors: List[set] = [set() for _ in range(ncomp)]
+    for v in range(n):
+        cv = component[v]
+        if len(members[cv]) > 1:
+            cyclic[cv] = 1
+        for w in targets[offsets[v] : offsets[v + 1]]:
+            cw = component[w]
+            if cw == cv:
+                cyclic[cv] = 1
+            else:
+                successors[cv].add(cw)
+
+    label_offsets = [0]
+    flat: List[int] = []
+    # None for components whose label was too long to store.
+    labels: List[Optional[List[Tuple[int, int]]]] = []
+    for c in range(ncomp):
+        label: Optional[List[Tuple[int, int]]] = None
+        if all(labels[d] is not None for d in successors[c]):
+            intervals = [(low[c], c)]
+            for d in successors[c]:
+                intervals.extend(labels[d])
+            label = _merge(intervals)
+            if len(label) > MAX_LABEL_INTERVALS:
+                label = None
+        labels.append(label)
+        for lo, hi in label or ():
+            flat.extend((lo, hi))
+        label_offsets.append(len(flat) // 2)
+
+    member_offsets = [0]
+    member_nodes: List[int] = []
+    for group in members:
+        member_nodes.extend(group)
+        member_offsets.append(len(member_nodes))
+
+    return {
+        "component": component,
+        "cyclic": cyclic,
+        "members": {"offsets": member_offsets, "nodes": member_nodes},
+        "labels": {"offsets": label_offsets, "intervals": flat},
+    }
+
+
+class Reachability:
+    """
+    O(log label size) reachability queries over a 'reachability' section.
+    Components without a stored label are searched through `forward`, the
+    adjacency's CSR callee lists.
+    """
+
+    def __init__(self, nodes: Sequence[str], section: Dict, forward: Dict):
+        self.nodes = nodes
+        self.forward_offsets = forward["offsets"]
+        self.forward_targets = forward["targets"]
+        self.component = section["component"]
+        self.cyclic = section["cyclic"]
+        self.member_offsets = section["members"]["offsets"]
+        self.member_nodes = section["members"]["nodes"]
+        self.label_offsets = section["labels"]["offsets"]
+        self.intervals = section["labels"]["intervals"]
+
+    def _label(self, comp: int) -> Tuple[int, int]:
+        return self.label_offsets[comp], self.label_offsets[comp + 1]
+
+    def _successors(self, comp: int) -> List[int]:
+        """Components `comp` calls into directly."""
+        component = self.component
+        offsets = self.forward_offsets
+        found = set()
+        for v in self.member_nodes[
+            self.member_offsets[comp] : self.member_offsets[comp + 1]
+        ]:
+            for w in self.forward_targets[offsets[v] : offsets[v + 1]]:
+                found.add(component[w])
+        found.discard(comp)
+        return list(found)
+
+    def _label_range(self, comp: int) -> Iterator[int]:
+        """The components in a stored label."""
+        lo, hi = self._label(comp)
+        for k in range(lo, hi):
+            yield from range(self.intervals[2 * k], self.intervals[2 * k + 1] + 1)
+
+    def _reached(self, ca: int) -> Iterable[int]:
+        """Components `ca` reaches, itself included."""
+        lo, hi = self._label(ca)
+        if lo < hi:
+            return self._label_range(ca)
+        reached = {ca}
+        stack = [ca]
+        while stack:
+            c = stack.pop()
+            lo, hi = self._label(c)
+            if c != ca and lo < hi:
+                reached.update(self._label_range(c))
+                continue
+            for d in self._successors(c):
+                if d not in reached:
+                    reached.add(d)
+                    stack.append(d)
+        return reached
+
+    def _search(self, ca: int, cb: int) -> bool:
+        """_comp_reaches for a component without a stored label."""
+        seen = {ca}
+        stack = [ca]
+        while stack:
+            c = stack.pop()
+            for d in self._successors(c):
+                # Edges go from higher to lower ids, so nothing below cb leads to it.
+                if d in seen or d < cb:
+                    continue
+                if d == cb:
+                    return True
+                seen.add(d)
+                lo, hi = self._label(d)
+                if lo == hi:
+                    stack.append(d)
+                elif self._comp_reaches(d, cb):
+                    return True
+        return False
+
+    def _comp_reaches(self, ca: int, cb: int) -> bool:
+        lo, hi = self._label(ca)
+        if lo == hi:
+            return ca == cb or self._search(ca, cb)
+        # Interval starts are intervals[2k]; find the last one <= cb.
+        starts = _Starts(self.intervals, lo, hi)
+        k = bisect.bisect_right(starts, cb) - 1
+        return k >= 0 and self.intervals[2 * (lo + k) + 1] >= cb
+
+    def reachable(self, source: str, target: str) -> bool:
+        """True if `target` is `source` or is reachable from it through call edges."""
+        if source == target:
+            return True
+        a = node_id(self.nodes, source)
+        b = node_id(self.nodes, target)
+        if a < 0 or b < 0:
+            return False
+        return self._comp_reaches(self.component[a], self.component[b])
+
+    def descendants(self, name: str) -> List[str]:
+        """All nodes reachable from `name` through one or more call edges, sorted."""
+        a = node_id(self.nodes, name)
+        if a < 0:
+            return []
+        ca = self.component[a]
+        ids: List[int] = []
+        for c in self._reached(ca):
+            if c == ca and not self.cyclic[c]:
+                continue
+            ids.extend(
+                self.member_nodes[self.member_offsets[c] : self.member_offsets[c + 1]]
+            )
+        ids.sort()
+        return [self.nodes[i] for i in ids]
+
+
+class _Starts(Sequence):
+    """Interval start values of one label, as a sequence bisect can search."""
+
+    def __init__(self, intervals: Sequence[int], lo: int, hi: int):
+        self._intervals = intervals
+        self._lo = lo
+        self._len = hi - lo
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, k: int) -> int:
+        return self._intervals[2 * (self._lo + k)]
+
+
+def get_reachability(index_data: Dict, compute: bool = False) -> Optional[Reachability]:
+    """
+    Reachability helper for an index: from the persisted section when present,
+    otherwise computed on the fly if `compute` is set (else None).
+    """
+    adjacency = index_data.get("adjacency")
+    section = index_data.get("reachability")
+    if adjacency and section:
+        return Reachability(adjacency["nodes"], section, adjacency["forward"])
+    if not compute:
+        return None
+    if not adjacency:
+        adjacency = build_adjacency(
+            index_data.get("functions", []), index_data.get("edges", [])
+        )
+    return Reachability(
+        adjacency["nodes"], build_reachability(adjacency), adjacency["forward"]
+    )
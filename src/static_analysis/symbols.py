@@ -0,0 +1,93 @@
+"""Symbol resolution index: exact, terminal-name and dotted-suffix lookups."""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def scan_symbols(functions: List[str], name: str) -> Tuple[str, Optional[List[str]]]:
+    """
+    Resolve `name` with one linear scan over `functions` (same contract as
+    SymbolIndex.resolve). Cheaper than building a SymbolIndex for a single
+    lookup; long-lived sessions build the index once instead.
+    """
+    if name in functions:
+        return name, None
+    if "." in name:
+        suffix = "." + name
+        candidates = [f for f in functions if f.endswith(suffix)]
+    else:
+        candidates = [f for f in functions if f.rsplit(".", 1)[-1] == name]
+    if len(candidates) == 1:
+        return candidates[0], None
+    if candidates:
+        return "", sorted(candidates)
+    return name, None
+
+
+class _SuffixNode:
+    __slots__ = ("children", "names")
+
+    def __init__(self):
+        self.children: Dict[str, "_SuffixNode"] = {}
+        self.names: List[str] = []
+
+
+class SymbolIndex:
+    """
+    Resolves short or suffix names against the functions of an index.
+
+    - `exact`     : set of every function name
+    - `terminals` : terminal name -> trie node (the first level of the trie below)
+    - a trie over reversed dotted segments: 'pkg.mod.fn' is stored under
+      fn -> mod -> pkg, so any dotted suffix is a path from the root.
+
+    Resolving a name costs O(number of segments) plus the size of the answer,
+    but building it is a pass over every function that costs far more than one
+    `scan_symbols`: build it only for sessions that answer many queries.
+    """
+
+    def __init__(self, functions: Iterable[str]):
+        self.exact = set()
+        self._root = _SuffixNode()
+        for fq in functions:
+            self.exact.add(fq)
+            node = self._root
+            for seg in reversed(fq.split(".")):
+                child = node.children.get(seg)
+                if child is None:
+                    child = node.children[seg] = _SuffixNode()
+                node = child
+            node.names.append(fq)
+
+    @property
+    def terminals(self) -> Dict[str, _SuffixNode]:
+        return self._root.children
+
+    def _lookup(self, name: str) -> Optional[_SuffixNode]:
+        node = self._root
+        for seg in reversed(name.split(".")):
+            node = node.children.get(seg)
+            if node is None:
+                return None
+        return node
+
+    @staticmethod
+    def _collect(node: _SuffixNode) -> List[str]:
+        out: List[str] = []
+        stack = [node]
+        while stack:
+            cur = stack.pop()
+            out.extend(cur.names)
+            stack.extend(cur.children.values())
+        return out
+
+    def resolve(self, name: str) -> Tuple[str, Optional[List[str]]]:
+        """Same contract as `cli._shared.resolve_symbol_suffix`."""
+        if name in self.exact:
+            return name, None
+        node = self._lookup(name)
+        if node is None:
+            return name, None
+        candidates = self._collect(node)
+        if len(candidates) == 1:
+            return candidates[0], None
+        return "", sorted(candidates)
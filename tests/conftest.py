@@ -25,12 +25,14 @@ def repo_root() -> Path:
 
 
 @pytest.fixture(scope="session")
-def base_env(repo_root: Path) -> Dict[str, str]:
+def base_env(repo_root: Path, tmp_path_factory) -> Dict[str, str]:
     """
     Ensure the CLI package (src/...) is importable when we spawn subprocesses
-    from arbitrary working directories.
+    from arbitrary working directories, and keep the index cache out of $HOME.
     """
     env = os.environ.copy()
+    env["XDG_CACHE_HOME"] = str(tmp_path_factory.mktemp("xdg_cache"))
+    env.pop("WHYX_CACHE_DIR", None)
     py_path = env.get("PYTHONPATH", "")
     env["PYTHONPATH"] = os.pathsep.join(
         [str(repo_root)] + ([py_path] if py_path else [])
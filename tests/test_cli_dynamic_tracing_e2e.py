@@ -143,3 +143,802 @@ def test_run_trace_watch_history_search_report_and_diff_end_to_end(
     assert any(k.endswith(".Person.age") for k in keys), (
         f"No watch_diffs for Person.age: {wd}"
     )
+
+
+def test_backends_record_the_same_script_events(demo_scripts, base_env):
+    root: Path = demo_scripts["root"]
+    v2: Path = demo_scripts["v2"]
+    target = f"{v2.stem}.Person.age"
+
+    script_events = {}
+    for backend in ("settrace", "monitoring"):
+        out = root / f"trace_{backend}.json"
+        run_whyx(
+            ["--json", "run", "--trace", "--watch", target, "--backend", backend]
+            + ["-o", str(out), str(v2)],
+            cwd=root,
+            env=base_env,
+        )
+        events = json.loads(out.read_text(encoding="utf-8"))
+        script_events[backend] = [
+            ev
+            for ev in events
+            if ev["type"] == "assign" or ev["func"].startswith("__main__.")
+        ]
+
+    assert script_events["settrace"] == script_events["monitoring"]
+    assigns = [ev for ev in script_events["monitoring"] if ev["type"] == "assign"]
+    assert [ev["value"] for ev in assigns] == ["0", "1", "2"]
+
+
+def test_ndjson_trace_streams_and_reads_like_json(demo_scripts, base_env):
+    root: Path = demo_scripts["root"]
+    v1: Path = demo_scripts["v1"]
+    v2: Path = demo_scripts["v2"]
+    target = f"{v2.stem}.Person.age"
+
+    run_whyx(
+        ["--json", "run", "--trace", "--watch", target, "-o", "v2.json", str(v2)],
+        cwd=root,
+        env=base_env,
+    )
+    cp = run_whyx(
+        ["--json", "run", "--trace", "--watch", target, "--format", "ndjson"]
+        + ["-o", "v2.ndjson", str(v2)],
+        cwd=root,
+        env=base_env,
+    )
+    out = read_json(cp.stdout)
+    lines = (root / "v2.ndjson").read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[0])["whyx"] == "trace"
+    footer = json.loads(lines[-1])
+    assert footer["whyx"] == "summary"
+    assert footer["event_count"] == out["event_count"] == len(lines) - 2
+
+    cp = run_whyx(
+        ["--json", "query", "history", target, "--file", "v2.ndjson"],
+        cwd=root,
+        env=base_env,
+    )
+    assert [h["value"] for h in read_json(cp.stdout)["history"]] == ["0", "1", "2"]
+
+    # A trace cut off mid-line (killed process) still yields its complete events.
+    truncated = root / "cut.ndjson"
+    truncated.write_text("\n".join(lines[:-1]) + '\n{"type": "ca', encoding="utf-8")
+    cp = run_whyx(
+        ["--json", "query", "trace-search", str(truncated), "--contains", "birthday"],
+        cwd=root,
+        env=base_env,
+    )
+    assert read_json(cp.stdout)["matches"]
+
+    # Legacy and streamed traces diff against each other.
+    run_whyx(
+        ["--json", "run", "--trace", "--watch", f"{v1.stem}.Person.age"]
+        + ["--format", "ndjson", "-o", "v1.ndjson", str(v1)],
+        cwd=root,
+        env=base_env,
+    )
+    cp = run_whyx(["--json", "diff", "v1.ndjson", "v2.json"], cwd=root, env=base_env)
+    assert read_json(cp.stdout)["watch_diffs"]
+
+
+def test_binary_trace_round_trips_through_readers(demo_scripts, base_env):
+    root: Path = demo_scripts["root"]
+    v2: Path = demo_scripts["v2"]
+    target = f"{v2.stem}.Person.age"
+
+    cp = run_whyx(
+        ["--json", "run", "--trace", "--watch", target, "--format", "binary"]
+        + ["-o", "v2.bin", str(v2)],
+        cwd=root,
+        env=base_env,
+    )
+    out = read_json(cp.stdout)
+    assert (root / "v2.bin").read_bytes().startswith(b"WHYXTRC\0")
+
+    cp = run_whyx(
+        ["--json", "query", "history", target, "--file", "v2.bin"],
+        cwd=root,
+        env=base_env,
+    )
+    history = read_json(cp.stdout)["history"]
+    assert [h["value"] for h in history] == ["0", "1", "2"]
+    assert history[1]["func"] == "__main__.Person.birthday"
+
+    cp = run_whyx(
+        ["--json", "query", "trace-search", "v2.bin", "--contains", "birthday"]
+        + ["--type", "call"],
+        cwd=root,
+        env=base_env,
+    )
+    matches = read_json(cp.stdout)["matches"]
+    assert [m["event"] for m in matches] == [
+        {"type": "call", "func": "__main__.Person.birthday"}
+    ] * 2
+    assert all(0 <= m["index"] < out["event_count"] for m in matches)
+
+    cp = run_whyx(["--json", "report", "v2.bin", "--coverage"], cwd=root, env=base_env)
+    assert read_json(cp.stdout)["modules_touched"]
+
+
+def test_chunked_trace_queries_and_recovers_without_index(demo_scripts, base_env):
+    root: Path = demo_scripts["root"]
+    v2: Path = demo_scripts["v2"]
+    target = f"{v2.stem}.Person.age"
+
+    for codec in ("gzip", "lzma"):
+        cp = run_whyx(
+            ["--json", "run", "--trace", "--watch", target, "--format", "chunked"]
+            + ["--compress", codec, "--chunk-size", "16"]
+            + ["-o", f"v2.{codec}.whyx", str(v2)],
+            cwd=root,
+            env=base_env,
+        )
+        assert read_json(cp.stdout)["event_count"] > 16
+
+        cp = run_whyx(
+            ["--json", "query", "history", target, "--file", f"v2.{codec}.whyx"],
+            cwd=root,
+            env=base_env,
+        )
+        history = read_json(cp.stdout)["history"]
+        assert [h["value"] for h in history] == ["0", "1", "2"]
+
+    run_whyx(
+        ["--json", "run", "--trace", "--watch", target, "-o", "v2.json", str(v2)],
+        cwd=root,
+        env=base_env,
+    )
+    search = ["--json", "query", "trace-search", "--contains", "birthday"]
+    plain = read_json(run_whyx(search + ["v2.json"], cwd=root, env=base_env).stdout)
+    chunked = read_json(
+        run_whyx(search + ["v2.gzip.whyx"], cwd=root, env=base_env).stdout
+    )
+    assert [m["event"] for m in chunked["matches"]] == [
+        m["event"] for m in plain["matches"]
+    ]
+    # Type-filtered search skips chunks but reports the same event indices.
+    calls = read_json(
+        run_whyx(
+            search + ["v2.gzip.whyx", "--type", "call"], cwd=root, env=base_env
+        ).stdout
+    )
+    assert calls["matches"] == [
+        m for m in chunked["matches"] if m["event"]["type"] == "call"
+    ]
+
+    # Without the trailing index (killed writer), complete chunks are still read.
+    data = (root / "v2.gzip.whyx").read_bytes()
+    (root / "cut.whyx").write_bytes(data[: data.rindex(b'{"codec"')])
+    cp = run_whyx(
+        ["--json", "query", "history", target, "--file", "cut.whyx"],
+        cwd=root,
+        env=base_env,
+    )
+    assert [h["value"] for h in read_json(cp.stdout)["history"]] == ["0", "1", "2"]
+
+
+def test_sampling_profiler_reports_hot_functions(tmp_path, base_env):
+    script = tmp_path / "busy.py"
+    script.write_text(
+        "import time\n"
+        "def spin():\n"
+        "    end = time.perf_counter() + 0.4\n"
+        "    while time.perf_counter() < end:\n"
+        "        pass\n"
+        "def main():\n"
+        "    spin()\n"
+        "main()\n",
+        encoding="utf-8",
+    )
+    cp = run_whyx(
+        ["--json", "run", "--sample", "200", "-o", "samples.json", str(script)],
+        cwd=tmp_path,
+        env=base_env,
+    )
+    out = read_json(cp.stdout)
+    assert out["samples"] > 10
+    events = json.loads((tmp_path / "samples.json").read_text(encoding="utf-8"))
+    assert events and all(ev["type"] == "sample" for ev in events)
+
+    cp = run_whyx(
+        ["--json", "report", "samples.json", "--hot", "--top", "3"],
+        cwd=tmp_path,
+        env=base_env,
+    )
+    rep = read_json(cp.stdout)
+    assert rep["hot_functions"][0]["func"] == "__main__.spin"
+    top_stack = rep["hot_stacks"][0]["stack"].split(";")
+    assert top_stack[0] == "runpy.run_path"
+    assert top_stack[-3:] == ["__main__.<module>", "__main__.main", "__main__.spin"]
+
+
+def test_trace_names_inherited_methods_by_runtime_class(tmp_path, base_env):
+    script = tmp_path / "shapes.py"
+    script.write_text(
+        "class Shape:\n"
+        "    def area(self):\n"
+        "        return 0\n"
+        "class Square(Shape):\n"
+        "    pass\n"
+        "def helper():\n"
+        "    return 1\n"
+        "for shape in (Shape(), Square(), Shape()):\n"
+        "    shape.area()\n"
+        "    helper()\n",
+        encoding="utf-8",
+    )
+    run_whyx(
+        ["--json", "run", "--trace", "-o", "t.json", str(script)],
+        cwd=tmp_path,
+        env=base_env,
+    )
+    events = json.loads((tmp_path / "t.json").read_text(encoding="utf-8"))
+    calls = [
+        ev["func"]
+        for ev in events
+        if ev["type"] == "call" and ev["func"].startswith("__main__.")
+    ]
+    assert calls[-6:] == [
+        "__main__.Shape.area",
+        "__main__.helper",
+        "__main__.Square.area",
+        "__main__.helper",
+        "__main__.Shape.area",
+        "__main__.helper",
+    ]
+
+
+def test_include_and_exclude_globs_select_traced_modules(tmp_path, base_env):
+    (tmp_path / "helpers.py").write_text(
+        "import fractions\ndef half(n):\n    return fractions.Fraction(n, 2)\n",
+        encoding="utf-8",
+    )
+    script = tmp_path / "main.py"
+    script.write_text(
+        "import sys\n"
+        f"sys.path.insert(0, {str(tmp_path)!r})\n"
+        "import helpers\n"
+        "def main():\n"
+        "    return [helpers.half(n) for n in range(3)]\n"
+        "main()\n",
+        encoding="utf-8",
+    )
+
+    def traced_modules(*flags):
+        run_whyx(
+            ["--json", "run", "--trace", *flags, "-o", "t.json", str(script)],
+            cwd=tmp_path,
+            env=base_env,
+        )
+        events = json.loads((tmp_path / "t.json").read_text(encoding="utf-8"))
+        return {ev["func"].rsplit(".", 1)[0] for ev in events}
+
+    everything = traced_modules()
+    assert {"__main__", "helpers", "fractions"} <= everything
+
+    no_fractions = traced_modules("--exclude", "fractions")
+    assert "fractions" not in no_fractions
+    assert {"__main__", "helpers"} <= no_fractions
+
+    only_helpers = traced_modules("--include", "help*")
+    assert only_helpers == {"__main__", "helpers"}
+
+    assert traced_modules("--include", "help*", "--exclude", "helpers") == {"__main__"}
+
+
+def test_capture_values_policies_and_hashed_diff(demo_scripts, tmp_path, base_env):
+    root: Path = demo_scripts["root"]
+    # Same stem for both versions, so the watch targets match in the diff.
+    (root / "before").mkdir()
+    (root / "after").mkdir()
+    v1 = root / "before" / "person.py"
+    v2 = root / "after" / "person.py"
+    v1.write_text(demo_scripts["v1"].read_text(encoding="utf-8"), encoding="utf-8")
+    v2.write_text(demo_scripts["v2"].read_text(encoding="utf-8"), encoding="utf-8")
+
+    def record(script, policy, out, *extra):
+        run_whyx(
+            ["--json", "run", "--trace", "--watch", f"{script.stem}.Person.age"]
+            + ["--capture-values", policy, *extra, "-o", out, str(script)],
+            cwd=root,
+            env=base_env,
+        )
+        return json.loads((root / out).read_text(encoding="utf-8"))
+
+    assigns = [ev for ev in record(v2, "type", "type.json") if ev["type"] == "assign"]
+    assert [ev["value"] for ev in assigns] == ["<int>"] * 3
+    events = record(v2, "none", "none.json")
+    assert not any("value" in ev or "value_hash" in ev for ev in events)
+    events = record(v2, "hash", "v2.hash.json")
+    assigns = [ev for ev in events if ev["type"] == "assign"]
+    assert len(assigns) == 3 and all("value" not in ev for ev in assigns)
+
+    # Hashed traces diff against each other and against full-value traces.
+    record(v1, "hash", "v1.hash.json")
+    record(v1, "full", "v1.full.json")
+    record(v2, "full", "v2.full.json")
+    cp = run_whyx(
+        ["--json", "diff", "v2.full.json", "v2.hash.json"], cwd=root, env=base_env
+    )
+    assert read_json(cp.stdout)["watch_diffs"] == {}
+    for old in ("v1.hash.json", "v1.full.json"):
+        cp = run_whyx(["--json", "diff", old, "v2.hash.json"], cwd=root, env=base_env)
+        (diff,) = read_json(cp.stdout)["watch_diffs"].values()
+        assert len(diff["old"]) == 2 and len(diff["new"]) == 3
+        assert diff["old"] == diff["new"][:2]
+
+    script = tmp_path / "big.py"
+    script.write_text(
+        "def build():\n    return list(range(100000))\nbuild()\n", encoding="utf-8"
+    )
+    run_whyx(
+        ["--json", "run", "--trace", "--capture-values", "truncated"]
+        + ["--value-limit", "40", "-o", "big.json", str(script)],
+        cwd=tmp_path,
+        env=base_env,
+    )
+    events = json.loads((tmp_path / "big.json").read_text(encoding="utf-8"))
+    (ret,) = [ev for ev in events if ev["func"] == "__main__.build"][1:]
+    assert ret["value"].startswith("[0, 1, 2") and len(ret["value"]) <= 40
+
+
+def test_watch_only_run_attaches_from_imports_and_reports_unresolved(
+    tmp_path, base_env
+):
+    pkg = tmp_path / "shop"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("from shop.models import Cart\n", encoding="utf-8")
+    (pkg / "models.py").write_text(
+        "class Cart:\n"
+        "    def __init__(self):\n"
+        "        self.total = 0\n"
+        "    def add(self, price):\n"
+        "        self.total += price\n"
+        "Order = type('Order', (), {'__init__': lambda self: setattr(self, 'id', 7)})\n",
+        encoding="utf-8",
+    )
+    script = tmp_path / "checkout.py"
+    script.write_text(
+        "import sys\n"
+        f"sys.path.insert(0, {str(tmp_path)!r})\n"
+        "from shop import Cart\n"
+        "from shop.models import Order\n"
+        "cart = Cart()\n"
+        "cart.add(5)\n"
+        "Order()\n",
+        encoding="utf-8",
+    )
+    cp = run_whyx(
+        ["--json", "run", "--watch", "shop.Cart.total"]
+        + ["--watch", "shop.models.Order.id", "--watch", "shop.Crat.total"]
+        + ["-o", "t.json", str(script)],
+        cwd=tmp_path,
+        env=base_env,
+    )
+    out = read_json(cp.stdout)
+    assert out["unresolved_watches"] == ["shop.Crat.total"]
+    assert "shop.Crat.total" in cp.stderr
+
+    events = json.loads((tmp_path / "t.json").read_text(encoding="utf-8"))
+    assert all(ev["type"] == "assign" for ev in events)
+    assert [(ev["target"], ev["value"]) for ev in events] == [
+        ("shop.Cart.total", "0"),
+        ("shop.Cart.total", "5"),
+        ("shop.models.Order.id", "7"),
+    ]
+
+
+def test_watch_descriptors_and_setattr_fallback(tmp_path, base_env):
+    script = tmp_path / "bank.py"
+    script.write_text(
+        "from dataclasses import dataclass, field\n"
+        "@dataclass\n"
+        "class Account:\n"
+        "    balance: int = 0\n"
+        "    owner: str = field(default='nobody')\n"
+        "class Savings(Account):\n"
+        "    pass\n"
+        "class Slotted:\n"
+        "    __slots__ = ('level',)\n"
+        "    def __init__(self):\n"
+        "        self.level = 1\n"
+        "class Thermo:\n"
+        "    def __init__(self):\n"
+        "        self._c = 0\n"
+        "    @property\n"
+        "    def celsius(self):\n"
+        "        return self._c\n"
+        "    @celsius.setter\n"
+        "    def celsius(self, value):\n"
+        "        self._c = value\n"
+        "a = Account()\n"
+        "a.balance = 5\n"
+        "a.owner = 'ann'\n"
+        "assert (Account.balance, a.balance, Account().owner) == (0, 5, 'nobody')\n"
+        "del a.balance\n"
+        "assert a.balance == 0\n"
+        "Savings().balance = 9\n"
+        "Slotted().level = 2\n"
+        "t = Thermo()\n"
+        "t.celsius = 30\n"
+        "assert t.celsius == 30\n"
+        "print('ok')\n",
+        encoding="utf-8",
+    )
+    watches = [
+        "bank.Account.balance",
+        "bank.Account.owner",
+        "bank.Slotted.level",
+        "bank.Thermo.celsius",
+    ]
+    cp = run_whyx(
+        ["run", *[arg for w in watches for arg in ("--watch", w)]]
+        + ["-o", "t.json", str(script)],
+        cwd=tmp_path,
+        env=base_env,
+    )
+    assert cp.stdout.startswith("ok\n")
+    events = json.loads((tmp_path / "t.json").read_text(encoding="utf-8"))
+    values = {}
+    for ev in events:
+        values.setdefault(ev["target"].split(".", 1)[1], []).append(ev["value"])
+    assert values == {
+        "Account.balance": ["0", "5", "0", "0", "9"],
+        "Account.owner": ["'nobody'", "'ann'", "'nobody'", "'nobody'"],
+        "Slotted.level": ["1", "2"],
+        "Thermo.celsius": ["30"],
+    }
+
+
+def test_watched_attribute_reads_behave_as_without_watch(tmp_path, base_env):
+    script = tmp_path / "hs.py"
+    script.write_text(
+        "class Person:\n"
+        "    def __init__(self):\n"
+        "        self.early = hasattr(self, 'age')\n"
+        "        self.fallback = getattr(self, 'age', 'DEFAULT')\n"
+        "        self.age = 30\n"
+        "p = Person()\n"
+        "assert (p.early, p.fallback, p.age) == (False, 'DEFAULT', 30)\n"
+        "del p.age\n"
+        "try:\n"
+        "    p.age\n"
+        "except AttributeError:\n"
+        "    print('ok')\n",
+        encoding="utf-8",
+    )
+    cp = run_whyx(
+        ["run", "--watch", "hs.Person.age", "-o", "t.json", str(script)],
+        cwd=tmp_path,
+        env=base_env,
+    )
+    assert cp.stdout.startswith("ok\n")
+    events = json.loads((tmp_path / "t.json").read_text(encoding="utf-8"))
+    assert [ev["value"] for ev in events] == ["30"]
+
+
+def test_watch_survives_class_decorator_copying_the_namespace(tmp_path, base_env):
+    script = tmp_path / "cp.py"
+    script.write_text(
+        "def copied(cls):\n"
+        "    return type(cls.__name__, cls.__bases__, dict(cls.__dict__))\n"
+        "@copied\n"
+        "class Person:\n"
+        "    level = 0\n"
+        "    def __init__(self):\n"
+        "        self.early = hasattr(self, 'age')\n"
+        "        self.age = 30\n"
+        "p = Person()\n"
+        "p.level = 2\n"
+        "p.age = 31\n"
+        "assert (p.early, p.age, p.level, Person.level) == (False, 31, 2, 0)\n"
+        "print('ok')\n",
+        encoding="utf-8",
+    )
+    cp = run_whyx(
+        [
+            "run",
+            "--watch",
+            "cp.Person.age",
+            "--watch",
+            "cp.Person.level",
+            "-o",
+            "t.json",
+            str(script),
+        ],
+        cwd=tmp_path,
+        env=base_env,
+    )
+    assert cp.stdout.startswith("ok\n")
+    events = json.loads((tmp_path / "t.json").read_text(encoding="utf-8"))
+    assert [(ev["target"], ev["value"]) for ev in events] == [
+        ("cp.Person.age", "30"),
+        ("cp.Person.level", "2"),
+        ("cp.Person.age", "31"),
+    ]
+
+
+def test_threads_get_their_own_ids_and_call_stacks(tmp_path, base_env):
+    script = tmp_path / "workers.py"
+    script.write_text(
+        "import threading, time\n"
+        "def leaf(i):\n"
+        "    time.sleep(0.005)\n"
+        "    return i\n"
+        "def worker():\n"
+        "    for i in range(5):\n"
+        "        leaf(i)\n"
+        "def main():\n"
+        "    threads = [threading.Thread(target=worker) for _ in range(3)]\n"
+        "    for t in threads:\n"
+        "        t.start()\n"
+        "    for t in threads:\n"
+        "        t.join()\n"
+        "main()\n",
+        encoding="utf-8",
+    )
+    cp = run_whyx(
+        ["--json", "run", "--trace", "-o", "t.json", str(script)],
+        cwd=tmp_path,
+        env=base_env,
+    )
+    out = read_json(cp.stdout)
+    assert out["threads"][0] == "MainThread" and len(out["threads"]) == 4
+
+    events = json.loads((tmp_path / "t.json").read_text(encoding="utf-8"))
+    leaf_calls = {}
+    for ev in events:
+        if ev["type"] == "call" and ev["func"] == "__main__.leaf":
+            leaf_calls[ev["thread"]] = leaf_calls.get(ev["thread"], 0) + 1
+    assert sorted(leaf_calls) == [1, 2, 3] and set(leaf_calls.values()) == {5}
+    assert not any("thread" in ev for ev in events if ev["func"] == "__main__.main")
+
+    # Call edges are rebuilt per thread: no edge joins two threads' frames.
+    (tmp_path / "empty.json").write_text("[]", encoding="utf-8")
+    cp = run_whyx(
+        ["--json", "diff", "empty.json", "t.json"], cwd=tmp_path, env=base_env
+    )
+    edges = {tuple(e) for e in read_json(cp.stdout)["added_calls"]}
+    main_edges = {e for e in edges if e[0].startswith("__main__.")}
+    assert ("__main__.worker", "__main__.leaf") in main_edges
+    assert ("__main__.leaf", "__main__.leaf") not in main_edges
+    assert ("__main__.worker", "__main__.worker") not in main_edges
+
+
+def test_async_mode_collapses_coroutine_resumes(tmp_path, base_env):
+    script = tmp_path / "aio.py"
+    script.write_text(
+        "import asyncio\n"
+        "def helper(x):\n"
+        "    return x * 2\n"
+        "async def fetch(x):\n"
+        "    await asyncio.sleep(0)\n"
+        "    await asyncio.sleep(0)\n"
+        "    return helper(x)\n"
+        "async def main():\n"
+        "    return await asyncio.gather(fetch(1), fetch(2))\n"
+        "asyncio.run(main())\n",
+        encoding="utf-8",
+    )
+
+    def fetch_events(*flags):
+        run_whyx(
+            ["run", "--trace", *flags, "-o", "t.json", str(script)],
+            cwd=tmp_path,
+            env=base_env,
+        )
+        events = json.loads((tmp_path / "t.json").read_text(encoding="utf-8"))
+        return [ev for ev in events if ev["func"] == "__main__.fetch"]
+
+    # Without --async every resume and suspension looks like a call and a return.
+    plain = fetch_events()
+    assert sum(ev["type"] == "call" for ev in plain) > 2
+
+    fetches = fetch_events("--async")
+    assert [ev["type"] for ev in fetches].count("call") == 2
+    assert sorted(ev["value"] for ev in fetches if ev["type"] == "return") == [
+        "2",
+        "4",
+    ]
+    assert len({ev["task"] for ev in fetches}) == 2
+
+    (tmp_path / "empty.json").write_text("[]", encoding="utf-8")
+    cp = run_whyx(
+        ["--json", "diff", "empty.json", "t.json"], cwd=tmp_path, env=base_env
+    )
+    edges = {tuple(e) for e in read_json(cp.stdout)["added_calls"]}
+    assert ("__main__.fetch", "__main__.helper") in edges
+    assert ("__main__.fetch", "__main__.fetch") not in edges
+
+
+def test_multiprocess_children_write_shards_that_merge(tmp_path, base_env):
+    for method in ("fork", "spawn"):
+        script = tmp_path / f"pool_{method}.py"
+        script.write_text(
+            "import multiprocessing as mp\n"
+            "from concurrent.futures import ProcessPoolExecutor\n"
+            "def square(x):\n"
+            "    return x * x\n"
+            "def main():\n"
+            f"    ctx = mp.get_context({method!r})\n"
+            "    p = ctx.Process(target=square, args=(3,))\n"
+            "    p.start()\n"
+            "    p.join()\n"
+            "    with ProcessPoolExecutor(1, mp_context=ctx) as ex:\n"
+            "        return list(ex.map(square, [1, 2]))\n"
+            "if __name__ == '__main__':\n"
+            "    main()\n",
+            encoding="utf-8",
+        )
+        shards = tmp_path / f"shards_{method}"
+        cp = run_whyx(
+            ["--json", "run", "--trace", "--multiprocess", "--format", "ndjson"]
+            + ["-o", str(shards), str(script)],
+            cwd=tmp_path,
+            env=base_env,
+        )
+        out = read_json(cp.stdout)
+        assert out["trace_file"] == str(shards) and out["processes"] == 3
+        assert len(list(shards.iterdir())) == 3
+
+        merged = tmp_path / f"merged_{method}.json"
+        cp = run_whyx(
+            ["--json", "merge", str(shards), "-o", str(merged)],
+            cwd=tmp_path,
+            env=base_env,
+        )
+        parent, *children = read_json(cp.stdout)["processes"]
+        events = json.loads(merged.read_text(encoding="utf-8"))
+        squares = {}
+        for ev in events:
+            if ev["type"] == "return" and ev["func"] == "__main__.square":
+                squares.setdefault(ev["pid"], []).append(ev["value"])
+        assert sorted(squares) == sorted(children)
+        assert sorted(v for vs in squares.values() for v in vs) == ["1", "4", "9"]
+        assert any(
+            ev["func"] == "__main__.main" and ev["pid"] == parent for ev in events
+        )
+
+        # Readers take the shard directory itself.
+        cp = run_whyx(
+            ["--json", "query", "trace-search", str(shards)]
+            + ["--contains", "__main__.square", "--type", "call"],
+            cwd=tmp_path,
+            env=base_env,
+        )
+        assert len(read_json(cp.stdout)["matches"]) == 3
+
+
+def test_ring_buffer_keeps_last_events_and_dumps_on_signal_and_crash(
+    tmp_path, base_env
+):
+    script = tmp_path / "recorder.py"
+    trace_file = tmp_path / "ring.ndjson"
+    script.write_text(
+        "import os, signal\n"
+        "class Box:\n"
+        "    def __init__(self):\n"
+        "        self.value = 0\n"
+        "def bump(box, i):\n"
+        "    box.value = i\n"
+        "box = Box()\n"
+        "for i in range(100):\n"
+        "    bump(box, i)\n"
+        "os.kill(os.getpid(), signal.SIGUSR1)\n"
+        f"with open({str(trace_file)!r}, encoding='utf-8') as f:\n"
+        "    print([line for line in f if 'assign' in line][-1])\n"
+        "for i in range(100, 200):\n"
+        "    bump(box, i)\n"
+        "raise RuntimeError('crashed at ' + str(box.value))\n",
+        encoding="utf-8",
+    )
+    cp = run_whyx(
+        ["run", "--trace", "--watch", "recorder.Box.value", "--include", "__main__"]
+        + ["--ring-buffer", "6", "--format", "ndjson", "-o", str(trace_file)]
+        + [str(script)],
+        cwd=tmp_path,
+        env=base_env,
+    )
+    # Dumped on SIGUSR1 while the script kept running.
+    assert json.loads(cp.stdout.splitlines()[0])["value"] == "99"
+
+    lines = trace_file.read_text(encoding="utf-8").splitlines()
+    footer = json.loads(lines[-1])
+    assert footer["dump_reason"] == "exception"
+    assert footer["error"] == "RuntimeError: crashed at 199"
+    assert footer["ring_buffer"] == 6 and footer["event_count"] == 6
+    assert [json.loads(line)["type"] for line in lines[1:-1]] == [
+        "assign",
+        "return",
+        "call",
+        "assign",
+        "return",
+        "return",
+    ]
+
+    cp = run_whyx(
+        ["--json", "query", "history", "recorder.Box.value", "--file", str(trace_file)],
+        cwd=tmp_path,
+        env=base_env,
+    )
+    assert [h["value"] for h in read_json(cp.stdout)["history"]] == ["198", "199"]
+    cp = run_whyx(
+        ["--json", "query", "trace-search", str(trace_file)]
+        + ["--contains", "__main__.bump", "--type", "call"],
+        cwd=tmp_path,
+        env=base_env,
+    )
+    assert len(read_json(cp.stdout)["matches"]) == 1
+
+
+def test_timing_stamps_and_report_self_total_and_percentiles(tmp_path, base_env):
+    script = tmp_path / "timed.py"
+    script.write_text(
+        "import time\n"
+        "def slow():\n"
+        "    time.sleep(0.02)\n"
+        "def fact(n):\n"
+        "    return 1 if n < 2 else n * fact(n - 1)\n"
+        "def main():\n"
+        "    for _ in range(3):\n"
+        "        slow()\n"
+        "    fact(10)\n"
+        "main()\n",
+        encoding="utf-8",
+    )
+    for flag, fmt, mode, key in (
+        ("--timing", "binary", "absolute", "t"),
+        ("--timing-deltas", "ndjson", "delta", "dt"),
+    ):
+        trace_file = tmp_path / f"timed.{fmt}"
+        cp = run_whyx(
+            ["--json", "run", flag, "--include", "__main__", "--format", fmt]
+            + ["-o", str(trace_file), str(script)],
+            cwd=tmp_path,
+            env=base_env,
+        )
+        assert read_json(cp.stdout)["timing"] == mode
+
+        cp = run_whyx(
+            ["--json", "query", "trace-search", str(trace_file)]
+            + ["--contains", "__main__.slow"],
+            cwd=tmp_path,
+            env=base_env,
+        )
+        matches = read_json(cp.stdout)["matches"]
+        assert len(matches) == 6 and all(key in m["event"] for m in matches)
+
+        cp = run_whyx(
+            ["--json", "report", "--timing", str(trace_file)],
+            cwd=tmp_path,
+            env=base_env,
+        )
+        report = read_json(cp.stdout)
+        funcs = {f["func"]: f for f in report["functions"]}
+        assert report["functions"][0]["func"] == "__main__.slow"
+        slow = funcs["__main__.slow"]
+        assert slow["calls"] == 3
+        assert 20_000_000 <= slow["p50_ns"] <= slow["p99_ns"] <= slow["max_ns"]
+        assert slow["self_ns"] == slow["total_ns"] >= 60_000_000
+        # Recursion: every call counts, total time only the outermost.
+        fact = funcs["__main__.fact"]
+        assert fact["calls"] == 10
+        assert fact["self_ns"] == fact["total_ns"] == fact["max_ns"]
+        main = funcs["__main__.main"]
+        assert main["self_ns"] == (
+            main["total_ns"] - slow["total_ns"] - fact["total_ns"]
+        )
+
+    run_whyx(
+        ["run", "--trace", "-o", str(tmp_path / "plain.json"), str(script)],
+        cwd=tmp_path,
+        env=base_env,
+    )
+    cp = run_whyx(
+        ["report", "--timing", str(tmp_path / "plain.json")],
+        cwd=tmp_path,
+        env=base_env,
+    )
+    assert "No call timing in trace" in cp.stdout
@@ -0,0 +1,64 @@
+import json
+import subprocess
+import sys
+
+from conftest import read_json, run_whyx
+
+
+def test_query_batch_matches_individual_queries(sample_project, demo_scripts, base_env):
+    project_dir, _ = sample_project
+    run_whyx(["--json", "index", str(project_dir)], cwd=project_dir, env=base_env)
+
+    script = demo_scripts["v1"]
+    trace = demo_scripts["root"] / "trace.json"
+    target = f"{script.stem}.Person.age"
+    run_whyx(
+        ["--json", "run", "--trace", "--watch", target, "-o", str(trace), str(script)],
+        cwd=demo_scripts["root"],
+        env=base_env,
+    )
+
+    cases = [
+        (
+            {"query": "callers", "function": "c1", "max-depth": 8},
+            ["query", "callers", "c1", "--max-depth", "8"],
+        ),
+        (
+            {"query": "callees", "function": "acmeproj.a.a1", "transitive": True},
+            ["query", "callees", "acmeproj.a.a1", "--transitive"],
+        ),
+        (
+            {"query": "find-path", "from": "a.a1", "to": "c.c1"},
+            ["query", "find-path", "--from", "a.a1", "--to", "c.c1"],
+        ),
+        (
+            {"query": "callees", "function": "shared"},
+            ["query", "callees", "shared"],
+        ),
+        (
+            {"query": "history", "target": target, "file": str(trace)},
+            ["query", "history", target, "--file", str(trace)],
+        ),
+        (
+            {"query": "trace-search", "file": str(trace), "contains": "birthday"},
+            ["query", "trace-search", str(trace), "--contains", "birthday"],
+        ),
+    ]
+
+    cp = subprocess.run(
+        [sys.executable, "-m", "src.cli", "query", "batch"],
+        cwd=str(project_dir),
+        env=base_env,
+        input="".join(json.dumps(req) + "\n" for req, _ in cases) + "{bad\n",
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    lines = cp.stdout.splitlines()
+    assert len(lines) == len(cases) + 1
+
+    for line, (_, argv) in zip(lines, cases):
+        single = run_whyx(["--json"] + argv, cwd=project_dir, env=base_env)
+        assert json.loads(line) == read_json(single.stdout)
+    assert "error" in json.loads(lines[-1])
@@ -0,0 +1,123 @@
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from conftest import read_json, run_whyx
+
+
+def _start_server(args, cwd: Path, env):
+    cmd = [sys.executable, "-m", "src.cli"] + args
+    return subprocess.Popen(
+        cmd,
+        cwd=str(cwd),
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+
+def test_serve_stdio_answers_json_rpc(sample_project, base_env):
+    project_dir, _ = sample_project
+    run_whyx(["--json", "index", str(project_dir)], cwd=project_dir, env=base_env)
+
+    requests = [
+        {"jsonrpc": "2.0", "id": 1, "method": "callers", "params": {"function": "c1"}},
+        {
+            "jsonrpc": "2.0",
+            "id": 2,
+            "method": "find-path",
+            "params": {"source": "a.a1", "target": "c.c1"},
+        },
+        {"jsonrpc": "2.0", "id": 3, "method": "nope", "params": {}},
+    ]
+    proc = _start_server(["serve", "--stdio"], project_dir, base_env)
+    out, _ = proc.communicate(
+        "".join(json.dumps(r) + "\n" for r in requests), timeout=30
+    )
+    responses = [json.loads(line) for line in out.splitlines()]
+
+    assert [r["id"] for r in responses] == [1, 2, 3]
+    chain = ["acmeproj.a.a1", "acmeproj.b.b1", "acmeproj.c.c1"]
+    assert chain in responses[0]["result"]["chains"]
+    assert chain in responses[1]["result"]["paths"]
+    assert responses[2]["error"]["code"] == -32601
+
+
+def test_query_reuses_running_server(sample_project, base_env):
+    project_dir, _ = sample_project
+    cp = run_whyx(["--json", "index", str(project_dir)], cwd=project_dir, env=base_env)
+    index_file = Path(read_json(cp.stdout)["index_file"])
+
+    proc = _start_server(
+        ["--json", "serve", "--index", str(index_file)], project_dir, base_env
+    )
+    try:
+        sock = project_dir / ".whyx.sock"
+        deadline = time.time() + 15
+        while not sock.exists() and time.time() < deadline:
+            assert proc.poll() is None, proc.stderr.read()
+            time.sleep(0.05)
+        assert sock.exists()
+
+        # The server keeps the last good index when the file becomes unreadable,
+        # so a correct answer here can only have come from the server.
+        index_file.write_text("not json", encoding="utf-8")
+        cp = run_whyx(
+            ["--json", "query", "callers", "c1", "--index", str(index_file)],
+            cwd=project_dir,
+            env=base_env,
+        )
+        q = read_json(cp.stdout)
+        assert ["acmeproj.a.a1", "acmeproj.b.b1", "acmeproj.c.c1"] in q["chains"]
+
+        # Rewriting the index on disk is picked up without restarting the server.
+        (project_dir / "acmeproj" / "d.py").write_text(
+            "from .c import c1\ndef d1():\n    c1()\n", encoding="utf-8"
+        )
+        run_whyx(["--json", "index", str(project_dir)], cwd=project_dir, env=base_env)
+        cp = run_whyx(
+            ["--json", "query", "callers", "c1", "--index", str(index_file)],
+            cwd=project_dir,
+            env=base_env,
+        )
+        q = read_json(cp.stdout)
+        assert ["acmeproj.d.d1", "acmeproj.c.c1"] in q["chains"]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    deadline = time.time() + 5
+    while (project_dir / ".whyx.sock").exists() and time.time() < deadline:
+        time.sleep(0.05)
+    assert not (project_dir / ".whyx.sock").exists()
+
+
+def test_serve_without_index_file_rebuilds_after_source_edits(sample_project, base_env):
+    project_dir, _ = sample_project
+    proc = _start_server(["serve", "--stdio"], project_dir, base_env)
+
+    def callers(req_id):
+        request = {
+            "jsonrpc": "2.0",
+            "id": req_id,
+            "method": "callers",
+            "params": {"function": "c1"},
+        }
+        proc.stdin.write(json.dumps(request) + "\n")
+        proc.stdin.flush()
+        return json.loads(proc.stdout.readline())["result"]["chains"]
+
+    try:
+        assert ["acmeproj.d.d1", "acmeproj.c.c1"] not in callers(1)
+        (project_dir / "acmeproj" / "d.py").write_text(
+            "from .c import c1\ndef d1():\n    c1()\n", encoding="utf-8"
+        )
+        # The tree is walked at most once per TREE_CHECK_INTERVAL (1s).
+        time.sleep(1.1)
+        assert ["acmeproj.d.d1", "acmeproj.c.c1"] in callers(2)
+    finally:
+        proc.stdin.close()
+        proc.wait(timeout=10)
@@ -1,7 +1,28 @@
+import json
+import os
+import subprocess
+import sys
 from pathlib import Path
 
 from conftest import read_json, run_whyx
 
+# Runs the CLI with indexer.analyze_file wrapped to report each file it parses.
+_REPORT_PARSES = """
+import sys
+from src.static_analysis import indexer
+from src.cli.__main__ import main
+
+analyze_file = indexer.analyze_file
+
+def reporting(job):
+    print("parsed", job[0], file=sys.stderr)
+    return analyze_file(job)
+
+indexer.analyze_file = reporting
+sys.argv[0] = "whyx"
+main()
+"""
+
 
 def test_index_and_static_queries_end_to_end(sample_project, base_env):
     project_dir, meta = sample_project
@@ -14,6 +35,13 @@ def test_index_and_static_queries_end_to_end(sample_project, base_env):
     assert out["functions"] == 9
     assert out["edges"] == 4
 
+    adjacency = json.loads(index_file.read_text(encoding="utf-8"))["adjacency"]
+    nodes = adjacency["nodes"]
+    a1 = nodes.index("acmeproj.a.a1")
+    fwd = adjacency["forward"]
+    callees = fwd["targets"][fwd["offsets"][a1] : fwd["offsets"][a1 + 1]]
+    assert [nodes[i] for i in callees] == ["acmeproj.b.b1"]
+
     cp = run_whyx(
         ["--json", "query", "callees", "acmeproj.a.a1", "--index", str(index_file)],
         cwd=project_dir,
@@ -76,3 +104,225 @@ def test_index_and_static_queries_end_to_end(sample_project, base_env):
     assert "Ambiguous function 'shared'. Did you mean:" in text
     assert " - acmeproj.f.shared" in text
     assert " - acmeproj.g.shared" in text
+
+
+def test_parallel_index_matches_serial_build(sample_project, base_env):
+    project_dir, _ = sample_project
+
+    serial = project_dir / "serial.json"
+    parallel = project_dir / "parallel.json"
+    run_whyx(
+        ["--json", "index", str(project_dir), "-o", str(serial)],
+        cwd=project_dir,
+        env=base_env,
+    )
+    run_whyx(
+        ["--json", "index", str(project_dir), "-o", str(parallel), "--jobs", "3"],
+        cwd=project_dir,
+        env=base_env,
+    )
+
+    def without_timestamp(path: Path) -> str:
+        lines = path.read_text(encoding="utf-8").splitlines()
+        return "\n".join(ln for ln in lines if '"generated_at"' not in ln)
+
+    assert without_timestamp(serial) == without_timestamp(parallel)
+
+
+def test_incremental_index_reparses_only_changed_files(sample_project, base_env):
+    project_dir, _ = sample_project
+    index_file = project_dir / ".whyx_index.json"
+
+    run_whyx(["--json", "index", str(project_dir)], cwd=project_dir, env=base_env)
+    before = json.loads(index_file.read_text(encoding="utf-8"))
+
+    (project_dir / "acmeproj" / "b.py").write_text(
+        "from .c import c1\ndef b1():\n    c1()\ndef b2():\n    b1()\n",
+        encoding="utf-8",
+    )
+    (project_dir / "acmeproj" / "g.py").unlink()
+    cp = subprocess.run(
+        [sys.executable, "-c", _REPORT_PARSES]
+        + ["--json", "index", str(project_dir), "--incremental"],
+        cwd=str(project_dir),
+        env=base_env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    parsed = [
+        Path(line.split(" ", 1)[1]).name
+        for line in cp.stderr.splitlines()
+        if line.startswith("parsed ")
+    ]
+    assert parsed == ["b.py"]
+    incremental = json.loads(index_file.read_text(encoding="utf-8"))
+
+    full_file = project_dir / "full.json"
+    run_whyx(
+        ["--json", "index", str(project_dir), "-o", str(full_file)],
+        cwd=project_dir,
+        env=base_env,
+    )
+    full = json.loads(full_file.read_text(encoding="utf-8"))
+
+    assert incremental["functions"] == full["functions"]
+    assert incremental["edges"] == full["edges"]
+    assert ["acmeproj.b.b2", "acmeproj.b.b1"] in incremental["edges"]
+    assert "acmeproj.g.shared" not in incremental["functions"]
+    rel_a = str(Path("acmeproj") / "a.py")
+    assert incremental["files"][rel_a]["hash"] == before["files"][rel_a]["hash"]
+
+
+def test_binary_index_answers_like_json_index(sample_project, base_env):
+    project_dir, _ = sample_project
+
+    cp = run_whyx(
+        ["--json", "index", str(project_dir), "--format", "binary"],
+        cwd=project_dir,
+        env=base_env,
+    )
+    out = read_json(cp.stdout)
+    bin_file = Path(out["index_file"])
+    assert bin_file.name == ".whyx_index.bin"
+    assert out["functions"] == 9
+    assert out["edges"] == 4
+    assert not bin_file.read_bytes().startswith(b"{")
+
+    # Picked up automatically from the working directory.
+    cp = run_whyx(["--json", "query", "callers", "c1"], cwd=project_dir, env=base_env)
+    q = read_json(cp.stdout)
+    assert q["resolved"] == "acmeproj.c.c1"
+    assert ["acmeproj.a.a1", "acmeproj.b.b1", "acmeproj.c.c1"] in q["chains"]
+
+    cp = run_whyx(
+        ["--json", "query", "callees", "shared", "--index", str(bin_file)],
+        cwd=project_dir,
+        env=base_env,
+    )
+    q = read_json(cp.stdout)
+    assert q["candidates"] == ["acmeproj.f.shared", "acmeproj.g.shared"]
+
+
+def test_find_path_shortest_returns_shortest_paths_first(sample_project, base_env):
+    project_dir, _ = sample_project
+    (project_dir / "acmeproj" / "x.py").write_text(
+        "from .b import b1\nfrom .c import c1\ndef x1():\n    b1()\n    c1()\n",
+        encoding="utf-8",
+    )
+    run_whyx(["--json", "index", str(project_dir)], cwd=project_dir, env=base_env)
+
+    cp = run_whyx(
+        ["--json", "query", "find-path", "--from", "x1", "--to", "c1", "--shortest"],
+        cwd=project_dir,
+        env=base_env,
+    )
+    q = read_json(cp.stdout)
+    assert q["paths"] == [
+        ["acmeproj.x.x1", "acmeproj.c.c1"],
+        ["acmeproj.x.x1", "acmeproj.b.b1", "acmeproj.c.c1"],
+    ]
+
+
+def test_reachable_query_and_transitive_callees(sample_project, base_env):
+    project_dir, _ = sample_project
+    cp = run_whyx(["--json", "index", str(project_dir)], cwd=project_dir, env=base_env)
+    index_file = Path(read_json(cp.stdout)["index_file"])
+    index = json.loads(index_file.read_text(encoding="utf-8"))
+    assert len(index["reachability"]["component"]) == len(index["adjacency"]["nodes"])
+
+    cp = run_whyx(
+        ["--json", "query", "reachable", "--from", "a1", "--to", "c1"],
+        cwd=project_dir,
+        env=base_env,
+    )
+    q = read_json(cp.stdout)
+    assert q["source_resolved"] == "acmeproj.a.a1"
+    assert q["reachable"] is True
+
+    cp = run_whyx(
+        ["query", "reachable", "--from", "c1", "--to", "a1"],
+        cwd=project_dir,
+        env=base_env,
+    )
+    assert "acmeproj.c.c1 cannot reach acmeproj.a.a1." in cp.stdout
+
+    cp = run_whyx(
+        ["--json", "query", "callees", "--transitive", "a1"],
+        cwd=project_dir,
+        env=base_env,
+    )
+    q = read_json(cp.stdout)
+    assert q["callees"] == ["acmeproj.b.b1", "acmeproj.c.c1"]
+
+
+def test_reachability_labels_stay_bounded_on_wide_graphs(tmp_path, base_env):
+    # 'top' reaches every other one of 200 leaves: a 100-interval label.
+    project_dir = tmp_path / "wide"
+    (project_dir / "widepkg").mkdir(parents=True)
+    (project_dir / "widepkg" / "__init__.py").write_text("", encoding="utf-8")
+    leaves = "".join(f"def a{i:03d}():\n    pass\n" for i in range(200))
+    calls = "".join(f"    a{i:03d}()\n" for i in range(0, 200, 2))
+    (project_dir / "widepkg" / "m.py").write_text(
+        leaves + "def top():\n" + calls + "def outer():\n    top()\n",
+        encoding="utf-8",
+    )
+    cp = run_whyx(["--json", "index", str(project_dir)], cwd=project_dir, env=base_env)
+    index = json.loads(Path(read_json(cp.stdout)["index_file"]).read_text("utf-8"))
+    offsets = index["reachability"]["labels"]["offsets"]
+    assert max(b - a for a, b in zip(offsets, offsets[1:])) <= 64
+
+    for target, expected in (("a198", True), ("a199", False)):
+        cp = run_whyx(
+            ["--json", "query", "reachable", "--from", "outer", "--to", target],
+            cwd=project_dir,
+            env=base_env,
+        )
+        assert read_json(cp.stdout)["reachable"] is expected
+
+    cp = run_whyx(
+        ["--json", "query", "callees", "--transitive", "outer"],
+        cwd=project_dir,
+        env=base_env,
+    )
+    assert read_json(cp.stdout)["callees"] == [
+        f"widepkg.m.a{i:03d}" for i in range(0, 200, 2)
+    ] + ["widepkg.m.top"]
+
+
+def test_in_memory_builds_use_persistent_cache(sample_project, base_env, tmp_path):
+    project_dir, _ = sample_project
+    cache_dir = tmp_path / "cache"
+    env = dict(base_env, WHYX_CACHE_DIR=str(cache_dir), WHYX_NO_SERVER="1")
+    # Freshly written files are "racy" and never cached; age them.
+    for py in project_dir.rglob("*.py"):
+        os.utime(py, ns=(1_000_000_000, 1_000_000_000))
+
+    cp = run_whyx(["--json", "query", "callees", "b1"], cwd=project_dir, env=env)
+    assert read_json(cp.stdout)["callees"] == ["acmeproj.c.c1"]
+    entries = list(cache_dir.glob("*.bin"))
+    assert len(entries) == 1
+
+    cp = run_whyx(["--json", "query", "callers", "c1"], cwd=project_dir, env=env)
+    assert ["acmeproj.a.a1", "acmeproj.b.b1", "acmeproj.c.c1"] in read_json(cp.stdout)[
+        "chains"
+    ]
+    assert list(cache_dir.glob("*.bin")) == entries
+
+    # An edited tree gets a new entry instead of a stale answer.
+    b_py = project_dir / "acmeproj" / "b.py"
+    b_py.write_text(
+        "from .c import c1\ndef b1():\n    return 1\ndef b2():\n    c1()\n",
+        encoding="utf-8",
+    )
+    os.utime(b_py, ns=(2_000_000_000, 2_000_000_000))
+    cp = run_whyx(["--json", "query", "callees", "b1"], cwd=project_dir, env=env)
+    assert read_json(cp.stdout)["callees"] == []
+    assert len(list(cache_dir.glob("*.bin"))) == 2
+
+    # Over the size bound, least recently used entries are evicted.
+    env["WHYX_CACHE_MAX_BYTES"] = "1"
+    os.utime(b_py, ns=(3_000_000_000, 3_000_000_000))
+    run_whyx(["--json", "query", "callees", "a1"], cwd=project_dir, env=env)
+    assert list(cache_dir.glob("*.bin")) == []